@@ -1,28 +1,84 @@
+import os
+import re
 from db import get_connection
 
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+MIGRATION_FILE = re.compile(r'^(\d+)_.+\.sql$')
+# Arbitrary key for pg_advisory_lock, so two processes never apply migrations at the same time
+MIGRATIONS_LOCK_ID = 7301
 
-def apply_migrations():
-    try:
-        with open('create_schema.sql', 'r') as f:
-            sql = f.read()
 
-        conn = get_connection()
-        try:
-            with conn.cursor() as cursor:
-                # Drop the "magic_items" table if it exists
-                cursor.execute("DROP TABLE IF EXISTS magic_items;")
-                # Create the "magic_items" table
-                cursor.execute(sql)
+def list_migrations(migrations_dir: str = MIGRATIONS_DIR) -> list[tuple[int, str]]:
+    """
+    List the migration files in version order.
+    Returns:
+        list[tuple[int, str]]: (version, filename) pairs, e.g. (2, '0002_search_indexes.sql').
+    """
+    migrations = []
+    for filename in os.listdir(migrations_dir):
+        match = MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), filename))
+    return sorted(migrations)
+
+
+def apply_migrations(migrations_dir: str = MIGRATIONS_DIR) -> list[str]:
+    """
+    Apply every migration that has not been applied yet, oldest first.
+    Each migration runs in its own transaction and is recorded in schema_migrations, so existing
+    data is never dropped and running the script again is a no-op. Stops at the first failing migration.
+    Returns:
+        list[str]: The filenames of the migrations applied by this run.
+    """
+    applied_now = []
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATIONS_LOCK_ID,))
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INT PRIMARY KEY,
+                    name VARCHAR(255) NOT NULL,
+                    applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                )
+            """)
             conn.commit()
+            cursor.execute("SELECT version FROM schema_migrations")
+            applied = {row[0] for row in cursor.fetchall()}
+
+        for version, filename in list_migrations(migrations_dir):
+            if version in applied:
+                continue
+            with open(os.path.join(migrations_dir, filename), 'r') as f:
+                sql = f.read()
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute(sql)
+                    cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                                   (version, filename))
+                conn.commit()
+                applied_now.append(filename)
+                print(f"Applied {filename}")
+            except Exception as e:
+                conn.rollback()
+                print(f"Migration {filename} failed :(", e)
+                raise
+        if not applied_now:
+            print("Database is up to date.")
+        else:
             print('Migrations successful!')
-        except Exception as e:
+        return applied_now
+    finally:
+        if not conn.closed:
             conn.rollback()
-            print("Migrations Failed :(", e)
-        finally:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATIONS_LOCK_ID,))
             conn.close()
-    except FileNotFoundError:
-        print("Error: create_schema.sql not found")
 
 
 if __name__ == "__main__":
     apply_migrations()
+    from repositories.magic_item_repository import MagicItemRepository
+    reclassified = MagicItemRepository.reclassify_rarity_tiers()
+    if reclassified:
+        print(f"Reclassified the rarity tier of {reclassified} items.")
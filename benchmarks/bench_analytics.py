@@ -0,0 +1,114 @@
+"""
+Analytics snapshot benchmark: time of a filtered, grouped aggregate and of a percentile breakdown over a large
+catalog, on the NumPy snapshot (CatalogSnapshot) vs a plain Python pass over the item dicts, and the time to
+apply single-item writes to the snapshot.
+
+The catalog is generated in memory, so no database is needed.
+
+Usage:
+    python benchmarks/bench_analytics.py --items 1000000,2000000 --repeat 5
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from repositories.magic_item_repository import SNAPSHOT_COLUMNS  # noqa: E402
+from services.catalog_snapshot import CatalogSnapshot  # noqa: E402
+
+CATEGORIES = ["Armor", "Weapon", "Potion", "Accessory", "Artifact", "Scroll", "Wand", "Ring"]
+TYPES = [f"Type {n}" for n in range(40)]
+CRITERIA = {"level__gte": 5, "level__lte": 15, "value__lte": 4000}
+
+
+def generate_columns(count: int, rng: random.Random) -> dict:
+    return {
+        "id": list(range(1, count + 1)),
+        "category": [rng.choice(CATEGORIES) for _ in range(count)],
+        "type": [rng.choice(TYPES) for _ in range(count)],
+        "level": [rng.randint(1, 20) for _ in range(count)],
+        "rarity_value": [rng.uniform(0, 100) for _ in range(count)],
+        "weight": [rng.uniform(0.1, 10) for _ in range(count)],
+        "value": [rng.randint(1, 5000) for _ in range(count)],
+        "durability": [rng.uniform(0.1, 0.9) for _ in range(count)],
+        "stock": [rng.randint(0, 20) for _ in range(count)],
+    }
+
+
+def python_summary(items: list) -> dict:
+    groups = {}
+    for item in items:
+        if 5 <= item["level"] <= 15 and item["value"] <= 4000:
+            group = groups.setdefault(item["category"], [0, 0, 0])
+            group[0] += 1
+            group[1] += item["stock"]
+            group[2] += item["value"] * item["stock"]
+    return groups
+
+
+def python_distribution(items: list) -> dict:
+    groups = {}
+    for item in items:
+        if 5 <= item["level"] <= 15 and item["value"] <= 4000:
+            groups.setdefault(item["type"], []).append(item["weight"])
+    return {label: statistics.quantiles(values, n=4) for label, values in groups.items()}
+
+
+def best_ms(function, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=lambda value: [int(items) for items in value.split(",")],
+                        default=[1000000], help="comma separated catalog sizes")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per operation, the fastest one counts")
+    parser.add_argument("--writes", type=int, default=100000, help="single item updates applied to the snapshot")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    for count in args.items:
+        columns = generate_columns(count, rng)
+        items = [dict(zip(SNAPSHOT_COLUMNS, row)) for row in zip(*(columns[c] for c in SNAPSHOT_COLUMNS))]
+        snapshot = CatalogSnapshot()
+        start = time.perf_counter()
+        snapshot.load(columns)
+        load_ms = (time.perf_counter() - start) * 1000
+
+        summary = snapshot.summary(CRITERIA, "category")
+        assert {g["category"]: [g["total_items"], g["total_stock"], g["total_value"]]
+                for g in summary["groups"]} == python_summary(items)
+
+        results = {
+            "summary by category": (best_ms(lambda: snapshot.summary(CRITERIA, "category"), args.repeat),
+                                    best_ms(lambda: python_summary(items), 1)),
+            "weight quartiles by type": (
+                best_ms(lambda: snapshot.distribution("weight", CRITERIA, "type", [25, 50, 75]), args.repeat),
+                best_ms(lambda: python_distribution(items), 1)),
+            "histogram of value": (best_ms(lambda: snapshot.histogram("value", CRITERIA, 50), args.repeat), None),
+        }
+
+        updates = [{**items[rng.randrange(count)], "stock": rng.randint(0, 20)} for _ in range(args.writes)]
+        start = time.perf_counter()
+        for item in updates:
+            snapshot.apply_change(item, item)
+        write_us = (time.perf_counter() - start) / args.writes * 1e6
+
+        print(f"items={count}  load {load_ms:.0f} ms  {snapshot.stats()['array_bytes'] / 2 ** 20:.1f} MiB  "
+              f"apply_change {write_us:.2f} us/write")
+        for name, (numpy_ms, python_ms) in results.items():
+            speedup = f"{python_ms:10.1f} ms python  {python_ms / numpy_ms:6.1f}x" if python_ms else ""
+            print(f"  {name:<26}: {numpy_ms:8.2f} ms numpy  {speedup}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Change feed benchmark: how long a stock change takes to reach every open stream, and the database reads per second
+the streams cost, for many subscribers sharing the ChangeFeed polling loop vs each subscriber polling
+GET /items/changes?since= on its own.
+
+The writer adjusts the stock of one item --writes times through the service, at --rate writes/s; the stock after a
+write tells which write a change came from, and its latency is the time from the write returning to the change
+reaching the subscriber. The shared loop is woken by the writes like the service's feed is, so its latency is that
+of writes made by the same process; changes made elsewhere wait for the next poll either way.
+
+Usage:
+    python benchmarks/bench_change_feed.py --subscribers 10,100,500 --writes 200 --rate 50 --poll-interval 0.5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import close_async_pool  # noqa: E402
+from repositories.async_magic_item_repository import AsyncMagicItemRepository  # noqa: E402
+from services.async_magic_item_service import AsyncMagicItemService  # noqa: E402
+from services.change_feed import ChangeFeed  # noqa: E402
+
+
+class CountingFetch:
+    def __init__(self):
+        self.reads = 0
+
+    async def __call__(self, since: int, limit: int):
+        self.reads += 1
+        return await AsyncMagicItemRepository.get_changes(since, limit)
+
+
+async def write(item_id: int, writes: int, rate: float, written_at: dict, notify):
+    for _ in range(writes):
+        result = await AsyncMagicItemService.adjust_stock([{"item_id": item_id, "delta": 1}])
+        written_at[result["lines"][0]["stock"]] = time.perf_counter()
+        notify()
+        await asyncio.sleep(1 / rate)
+
+
+async def receive(changes, item_id: int, last_stock: int, written_at: dict, latencies: list):
+    async for change in changes:
+        if change["item_id"] != item_id:
+            continue
+        stock = change["item"]["stock"]
+        # The write has returned before its change can be read, unless this loop ran first
+        latencies.append(time.perf_counter() - written_at.get(stock, time.perf_counter()))
+        if stock == last_stock:
+            return
+
+
+async def poll_alone(fetch: CountingFetch, since: int, poll_interval: float):
+    while True:
+        changes = await fetch(since, 1000)
+        for change in changes:
+            yield change
+        if changes:
+            since = changes[-1]["seq"]
+        else:
+            await asyncio.sleep(poll_interval)
+
+
+async def run(shared: bool, subscribers: int, args) -> dict:
+    item = (await AsyncMagicItemService.create_items([{"name": "Benchmark feed item", "stock": 0}]))[0]
+    since = (await AsyncMagicItemService.get_changes(0, 1))["last_seq"]
+    while page := (await AsyncMagicItemService.get_changes(since, 1000))["changes"]:
+        since = page[-1]["seq"]
+
+    fetch = CountingFetch()
+    feed = ChangeFeed(fetch, poll_interval=args.poll_interval)
+    written_at, latencies = {}, []
+    streams = [feed.subscribe(since) if shared else poll_alone(fetch, since, args.poll_interval)
+               for _ in range(subscribers)]
+    readers = [asyncio.ensure_future(receive(stream, item["id"], args.writes, written_at, latencies))
+               for stream in streams]
+    await asyncio.sleep(0.1)
+    start, reads = time.perf_counter(), fetch.reads
+    try:
+        # The service wakes its own feed after a write, wake this one the same way
+        await write(item["id"], args.writes, args.rate, written_at, feed.notify if shared else lambda: None)
+        await asyncio.wait_for(asyncio.gather(*readers), 60)
+    finally:
+        for stream in streams:
+            await stream.aclose()
+        await AsyncMagicItemService.delete_item(item["id"])
+    elapsed = time.perf_counter() - start
+    latencies = np.array(latencies) * 1000
+    return {"p50": np.percentile(latencies, 50), "p99": np.percentile(latencies, 99),
+            "reads_per_s": (fetch.reads - reads) / elapsed}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=lambda value: [int(count) for count in value.split(",")],
+                        default=[10, 100, 500])
+    parser.add_argument("--writes", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=50, help="writes per second")
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    args = parser.parse_args()
+
+    runs = []
+    try:
+        for subscribers in args.subscribers:
+            for shared in (False, True):
+                runs.append((subscribers, shared, await run(shared, subscribers, args)))
+    finally:
+        await close_async_pool()
+
+    print(f"writes={args.writes} rate={args.rate}/s poll_interval={args.poll_interval}s")
+    for subscribers, shared, result in runs:
+        mode = "shared loop" if shared else "own polling"
+        print(f"{subscribers:>5} subscribers, {mode:<11}: p50 {result['p50']:7.1f} ms  p99 {result['p99']:7.1f} ms  "
+              f"{result['reads_per_s']:8.1f} reads/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
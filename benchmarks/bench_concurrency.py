@@ -0,0 +1,104 @@
+"""
+Concurrency benchmark: requests/sec of the blocking (sync service) request path vs the async one.
+
+The "sync" app reproduces the previous controllers, which were declared `async def` but called the
+synchronous MagicItemService, so every query blocked the event loop. The "async" app mounts the real
+controller router. Both are driven in-process through httpx's ASGI transport at the same concurrency.
+
+Every --slow-every'th request is a slow query (`pg_sleep(--slow-ms)`), standing in for a heavy report or
+a query stuck on a lock. On the blocking path it stalls every other in-flight request; on the async
+path the rest keep being served. With --slow-every 0 only the raw per-request overhead is compared.
+
+Usage:
+    python benchmarks/bench_concurrency.py --concurrency 50 --requests 2000 --slow-every 20 --slow-ms 50
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI, HTTPException
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from controllers.magic_item_controller import router  # noqa: E402
+from db import async_pooled_connection, close_async_pool, get_cursor  # noqa: E402
+from services.magic_item_service import MagicItemService  # noqa: E402
+
+sync_app = FastAPI()
+async_app = FastAPI()
+async_app.include_router(router, prefix="/items")
+
+
+@sync_app.get("/items/{item_id}")
+async def blocking_get_item_by_id(item_id: int):
+    item = MagicItemService.get_item_by_id(item_id)
+    if not item:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return item._asdict()
+
+
+@sync_app.get("/bench/slow")
+async def blocking_slow_query(ms: int):
+    with get_cursor() as cursor:
+        cursor.execute("SELECT pg_sleep(%s)", (ms / 1000,))
+    return {}
+
+
+@async_app.get("/bench/slow")
+async def slow_query(ms: int):
+    async with async_pooled_connection() as conn:
+        await conn.execute("SELECT pg_sleep(%s)", (ms / 1000,))
+    return {}
+
+
+async def run(app, item_ids, concurrency: int, total: int, slow_every: int, slow_ms: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    queue = asyncio.Queue()
+    for i in range(total):
+        if slow_every and i % slow_every == 0:
+            queue.put_nowait(f"/bench/slow?ms={slow_ms}")
+        else:
+            queue.put_nowait(f"/items/{item_ids[i % len(item_ids)]}")
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            while not queue.empty():
+                response = await client.get(queue.get_nowait())
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return total / elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--slow-every", type=int, default=20, help="every Nth request is slow, 0 disables")
+    parser.add_argument("--slow-ms", type=int, default=50)
+    args = parser.parse_args()
+
+    item_ids = [item.id for item in MagicItemService.get_all_items()]
+    if not item_ids:
+        sys.exit("magic_items is empty, seed it first (e.g. POST 70_dummy_Items.json to /items/create)")
+
+    runs = {}
+    for name, app in (("sync (blocking) path", sync_app), ("async path", async_app)):
+        await run(app, item_ids, args.concurrency, min(args.requests, 200), 0, 0)  # warm up the pool
+        runs[name] = await run(app, item_ids, args.concurrency, args.requests, args.slow_every, args.slow_ms)
+    await close_async_pool()
+
+    print(f"concurrency={args.concurrency} requests={args.requests} "
+          f"slow_every={args.slow_every} slow_ms={args.slow_ms}")
+    for name, rps in runs.items():
+        print(f"{name:<21}: {rps:10.1f} req/s")
+    print(f"{'speedup':<21}: {runs['async path'] / runs['sync (blocking) path']:10.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,285 @@
+"""
+Endpoint benchmark suite: p50/p95/p99 latency and throughput of every /items route, per catalog size.
+
+For each --catalog-sizes entry the benchmark database is emptied and seeded with that many items generated
+from the shape of 70_dummy_Items.json (names, descriptions, categories and types of the templates, levels,
+values and stock drawn around them, --seed makes runs reproducible). Every route of magic_item_controller.py
+is then driven through the ASGI app with httpx at --concurrency, one route at a time, after a short warm up.
+
+The items are seeded into a separate database (--database, created on first use and migrated with
+apply_migrations.py), so the data in the database configured in your .env is never touched.
+
+Results are written as JSON to --output, a baseline to diff against a later run with --compare.
+
+Usage:
+    python benchmarks/bench_endpoints.py --catalog-sizes 1000,10000 --concurrency 20 --requests 500
+    python benchmarks/bench_endpoints.py --compare benchmarks/results/endpoints_1a2b3c4.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+import psycopg2
+from fastapi import FastAPI
+from psycopg2 import sql
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import services.async_magic_item_service as async_magic_item_service  # noqa: E402
+from apply_migrations import apply_migrations  # noqa: E402
+from config import Config  # noqa: E402
+from controllers.magic_item_controller import router  # noqa: E402
+from db import close_async_pool, close_pool, get_cursor  # noqa: E402
+from repositories.magic_item_repository import BULK_INSERT_QUERY, bulk_insert_params  # noqa: E402
+
+app = FastAPI()
+app.include_router(router, prefix="/items")
+
+SEED_BATCH_SIZE = 5000
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def use_benchmark_database(name: str):
+    """
+    Create the benchmark database if needed, point Config at it and bring its schema up to date.
+    """
+    conn = psycopg2.connect(host=Config.DATABASE_HOST, port=Config.DATABASE_PORT, user=Config.DATABASE_USER,
+                            password=Config.DATABASE_PASSWORD, database=Config.DATABASE_NAME)
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_database WHERE datname = %s", (name,))
+            if cursor.fetchone() is None:
+                cursor.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(name)))
+    finally:
+        conn.close()
+    Config.DATABASE_NAME = name
+    apply_migrations()
+
+
+def generate_items(count: int, rng: random.Random) -> list:
+    with open(os.path.join(ROOT, "70_dummy_Items.json"), "r") as f:
+        templates = json.load(f)
+    items = []
+    for n in range(count):
+        template = templates[n % len(templates)]
+        items.append({
+            "name": f"{template['name']} #{n // len(templates) + 1}",
+            "description": template["description"],
+            "level": max(1, template["level"] + rng.randint(-3, 3)),
+            "type": template["type"],
+            "category": template["category"],
+            "value": max(1, int(template["value"] * rng.uniform(0.5, 1.5))),
+            "stock": rng.randint(1, 20),
+            "weight": rng.uniform(0.1, 10.0),
+            "durability": rng.uniform(0.1, 0.9),
+            "rarity_value": rng.uniform(0.0, 100.0),
+        })
+    return items
+
+
+async def seed(count: int, rng: random.Random):
+    """
+    Replace the benchmark catalog with count generated items, ids 1..count.
+    """
+    items = generate_items(count, rng)
+    with get_cursor() as cursor:
+        cursor.execute("TRUNCATE magic_items RESTART IDENTITY")
+        for start in range(0, count, SEED_BATCH_SIZE):
+            cursor.execute(BULK_INSERT_QUERY, bulk_insert_params(items[start:start + SEED_BATCH_SIZE]))
+        cursor.execute("ANALYZE magic_items")
+    # The catalog was replaced behind the service's back
+    async_magic_item_service.statistics_cache.invalidate()
+    await async_magic_item_service.item_cache.backend.clear()
+
+
+def endpoints(catalog_size: int, rng: random.Random) -> tuple:
+    """
+    One (name, request factory) pair per route, in run order, and the list of ids /create fills and /delete
+    removes. A request factory returns (method, url, json body), or None to skip the request.
+    """
+    created_ids = []
+    categories = ["Armor", "Weapon", "Potion", "Accessory", "Artifact"]
+
+    def item_id():
+        return rng.randint(1, catalog_size)
+
+    def adjust_stock():
+        lines = []
+        for line_item_id in rng.sample(range(1, catalog_size + 1), min(5, catalog_size)):
+            lines += [{"item_id": line_item_id, "delta": 1}, {"item_id": line_item_id, "delta": -1}]
+        return "POST", "/items/adjust_stock", lines
+
+    def delete_created_item():
+        # Only items /create made are deleted; once they are all gone (e.g. creates failed) the request is skipped
+        return ("DELETE", f"/items/delete/{created_ids.pop()}", None) if created_ids else None
+
+    return [
+        ("GET /", lambda: ("GET", "/items/", None)),
+        ("GET /all", lambda: ("GET", f"/items/all?limit=100&after_id={item_id()}", None)),
+        ("GET /all?stream", lambda: ("GET", f"/items/all?stream=true&after_id={max(0, catalog_size - 1000)}",
+                                     None)),
+        ("GET /statistics", lambda: ("GET", "/items/statistics", None)),
+        ("GET /statistics?refresh", lambda: ("GET", "/items/statistics?refresh=true", None)),
+        ("GET /statistics/cache", lambda: ("GET", "/items/statistics/cache", None)),
+        ("GET /item_cache", lambda: ("GET", "/items/item_cache", None)),
+        ("GET /query_cache", lambda: ("GET", "/items/query_cache", None)),
+        ("GET /search", lambda: ("GET", f"/items/search?category={rng.choice(categories)}"
+                                        f"&min_level={rng.randint(1, 10)}&max_value={rng.randint(100, 5000)}",
+                                 None)),
+        ("GET /search?rarity_tier", lambda: ("GET", f"/items/search?rarity_tier={rng.choice(['Epic', 'Legendary'])}"
+                                                    f"&tier_counts=true", None)),
+        ("GET /search?q", lambda: ("GET", f"/items/search?q={rng.choice(['cloak', 'fire', 'sword', 'potion'])}"
+                                          f"&fuzzy=false", None)),
+        ("GET /search?q fuzzy", lambda: ("GET", f"/items/search?q={rng.choice(['clok', 'swrd', 'potoin'])}",
+                                         None)),
+        ("POST /search", lambda: ("POST", "/items/search", {
+            "where": {"category": rng.sample(categories, 2), "level": {"gte": rng.randint(1, 10)}},
+            "any_of": [{"rarity_tier": ["Epic", "Legendary"]}, {"value": {"gte": rng.randint(1000, 5000)}}],
+            "sort": ["-value"], "limit": 50})),
+        ("GET /{item_id}", lambda: ("GET", f"/items/{item_id()}", None)),
+        ("POST /create", lambda: ("POST", "/items/create", {"name": f"Benchmark item {rng.random()}",
+                                                             "category": "Artifact", "type": "Gem", "level": 1,
+                                                             "value": 10, "stock": 1})),
+        ("POST /adjust_stock", adjust_stock),
+        ("POST /{item_id}/increase_stock", lambda: ("POST", f"/items/{item_id()}/increase_stock?quantity=1", None)),
+        ("POST /{item_id}/decrease_stock", lambda: ("POST", f"/items/{item_id()}/decrease_stock?quantity=1", None)),
+        ("PUT /update_item/{item_id}", lambda: ("PUT", f"/items/update_item/{item_id()}",
+                                                {"value": rng.randint(1, 5000)})),
+        ("DELETE /delete/{item_id}", delete_created_item),
+    ], created_ids
+
+
+async def run(client: httpx.AsyncClient, make_request, total: int, concurrency: int,
+              created_ids: list) -> dict:
+    remaining = total
+    latencies = []
+    errors = skipped = 0
+
+    async def worker():
+        nonlocal remaining, errors, skipped
+        while remaining > 0:
+            remaining -= 1
+            request = make_request()
+            if request is None:
+                skipped += 1
+                continue
+            method, url, body = request
+            start = time.perf_counter()
+            response = await client.request(method, url, json=body)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+            elif method == "POST" and url == "/items/create":
+                created_ids.append(response.json()["id"])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+
+    def percentile(p: float) -> float:
+        # Nearest rank, in milliseconds
+        if not latencies:
+            return 0.0
+        return round(latencies[max(0, int(round(p / 100 * len(latencies))) - 1)] * 1000, 3)
+
+    return {"requests": len(latencies), "skipped": skipped, "errors": errors,
+            "throughput": round(len(latencies) / elapsed, 1),
+            "p50_ms": percentile(50), "p95_ms": percentile(95), "p99_ms": percentile(99)}
+
+
+async def benchmark(args) -> dict:
+    rng = random.Random(args.seed)
+    results = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                 timeout=None) as client:
+        for catalog_size in args.catalog_sizes:
+            await seed(catalog_size, rng)
+            routes, created_ids = endpoints(catalog_size, rng)
+            results[str(catalog_size)] = {}
+            for name, make_request in routes:
+                await run(client, make_request, args.warmup, min(args.concurrency, args.warmup), created_ids)
+                results[str(catalog_size)][name] = await run(client, make_request, args.requests,
+                                                             args.concurrency, created_ids)
+                print(f"catalog={catalog_size:<8} {name:<32} {format_result(results[str(catalog_size)][name])}")
+    await close_async_pool()
+    close_pool()
+    return results
+
+
+def format_result(result: dict) -> str:
+    return (f"{result['throughput']:9.1f} req/s  p50 {result['p50_ms']:8.2f} ms  p95 {result['p95_ms']:8.2f} ms  "
+            f"p99 {result['p99_ms']:8.2f} ms  errors {result['errors']}"
+            + (f"  skipped {result['skipped']}" if result.get("skipped") else ""))
+
+
+def compare(baseline: dict, current: dict):
+    print(f"\nvs {baseline['meta']['commit']} ({baseline['meta']['created_at']}), "
+          f"change in throughput / p95 (negative p95 is faster):")
+    for catalog_size, routes in current["results"].items():
+        for name, result in routes.items():
+            before = baseline["results"].get(catalog_size, {}).get(name)
+            if before is None or not before["throughput"]:
+                continue
+            throughput = (result["throughput"] / before["throughput"] - 1) * 100
+            p95 = (result["p95_ms"] / before["p95_ms"] - 1) * 100 if before["p95_ms"] else 0.0
+            print(f"catalog={catalog_size:<8} {name:<32} {throughput:+8.1f}% req/s  {p95:+8.1f}% p95")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--catalog-sizes", type=lambda value: [int(size) for size in value.split(",")],
+                        default=[1000, 10000], help="comma separated, e.g. 1000,10000,100000")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=500, help="measured requests per route")
+    parser.add_argument("--warmup", type=int, default=50, help="unmeasured requests per route first")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database", default="magic_items_bench")
+    parser.add_argument("--output", help="default: benchmarks/results/endpoints_<commit>.json")
+    parser.add_argument("--compare", help="a previous --output file to diff against")
+    args = parser.parse_args()
+
+    use_benchmark_database(args.database)
+    results = asyncio.run(benchmark(args))
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "catalog_sizes": args.catalog_sizes,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", f"endpoints_{report['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {output}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Conditional GET benchmark: requests/sec and bytes sent for repeat reads of GET /items/all pages, GET /items/search
+and GET /items/{item_id}, downloading the response every time vs revalidating it with If-None-Match (a 304
+without a body while nothing changed).
+
+Requests go through the real controller router, driven in-process with httpx's ASGI transport, so the numbers are
+the server's cost without the network; over a network the bytes saved count as well.
+
+Usage:
+    python benchmarks/bench_etag.py --items 2000 --requests 1000 --concurrency 10 --page-size 1000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from controllers.magic_item_controller import router  # noqa: E402
+from db import close_async_pool  # noqa: E402
+from services.magic_item_service import MagicItemService  # noqa: E402
+
+app = FastAPI()
+app.include_router(router, prefix="/items")
+
+
+async def run(client: httpx.AsyncClient, url: str, etag: str, total: int, concurrency: int) -> tuple:
+    remaining, sent = [total], [0]
+
+    async def worker():
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            response = await client.get(url, headers={"If-None-Match": etag} if etag else {})
+            assert response.status_code == (304 if etag else 200), response.status_code
+            sent[0] += len(response.content)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return total / (time.perf_counter() - start), sent[0] / total
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=1000, help="requests per route and mode")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--page-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    items = MagicItemService.create_items([
+        {"name": f"Benchmark etag item {n}", "description": "A cloak that turns its wearer into mist. " * 4,
+         "category": "Benchmark ETag", "stock": 5} for n in range(args.items)])
+    urls = {
+        "GET /all": f"/items/all?limit={args.page_size}&after_id={items[0].id - 1}",
+        "GET /search": "/items/search?category=Benchmark%20ETag",
+        "GET /{item_id}": f"/items/{items[0].id}",
+    }
+    runs = []
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                     timeout=60) as client:
+            for route, url in urls.items():
+                etag = (await client.get(url)).headers["etag"]
+                for mode, sent_etag in (("200", None), ("304", etag)):
+                    runs.append((route, mode, *await run(client, url, sent_etag, args.requests, args.concurrency)))
+        await close_async_pool()
+    finally:
+        for item in items:
+            MagicItemService.delete_item(item.id)
+
+    print(f"items={args.items} page_size={args.page_size} concurrency={args.concurrency}")
+    for route, mode, rate, size in runs:
+        print(f"{route:<16} {mode}: {rate:9.0f} req/s  {size:10.0f} bytes/response")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,105 @@
+"""
+Bulk import benchmark: rows/sec loading a generated catalog through POST /items/create's service call in
+batches (BULK_INSERT_QUERY) vs the streaming COPY import as NDJSON and CSV, re-importing it unchanged and with
+every item updated, and exporting it again; with the peak Python memory of each run (tracemalloc).
+
+The import reads its input from a generator, so a constant peak means the memory does not grow with the rows.
+Every item has its own name, the benchmark items are deleted at the end.
+
+Usage:
+    python benchmarks/bench_import.py --rows 1000000 --batch-size 1000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+
+import orjson
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import close_async_pool, get_cursor  # noqa: E402
+from services.async_magic_item_service import AsyncMagicItemService  # noqa: E402
+
+NAME = "Benchmark import item"
+
+
+def item(n: int, stock: int) -> dict:
+    return {"name": f"{NAME} {n}", "description": "A lantern that only lights what is hidden.", "level": n % 20,
+            "type": "Lantern", "category": "Benchmark Import", "value": n % 1000, "stock": stock}
+
+
+async def ndjson(rows: int, stock: int, batch: int = 1000):
+    for start in range(0, rows, batch):
+        yield b"".join(orjson.dumps(item(n, stock)) + b"\n" for n in range(start, min(start + batch, rows)))
+
+
+async def csv(rows: int, stock: int, batch: int = 1000):
+    yield b"name,description,level,type,category,value,stock\n"
+    for start in range(0, rows, batch):
+        yield "".join(f'{row["name"]},"{row["description"]}",{row["level"]},{row["type"]},{row["category"]},'
+                      f'{row["value"]},{row["stock"]}\n'
+                      for row in map(lambda n: item(n, stock), range(start, min(start + batch, rows)))).encode()
+
+
+async def create_in_batches(rows: int, batch: int):
+    for start in range(0, rows, batch):
+        await AsyncMagicItemService.create_items([item(n, 1) for n in range(start, min(start + batch, rows))])
+
+
+async def export(format: str):
+    async for _ in AsyncMagicItemService.export_items(format):
+        pass
+
+
+def delete_benchmark_items():
+    with get_cursor() as cursor:
+        cursor.execute("DELETE FROM magic_items WHERE name LIKE %s", (f"{NAME} %",))
+
+
+async def measure(label: str, rows: int, run) -> tuple:
+    tracemalloc.start()
+    start = time.perf_counter()
+    await run
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return label, rows / elapsed, elapsed, peak
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--batch-size", type=int, default=1000, help="items per /items/create call")
+    args = parser.parse_args()
+
+    runs = []
+    delete_benchmark_items()
+    try:
+        runs.append(await measure(f"/items/create x{args.batch_size}", args.rows,
+                                  create_in_batches(args.rows, args.batch_size)))
+        delete_benchmark_items()
+        runs.append(await measure("import ndjson (new)", args.rows,
+                                  AsyncMagicItemService.import_items(ndjson(args.rows, 1))))
+        delete_benchmark_items()
+        runs.append(await measure("import csv (new)", args.rows,
+                                  AsyncMagicItemService.import_items(csv(args.rows, 1), "csv")))
+        runs.append(await measure("import csv (unchanged)", args.rows,
+                                  AsyncMagicItemService.import_items(csv(args.rows, 1), "csv")))
+        runs.append(await measure("import ndjson (updated)", args.rows,
+                                  AsyncMagicItemService.import_items(ndjson(args.rows, 2))))
+        for format in ("ndjson", "csv"):
+            runs.append(await measure(f"export {format} (whole catalog)", args.rows, export(format)))
+    finally:
+        await close_async_pool()
+        delete_benchmark_items()
+
+    print(f"rows={args.rows}")
+    for label, rate, elapsed, peak in runs:
+        print(f"{label:<30}: {rate:10.0f} rows/s  {elapsed:7.2f} s  peak {peak / 1e6:7.1f} MB")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
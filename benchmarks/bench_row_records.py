@@ -0,0 +1,70 @@
+"""
+Row representation benchmark: memory and conversion time of MagicItemRecord vs per-row dicts.
+
+Generated rows shaped like magic_items rows (the tuples a cursor returns) are converted the way the
+repository did before, dict(zip(COLUMN_NAMES, row)), and the way MagicItemRepository does now,
+MagicItemRecord._make(row). Memory is what the converted rows allocate on top of the values they share with
+the cursor rows, measured with tracemalloc; time is the fastest of --repeat conversions. No database needed.
+
+Usage:
+    python benchmarks/bench_row_records.py --rows 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from repositories.magic_item_repository import COLUMN_NAMES, rows_to_records  # noqa: E402
+
+
+def rows_to_dicts_before(rows: list) -> list:
+    return [dict(zip(COLUMN_NAMES, row)) for row in rows]
+
+
+def generate_rows(count: int, rng: random.Random) -> list:
+    return [(item_id, f"Aetherial Cloak #{item_id}",
+             "This cloak grants its wearer invisibility for up to one hour per day.", rng.randint(1, 20), "Cloak",
+             "Armor", rng.uniform(0, 100), rng.uniform(0.1, 10), rng.randint(1, 5000), rng.uniform(0.1, 0.9),
+             rng.randint(0, 20), "Common", 1) for item_id in range(1, count + 1)]
+
+
+def measure(convert, rows: list, repeat: int):
+    tracemalloc.start()
+    converted = convert(rows)
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del converted
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        convert(rows)
+        timings.append(time.perf_counter() - start)
+    return allocated, min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = generate_rows(args.rows, random.Random(42))
+    print(f"rows={args.rows}")
+    print(f"{'':<18} {'MB':>8} {'bytes/row':>10} {'ms':>8} {'us/row':>7}")
+    results = {}
+    for name, convert in (("dict per row", rows_to_dicts_before), ("MagicItemRecord", rows_to_records)):
+        allocated, elapsed = measure(convert, rows, args.repeat)
+        results[name] = (allocated, elapsed)
+        print(f"{name:<18} {allocated / 1e6:8.1f} {allocated / args.rows:10.0f} {elapsed * 1000:8.1f} "
+              f"{elapsed / args.rows * 1e6:7.2f}")
+    (dict_memory, dict_time), (record_memory, record_time) = results.values()
+    print(f"records use {dict_memory / record_memory:.1f}x less memory and convert {dict_time / record_time:.1f}x "
+          f"faster")
+
+
+if __name__ == "__main__":
+    main()
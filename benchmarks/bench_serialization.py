@@ -0,0 +1,80 @@
+"""
+Serialization microbenchmark: per-row cost of turning item rows into a JSON response.
+
+"validated" is the previous path: the rows are mapped to dicts, validated against List[MagicItemRead] by
+FastAPI's response_model and encoded with the standard json module. "orjson" is the path the item read
+routes use now: the same dicts returned as ORJSONResponse, skipping validation. Both run as real routes
+in-process through httpx's ASGI transport, on generated rows, so no database is needed.
+
+Usage:
+    python benchmarks/bench_serialization.py --rows 100,1000,10000 --repeat 20
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from typing import List
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from domain.magic_item import MagicItemRead  # noqa: E402
+from repositories.magic_item_repository import rows_to_dicts  # noqa: E402
+
+app = FastAPI()
+ROWS = {}
+
+
+@app.get("/validated", response_model=List[MagicItemRead])
+async def validated(rows: int):
+    return rows_to_dicts(ROWS[rows])
+
+
+@app.get("/orjson", response_model=List[MagicItemRead])
+async def fast(rows: int):
+    return ORJSONResponse(rows_to_dicts(ROWS[rows]))
+
+
+def generate_rows(count: int, rng: random.Random) -> list:
+    return [(item_id, f"Aetherial Cloak #{item_id}",
+             "This cloak grants its wearer invisibility for up to one hour per day.", rng.randint(1, 20), "Cloak",
+             "Armor", rng.uniform(0, 100), rng.uniform(0.1, 10), rng.randint(1, 5000), rng.uniform(0.1, 0.9),
+             rng.randint(0, 20)) for item_id in range(1, count + 1)]
+
+
+async def per_row_us(client: httpx.AsyncClient, path: str, rows: int, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = await client.get(path, params={"rows": rows})
+        timings.append(time.perf_counter() - start)
+        response.raise_for_status()
+    return min(timings) / rows * 1e6
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=lambda value: [int(rows) for rows in value.split(",")],
+                        default=[100, 1000, 10000], help="comma separated response sizes")
+    parser.add_argument("--repeat", type=int, default=20, help="requests per size, the fastest one counts")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        print(f"{'rows':>8} {'validated us/row':>18} {'orjson us/row':>15} {'speedup':>9}")
+        for rows in args.rows:
+            ROWS[rows] = generate_rows(rows, rng)
+            assert (await client.get("/validated", params={"rows": rows})).json() == \
+                   (await client.get("/orjson", params={"rows": rows})).json()
+            before = await per_row_us(client, "/validated", rows, args.repeat)
+            after = await per_row_us(client, "/orjson", rows, args.repeat)
+            print(f"{rows:>8} {before:>18.2f} {after:>15.2f} {before / after:>8.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+"""
+Cold-start benchmark: how soon `python main.py` takes traffic, per number of workers and with the database
+pool warm-up on and off (SERVER_WARM_UP).
+
+Each run starts the server as a new process and measures the seconds until /health first answers 200, the
+latency of the first database request after that against the median of the next ones, and, with a change
+stream held open, the seconds from SIGTERM until every worker has drained and the server has exited.
+
+Usage:
+    python benchmarks/bench_startup.py --workers 1,2,4 --runs 5 --port 9300
+"""
+import argparse
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def wait_until_ready(client: httpx.Client, timeout: float = 60.0) -> float:
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        try:
+            if client.get("/health").status_code == 200:
+                return time.perf_counter() - started
+        except httpx.TransportError:
+            pass
+        time.sleep(0.01)
+    raise TimeoutError(f"The server did not answer /health within {timeout} s")
+
+
+def open_stream(port: int) -> socket.socket:
+    # A stream following new changes only: this client reads nothing, and a backlog it does not read would hold the
+    # stream until the graceful shutdown timeout, as for any client that stops reading
+    stream = socket.create_connection(("127.0.0.1", port))
+    stream.sendall(b"GET /items/changes/stream?since=%d HTTP/1.1\r\nHost: bench\r\n\r\n" % 2 ** 62)
+    stream.recv(1024)  # the response has started
+    return stream
+
+
+def run_once(workers: int, warm_up: bool, port: int) -> dict:
+    env = {**os.environ, "SERVER_WARM_UP": str(warm_up).lower()}
+    launched = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "main.py", "--workers", str(workers), "--port", str(port)], cwd=ROOT,
+                              env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}") as client:
+            wait_until_ready(client)
+            ready = time.perf_counter() - launched
+            latencies = []
+            for _ in range(21):
+                started = time.perf_counter()
+                client.get("/items/all", params={"limit": 1}).raise_for_status()
+                latencies.append(time.perf_counter() - started)
+        stream = open_stream(port)
+        started = time.perf_counter()
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=120)
+        stream.close()
+        return {"ready": ready, "first_query": latencies[0], "query": statistics.median(latencies[1:]),
+                "shutdown": time.perf_counter() - started}
+    finally:
+        if server.poll() is None:
+            server.kill()
+            server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2", help="comma separated worker counts")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=9300)
+    args = parser.parse_args()
+
+    print(f"{'workers':>7} {'warm-up':>7} {'ready s':>8} {'1st query ms':>12} {'query ms':>8} {'shutdown s':>10}")
+    for workers in map(int, args.workers.split(",")):
+        for warm_up in (False, True):
+            runs = [run_once(workers, warm_up, args.port) for _ in range(args.runs)]
+            median = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+            print(f"{workers:>7} {'on' if warm_up else 'off':>7} {median['ready']:8.2f} "
+                  f"{median['first_query'] * 1000:12.1f} {median['query'] * 1000:8.1f} {median['shutdown']:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
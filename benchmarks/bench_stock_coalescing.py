@@ -0,0 +1,83 @@
+"""
+Stock coalescing benchmark: increase/decrease_stock calls/sec on a single hot item, applied one UPDATE per call
+vs coalesced per --window-ms (STOCK_COALESCE_WINDOW_MS).
+
+Every call is a POST through the real controller router, driven in-process with httpx's ASGI transport.
+Without coalescing each call takes the item's row lock in its own transaction, so concurrent calls queue
+behind each other; with it, the calls that arrive within a window share one lock and one UPDATE.
+Calls alternate between +1 and -1, so the item must end with the stock it started with.
+
+Usage:
+    python benchmarks/bench_stock_coalescing.py --concurrency 200 --requests 5000 --window-ms 5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import services.async_magic_item_service as async_magic_item_service  # noqa: E402
+from controllers.magic_item_controller import router  # noqa: E402
+from db import close_async_pool  # noqa: E402
+from services.magic_item_service import MagicItemService  # noqa: E402
+from services.stock_coalescer import StockDeltaCoalescer  # noqa: E402
+
+app = FastAPI()
+app.include_router(router, prefix="/items")
+
+INITIAL_STOCK = 1000
+
+
+async def run(item_id: int, concurrency: int, total: int) -> float:
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait("increase_stock" if i % 2 == 0 else "decrease_stock")
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def worker():
+            while not queue.empty():
+                response = await client.post(f"/items/{item_id}/{queue.get_nowait()}", params={"quantity": 1})
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return total / elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=5000, help="should be even, so the stock ends unchanged")
+    parser.add_argument("--window-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    item = MagicItemService.create_items([{"name": "Benchmark hot item", "stock": INITIAL_STOCK}])[0]
+    coalescer = StockDeltaCoalescer(args.window_ms / 1000, async_magic_item_service._flush_stock_deltas)
+    runs = {}
+    try:
+        for name, mode in (("one UPDATE per call", None), (f"coalesced ({args.window_ms:g} ms)", coalescer)):
+            async_magic_item_service.stock_coalescer = mode
+            await run(item.id, args.concurrency, min(args.requests, 200))  # warm up the pool
+            runs[name] = await run(item.id, args.concurrency, args.requests)
+        await close_async_pool()
+        stock = MagicItemService.get_item_by_id(item.id).stock
+    finally:
+        MagicItemService.delete_item(item.id)
+
+    print(f"concurrency={args.concurrency} requests={args.requests} window_ms={args.window_ms:g}")
+    for name, rps in runs.items():
+        print(f"{name:<22}: {rps:10.1f} calls/s")
+    names = list(runs)
+    print(f"{'speedup':<22}: {runs[names[1]] / runs[names[0]]:10.2f}x")
+    print(f"{'deltas per flush':<22}: {coalescer.stats()['deltas_per_flush']:10.1f}")
+    print(f"{'final stock':<22}: {stock:>10} (expected {INITIAL_STOCK})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+"""
+Sell throughput benchmark: sales/sec with the wallet balance in a single row vs spread over --shards rows
+(WALLET_SHARDS).
+
+Every sale is a POST /items/{item_id}/sell through the real controller router, driven in-process with httpx's
+ASGI transport, with an Idempotency-Key and spread over --items items so the item rows are not the bottleneck.
+With one wallet row every sale takes the same row lock until it commits, so concurrent sales queue behind each
+other; with shards they credit different rows. Afterwards the wallet must equal the ledger total and every item
+must have lost exactly the stock sold. Raise DATABASE_POOL_MAX_SIZE to let more sales run at once.
+The ledger is append-only, so the benchmark's sales stay in it: point DATABASE_NAME at a scratch database.
+
+Usage:
+    DATABASE_POOL_MAX_SIZE=50 python benchmarks/bench_transactions.py --concurrency 100 --requests 5000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+
+import httpx
+from fastapi import FastAPI
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+from controllers.magic_item_controller import router  # noqa: E402
+from db import close_async_pool, get_cursor  # noqa: E402
+from services.magic_item_service import MagicItemService  # noqa: E402
+
+app = FastAPI()
+app.include_router(router, prefix="/items")
+
+INITIAL_STOCK = 1000000
+
+
+async def run(item_ids: list, concurrency: int, total: int, rng: random.Random) -> float:
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(rng.choice(item_ids))
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def worker():
+            while not queue.empty():
+                response = await client.post(f"/items/{queue.get_nowait()}/sell", params={"quantity": 1},
+                                             headers={"Idempotency-Key": uuid.uuid4().hex})
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return total / elapsed
+
+
+def ledger_check(item_ids: list) -> tuple:
+    with get_cursor() as cursor:
+        cursor.execute("SELECT (SELECT SUM(balance) FROM wallet_shards), (SELECT SUM(amount) FROM item_transactions)")
+        balance, ledger_total = cursor.fetchone()
+        cursor.execute("SELECT SUM(%s - stock) FROM magic_items WHERE id = ANY(%s)", (INITIAL_STOCK, item_ids))
+        sold = cursor.fetchone()[0]
+        cursor.execute("SELECT SUM(quantity) FROM item_transactions WHERE item_id = ANY(%s)", (item_ids,))
+        recorded = cursor.fetchone()[0]
+    return balance == ledger_total, sold == recorded
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--items", type=int, default=1000, help="items the sales are spread over")
+    parser.add_argument("--shards", type=int, default=16)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    items = MagicItemService.create_items([{"name": f"Benchmark sale item {n}", "value": 10, "stock": INITIAL_STOCK}
+                                           for n in range(args.items)])
+    item_ids = [item.id for item in items]
+    runs = {}
+    try:
+        for name, shards in (("1 wallet row", 1), (f"{args.shards} wallet shards", args.shards)):
+            Config.WALLET_SHARDS = shards
+            await run(item_ids, args.concurrency, min(args.requests, 200), rng)  # warm up the pool
+            runs[name] = await run(item_ids, args.concurrency, args.requests, rng)
+        await close_async_pool()
+        balanced, stock_matches = ledger_check(item_ids)
+    finally:
+        for item_id in item_ids:
+            MagicItemService.delete_item(item_id)
+
+    print(f"concurrency={args.concurrency} requests={args.requests} items={args.items} "
+          f"pool={Config.DATABASE_POOL_MAX_SIZE}")
+    for name, rps in runs.items():
+        print(f"{name:<22}: {rps:10.1f} sales/s")
+    names = list(runs)
+    print(f"{'speedup':<22}: {runs[names[1]] / runs[names[0]]:10.2f}x")
+    print(f"{'wallet = ledger':<22}: {balanced!s:>10}")
+    print(f"{'stock sold = recorded':<22}: {stock_matches!s:>10}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
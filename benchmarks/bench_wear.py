@@ -0,0 +1,102 @@
+"""
+Use event benchmark: events/sec through POST /items/use at several batch sizes, and the time the vectorized
+wear rules (aggregate_uses + apply_wear) take for a large batch without the database.
+
+Every batch is a POST through the real controller router, driven in-process with httpx's ASGI transport, with
+events spread over --items items (a third of them consumables). A batch of one event is the cost of a use_item
+call per event; larger batches share one transaction and one UPDATE.
+
+Usage:
+    python benchmarks/bench_wear.py --items 1000 --events 100000 --batch-sizes 1,100,1000,10000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+import numpy as np
+from fastapi import FastAPI
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from controllers.magic_item_controller import router  # noqa: E402
+from db import close_async_pool  # noqa: E402
+from domain.wear import aggregate_uses, apply_wear  # noqa: E402
+from services.magic_item_service import MagicItemService  # noqa: E402
+
+app = FastAPI()
+app.include_router(router, prefix="/items")
+
+INITIAL_STOCK = 1000000
+
+
+async def run(item_ids: np.ndarray, events: int, batch_size: int, concurrency: int,
+              rng: np.random.Generator) -> float:
+    queue = asyncio.Queue()
+    for start in range(0, events, batch_size):
+        count = min(batch_size, events - start)
+        ids = rng.choice(item_ids, count).tolist()
+        uses = rng.integers(1, 4, count).tolist()
+        queue.put_nowait([{"item_id": item_id, "uses": n} for item_id, n in zip(ids, uses)])
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                 timeout=60) as client:
+        async def worker():
+            while not queue.empty():
+                response = await client.post("/items/use", json=queue.get_nowait())
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return events / elapsed
+
+
+def compute_ms(items: int, events: int, rng: np.random.Generator) -> float:
+    item_ids = rng.integers(1, items + 1, events)
+    uses = rng.integers(1, 4, events)
+    start = time.perf_counter()
+    ids, totals = aggregate_uses(item_ids, uses)
+    apply_wear(np.full(len(ids), INITIAL_STOCK), rng.uniform(0.1, 0.9, len(ids)), rng.random(len(ids)) < 0.33,
+               totals)
+    return (time.perf_counter() - start) * 1000
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--events", type=int, default=100000, help="events per batch size")
+    parser.add_argument("--batch-sizes", type=lambda value: [int(size) for size in value.split(",")],
+                        default=[1, 100, 1000, 10000])
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    items = MagicItemService.create_items([
+        {"name": f"Benchmark worn item {n}", "stock": INITIAL_STOCK,
+         "category": "Potion" if n % 3 == 0 else "Weapon", "type": "Potion" if n % 3 == 0 else "Sword"}
+        for n in range(args.items)])
+    item_ids = np.array([item.id for item in items])
+    runs = {}
+    try:
+        await run(item_ids, 200, 100, args.concurrency, rng)  # warm up the pool
+        for batch_size in args.batch_sizes:
+            # One event per request is slow, so fewer of them are enough for a stable rate
+            events = min(args.events, 2000 * batch_size)
+            runs[batch_size] = await run(item_ids, events, batch_size, args.concurrency, rng)
+        await close_async_pool()
+    finally:
+        for item in items:
+            MagicItemService.delete_item(item.id)
+
+    print(f"items={args.items} concurrency={args.concurrency}")
+    for batch_size, rate in runs.items():
+        print(f"batch of {batch_size:<7}: {rate:12.0f} events/s")
+    print(f"wear rules for 1M events over {args.items} items, no database: "
+          f"{compute_ms(args.items, 1000000, rng):.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
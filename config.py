@@ -10,3 +10,64 @@ class Config:
     DATABASE_USER = os.getenv("DATABASE_USER", "your_user")
     DATABASE_PASSWORD = os.getenv("DATABASE_PASSWORD", "your_password")
     DATABASE_NAME = os.getenv("DATABASE_NAME", "your_database")
+
+    DATABASE_POOL_MIN_SIZE = int(os.getenv("DATABASE_POOL_MIN_SIZE", "1"))
+    DATABASE_POOL_MAX_SIZE = int(os.getenv("DATABASE_POOL_MAX_SIZE", "10"))
+    DATABASE_POOL_TIMEOUT = float(os.getenv("DATABASE_POOL_TIMEOUT", "5.0"))
+    DATABASE_POOL_HEALTH_CHECK_IDLE = float(os.getenv("DATABASE_POOL_HEALTH_CHECK_IDLE", "30.0"))
+
+    STATISTICS_CACHE_MAX_AGE = float(os.getenv("STATISTICS_CACHE_MAX_AGE", "30.0"))
+
+    ITEMS_PAGE_SIZE = int(os.getenv("ITEMS_PAGE_SIZE", "100"))
+    ITEMS_PAGE_SIZE_MAX = int(os.getenv("ITEMS_PAGE_SIZE_MAX", "1000"))
+    ITEMS_STREAM_BATCH_SIZE = int(os.getenv("ITEMS_STREAM_BATCH_SIZE", "1000"))
+
+    ITEM_CACHE_MAX_ENTRIES = int(os.getenv("ITEM_CACHE_MAX_ENTRIES", "10000"))
+    ITEM_CACHE_TTL = float(os.getenv("ITEM_CACHE_TTL", "60.0"))
+
+    # Rarity tiers as name:lowest rarity_value, stored per item in rarity_tier. After a change run
+    # python apply_migrations.py to reclassify the existing items
+    RARITY_TIERS = os.getenv("RARITY_TIERS", "Common:0,Uncommon:50,Rare:75,Epic:90,Legendary:97")
+
+    STOCK_ADJUSTMENT_MAX_LINES = int(os.getenv("STOCK_ADJUSTMENT_MAX_LINES", "1000"))
+    # Collect increase/decrease_stock calls per item for this many milliseconds and apply them together, 0 disables
+    STOCK_COALESCE_WINDOW_MS = float(os.getenv("STOCK_COALESCE_WINDOW_MS", "0"))
+    # Sales credit one of this many wallet rows at random, so concurrent sales rarely wait on each other's row lock
+    WALLET_SHARDS = int(os.getenv("WALLET_SHARDS", "16"))
+
+    # Use events (POST /items/use): a use consumes one unit of a consumable (by category or type) and wears
+    # WEAR_PER_USE durability off any other item, whose copy in use breaks at 0 and is replaced by a copy at
+    # FULL_DURABILITY
+    CONSUMABLE_CATEGORIES = os.getenv("CONSUMABLE_CATEGORIES", "Consumable,Potion")
+    CONSUMABLE_TYPES = os.getenv("CONSUMABLE_TYPES", "Potion,Elixir,Consumable,Scroll,Beverage,Vial")
+    WEAR_PER_USE = float(os.getenv("WEAR_PER_USE", "0.05"))
+    FULL_DURABILITY = float(os.getenv("FULL_DURABILITY", "1.0"))
+    USE_EVENTS_MAX = int(os.getenv("USE_EVENTS_MAX", "100000"))
+
+    # Seconds between the change feed polls behind the open /items/changes streams, writes made by this process
+    # are sent right away
+    CHANGE_FEED_POLL_INTERVAL = float(os.getenv("CHANGE_FEED_POLL_INTERVAL", "1.0"))
+    # Days a change is kept in item_changes, 0 keeps every change. The server deletes older ones every
+    # CHANGE_FEED_PRUNE_INTERVAL seconds; a client whose position was deleted gets 410 and reads the items again
+    CHANGE_FEED_RETENTION_DAYS = float(os.getenv("CHANGE_FEED_RETENTION_DAYS", "0"))
+    CHANGE_FEED_PRUNE_INTERVAL = float(os.getenv("CHANGE_FEED_PRUNE_INTERVAL", "3600"))
+
+    # Bulk import (POST /items/import, transfer_catalog.py): NDJSON rows parsed per batch handed to COPY
+    IMPORT_BATCH_ROWS = int(os.getenv("IMPORT_BATCH_ROWS", "10000"))
+
+    # python main.py: uvicorn worker processes (0 for one per CPU core available), seconds the requests in flight
+    # get to finish on shutdown, seconds to keep taking requests while /health reports draining (for a load balancer
+    # to stop sending any), and whether a worker opens its database pool before it takes requests
+    SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+    SERVER_PORT = int(os.getenv("SERVER_PORT", "9000"))
+    SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "0"))
+    SERVER_GRACEFUL_SHUTDOWN_TIMEOUT = int(os.getenv("SERVER_GRACEFUL_SHUTDOWN_TIMEOUT", "30"))
+    SERVER_DRAIN_DELAY = float(os.getenv("SERVER_DRAIN_DELAY", "0"))
+    SERVER_WARM_UP = os.getenv("SERVER_WARM_UP", "true").lower() in ("1", "true", "yes")
+
+    # In-process NumPy copy of the catalog behind /items/analytics, loaded on first use and kept current by writes
+    ANALYTICS_SNAPSHOT_ENABLED = os.getenv("ANALYTICS_SNAPSHOT_ENABLED", "false").lower() in ("1", "true", "yes")
+    ANALYTICS_SNAPSHOT_MAX_AGE = float(os.getenv("ANALYTICS_SNAPSHOT_MAX_AGE", "300.0"))
+
+    # Per-request timings: Server-Timing header, /metrics (Prometheus) and query/row counts
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() in ("1", "true", "yes")
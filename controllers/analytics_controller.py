@@ -0,0 +1,121 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from services.async_magic_item_service import AnalyticsDisabledError, AsyncMagicItemService
+from metrics import TimedRoute
+from typing import Any, Dict, List, Literal, Optional
+
+router = APIRouter(route_class=TimedRoute)
+
+# Every route here reads the in-process analytics snapshot (ANALYTICS_SNAPSHOT_ENABLED) instead of the database:
+# the first request loads it, writes made through the API keep it current.
+
+GroupBy = Literal["category", "type", "rarity_tier", "level", "rarity_value", "weight", "value", "durability",
+                  "stock"]
+NumericColumn = Literal["level", "rarity_value", "weight", "value", "durability", "stock"]
+
+
+def analytics_filters(
+        category: Optional[str] = None,
+        type: Optional[str] = None,
+        rarity_tier: Optional[str] = None,
+        min_level: Optional[int] = None,
+        max_level: Optional[int] = None,
+        min_value: Optional[int] = None,
+        max_value: Optional[int] = None,
+        min_stock: Optional[int] = None,
+        max_stock: Optional[int] = None,
+        min_rarity: Optional[float] = None,
+        max_rarity: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    The filters shared by the analytics routes, as search criteria.
+    """
+    search_criteria = {}
+    if category:
+        search_criteria['category'] = category
+    if type:
+        search_criteria['type'] = type
+    if rarity_tier:
+        search_criteria['rarity_tier'] = rarity_tier
+    for column, minimum, maximum in (("level", min_level, max_level), ("value", min_value, max_value),
+                                     ("stock", min_stock, max_stock), ("rarity_value", min_rarity, max_rarity)):
+        if minimum is not None:
+            search_criteria[f'{column}__gte'] = minimum
+        if maximum is not None:
+            search_criteria[f'{column}__lte'] = maximum
+    return search_criteria
+
+
+@router.get("/summary", response_model=Dict[str, Any])
+async def get_summary(
+        group_by: GroupBy = "category",
+        bucket_width: float = Query(1.0, gt=0),
+        search_criteria: Dict[str, Any] = Depends(analytics_filters)
+):
+    """
+    Item count, stock, stock value (value * stock) and average/min/max value and average level of the matching
+    items per category, type, rarity tier, or per bucket of a numeric column (e.g. group_by=level&bucket_width=5).
+    """
+    try:
+        return await AsyncMagicItemService.get_analytics_summary(search_criteria, group_by, bucket_width)
+    except AnalyticsDisabledError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/histogram", response_model=Dict[str, Any])
+async def get_histogram(
+        column: NumericColumn = "value",
+        bins: int = Query(10, ge=1, le=1000),
+        min_edge: Optional[float] = None,
+        max_edge: Optional[float] = None,
+        search_criteria: Dict[str, Any] = Depends(analytics_filters)
+):
+    """
+    Histogram of a numeric column over the matching items, bins between min_edge and max_edge (both or neither,
+    the data's range by default).
+    """
+    if (min_edge is None) != (max_edge is None) or (min_edge is not None and min_edge >= max_edge):
+        raise HTTPException(status_code=400, detail="Pass both min_edge and max_edge, min_edge below max_edge")
+    value_range = (min_edge, max_edge) if min_edge is not None else None
+    try:
+        return await AsyncMagicItemService.get_analytics_histogram(column, search_criteria, bins, value_range)
+    except AnalyticsDisabledError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/distribution", response_model=Dict[str, Any])
+async def get_distribution(
+        column: NumericColumn = "value",
+        group_by: Optional[GroupBy] = None,
+        percentiles: List[float] = Query([0, 25, 50, 75, 100]),
+        bucket_width: float = Query(1.0, gt=0),
+        search_criteria: Dict[str, Any] = Depends(analytics_filters)
+):
+    """
+    Mean and percentiles (repeat the parameter, e.g. percentiles=50&percentiles=90) of a numeric column over the
+    matching items, optionally per category, type, rarity tier or bucket of a numeric column.
+    """
+    try:
+        return await AsyncMagicItemService.get_analytics_distribution(column, search_criteria, group_by,
+                                                                      percentiles, bucket_width)
+    except AnalyticsDisabledError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/snapshot", response_model=Optional[Dict[str, Any]])
+async def get_snapshot_stats():
+    """
+    Get the counters of the analytics snapshot: loads, incremental updates, items held and memory used.
+    """
+    return AsyncMagicItemService.get_analytics_snapshot_stats()
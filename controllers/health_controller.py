@@ -0,0 +1,15 @@
+from fastapi import APIRouter
+from fastapi.responses import ORJSONResponse
+from services.worker_state import worker_state
+
+router = APIRouter()
+
+
+@router.get("/health")
+async def get_health():
+    """
+    Status of the worker that answers: 200 while it takes requests, 503 while it starts or drains for a shutdown,
+    so a load balancer sends it nothing new. Also how long the worker took to start.
+    """
+    stats = worker_state.stats()
+    return ORJSONResponse(stats, status_code=200 if stats["status"] == "ready" else 503)
@@ -1,10 +1,26 @@
+import asyncio
+import orjson
 from pydantic import BaseModel
-from fastapi import APIRouter, HTTPException
-from services.magic_item_service import MagicItemService
-from domain.magic_item import CreateItemRequest, MagicItemRead, MagicItemUpdate
-from typing import List, Dict, Any, Union, Optional
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response, WebSocket
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from config import Config
+from services.async_magic_item_service import (AsyncMagicItemService, ChangesPrunedError, ItemVersionMismatchError,
+                                              TransactionRejectedError)
+from metrics import TimedRoute
+from domain.magic_item import (CreateItemRequest, MagicItemPage, MagicItemRead, MagicItemSearchResult, MagicItemUpdate,
+                               SearchRequest, StockAdjustment, UseEvent)
+from domain.etag import if_match_versions, is_not_modified, item_etag, items_etag
+from domain.transaction import ItemTransaction
+from services.catalog_transfer import MEDIA_TYPES
+from typing import AsyncIterator, Awaitable, Callable, List, Dict, Any, Union, Optional
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
+
+# Item rows come straight from our own typed table, so the item read routes return them as ORJSONResponse:
+# FastAPI then skips validating them against response_model (which still documents the schema) and orjson
+# serializes them, the bulk of the time spent on a large page or search result otherwise.
+# They also carry an ETag made of the ids and versions of the items: a client sending it back in If-None-Match
+# gets a 304 without a body when nothing changed, see _conditional_get.
 
 
 @router.get("/")
@@ -16,44 +32,122 @@ async def root():
                                                                                         "/magical_inventory_systemApi"}
 
 
-@router.get("/all", response_model=List[MagicItemRead])
-async def get_all_items():
+@router.get("/all", response_model=MagicItemPage)
+async def get_all_items(
+        limit: int = Query(Config.ITEMS_PAGE_SIZE, ge=1, le=Config.ITEMS_PAGE_SIZE_MAX),
+        after_id: int = 0,
+        stream: bool = False,
+        if_none_match: Optional[str] = Header(None)
+):
     """
-    Fetch all magic items.
+    Fetch magic items ordered by ID, one page at a time.
+    Pass the returned next_after_id as after_id to get the next page, it is null on the last page.
+    With stream=true every item after after_id is sent as NDJSON (one JSON object per line) instead.
     """
     try:
-        all_items = MagicItemService.get_all_items()
-        return all_items
+        if stream:
+            return StreamingResponse(_ndjson(AsyncMagicItemService.stream_items(after_id)),
+                                     media_type="application/x-ndjson")
+        return await _conditional_get(
+            lambda versions_only: AsyncMagicItemService.get_items_page(limit, after_id, versions_only),
+            lambda page: items_etag(page["items"], page["next_after_id"]), if_none_match)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving all items: {str(e)}")
 
 
+def _conditional_response(content: Any, etag: str, if_none_match: Optional[str]) -> Response:
+    # no-cache: a cache may keep the response but has to check it is still current (the 304) before using it
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if is_not_modified(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return ORJSONResponse(content, headers=headers)
+
+
+async def _conditional_get(load: Callable[[bool], Awaitable[Any]], etag_of: Callable[[Any], str],
+                           if_none_match: Optional[str]) -> Response:
+    # load(versions_only) reads the response, or with True just the ids and versions its ETag is made of, a
+    # fraction of the whole rows: a client whose copy is current gets its 304 without the items being read
+    if if_none_match:
+        etag = etag_of(await load(True))
+        if is_not_modified(if_none_match, etag):
+            return _conditional_response(None, etag, if_none_match)
+    content = await load(False)
+    return _conditional_response(content, etag_of(content), if_none_match)
+
+
+async def _ndjson(items: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    async for item in items:
+        yield orjson.dumps(item) + b"\n"
+
+
 @router.get("/statistics", response_model=Dict[str, Any])
-async def get_inventory_statistics():
+async def get_inventory_statistics(refresh: bool = False):
     """
     Get inventory statistics.
+    Served from a cache kept up to date by writes, pass refresh=true to recompute them in the database.
     """
     try:
-        statistics = MagicItemService.get_inventory_statistics()
+        statistics = await AsyncMagicItemService.get_inventory_statistics(refresh)
         return statistics
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/search", response_model=List[MagicItemRead])
+@router.get("/statistics/cache", response_model=Dict[str, Any])
+async def get_statistics_cache_stats():
+    """
+    Get hit/miss counters of the statistics cache.
+    """
+    return AsyncMagicItemService.get_statistics_cache_stats()
+
+
+@router.get("/item_cache", response_model=Dict[str, Any])
+async def get_item_cache_stats():
+    """
+    Get hit/miss counters of the item cache used by GET /items/{item_id}.
+    """
+    return AsyncMagicItemService.get_item_cache_stats()
+
+
+@router.get("/query_cache", response_model=Dict[str, Any])
+async def get_query_cache_stats():
+    """
+    Get hit counters of the compiled/prepared statement cache.
+    """
+    return AsyncMagicItemService.get_query_cache_stats()
+
+
+@router.get("/search", response_model=Union[List[MagicItemRead], MagicItemSearchResult])
 async def search_items(
         name: Optional[str] = None,
         category: Optional[str] = None,
         type: Optional[str] = None,
+        rarity_tier: Optional[str] = None,
         min_level: Optional[int] = None,
         max_level: Optional[int] = None,
         min_value: Optional[int] = None,
         max_value: Optional[int] = None,
         min_stock: Optional[int] = None,
-        max_stock: Optional[int] = None
+        max_stock: Optional[int] = None,
+        min_weight: Optional[float] = None,
+        max_weight: Optional[float] = None,
+        min_durability: Optional[float] = None,
+        max_durability: Optional[float] = None,
+        min_rarity: Optional[float] = None,
+        max_rarity: Optional[float] = None,
+        q: Optional[str] = None,
+        fuzzy: bool = True,
+        limit: int = Query(Config.ITEMS_PAGE_SIZE, ge=1, le=Config.ITEMS_PAGE_SIZE_MAX),
+        offset: int = Query(0, ge=0),
+        tier_counts: bool = False,
+        if_none_match: Optional[str] = Header(None)
 ):
     """
     Search for magic items based on specified criteria.
+    With q, items are matched by text over name and description (e.g. q=fire sword) and returned most
+    relevant first, limit/offset pages through the matches and fuzzy=false turns off typo tolerance.
+    With tier_counts=true the items come as {"items": [...], "rarity_tiers": [...]}, the second listing how many
+    of all the matches (not just this page) fall in each rarity tier.
     """
     try:
         search_criteria = {}
@@ -64,6 +158,8 @@ async def search_items(
             search_criteria['category'] = category
         if type:
             search_criteria['type'] = type
+        if rarity_tier:
+            search_criteria['rarity_tier'] = rarity_tier
         if min_level is not None:
             search_criteria['level__gte'] = min_level
         if max_level is not None:
@@ -76,61 +172,205 @@ async def search_items(
             search_criteria['stock__gte'] = min_stock
         if max_stock is not None:
             search_criteria['stock__lte'] = max_stock
-        # add later min/max weight, durability, rarity search criteria
+        if min_weight is not None:
+            search_criteria['weight__gte'] = min_weight
+        if max_weight is not None:
+            search_criteria['weight__lte'] = max_weight
+        if min_durability is not None:
+            search_criteria['durability__gte'] = min_durability
+        if max_durability is not None:
+            search_criteria['durability__lte'] = max_durability
+        if min_rarity is not None:
+            search_criteria['rarity_value__gte'] = min_rarity
+        if max_rarity is not None:
+            search_criteria['rarity_value__lte'] = max_rarity
 
-        matched_items = MagicItemService.search_items(search_criteria)
-        return matched_items
+        async def load(versions_only: bool):
+            if q:
+                search = AsyncMagicItemService.text_search_items(q, search_criteria, limit, offset, fuzzy,
+                                                                 versions_only)
+            else:
+                search = AsyncMagicItemService.search_items(search_criteria, versions_only)
+            if not tier_counts:
+                return await search
+            matched_items, rarity_tiers = await asyncio.gather(
+                search, AsyncMagicItemService.count_rarity_tiers(search_criteria, q or None, fuzzy))
+            return {"items": matched_items, "rarity_tiers": rarity_tiers}
+
+        if tier_counts:
+            return await _conditional_get(load, lambda result: items_etag(result["items"], result["rarity_tiers"]),
+                                          if_none_match)
+        return await _conditional_get(load, items_etag, if_none_match)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error searching items: {str(e)}")
 
 
-# if i want to add search criteria from magic_item.py (it changes to POST request)
-# @router.post("/search", response_model=List[MagicItemRead])
-# async def search_items(search_criteria: SearchCriteria):
-#     """
-#     Search for magic items based on specified criteria.
-#     """
-#     try:
-#         matched_items = MagicItemService.search_items(search_criteria.dict())
-#         return matched_items
-#     except Exception as e:
-#         raise HTTPException(status_code=500, detail=f"Error searching items: {str(e)}")
+@router.post("/search", response_model=List[MagicItemRead])
+async def structured_search_items(search: SearchRequest):
+    """
+    Search for magic items with a JSON body, e.g.
+    {"where": {"category": ["Armor", "Weapon"], "level": {"gte": 5, "lte": 10}},
+     "any_of": [{"rarity_tier": ["Epic", "Legendary"]}, {"value": {"gte": 1000}}],
+     "sort": ["-value", "name"], "limit": 50, "offset": 0}
+    Items match every condition of where and, when any_of is given, all the conditions of at least one of its
+    filters. Lists match any of their values, ranges are inclusive and either bound may be left out.
+    sort orders by columns ("-" for descending, NULLs sort above every value), ties by ID.
+    """
+    try:
+        return ORJSONResponse(await AsyncMagicItemService.structured_search_items(search.dict(exclude_none=True)))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/changes", response_model=Dict[str, Any])
+async def get_changes(
+        since: int = Query(0, ge=0),
+        limit: int = Query(Config.ITEMS_PAGE_SIZE_MAX, ge=1, le=Config.ITEMS_PAGE_SIZE_MAX)
+):
+    """
+    Get what changed since the last call instead of downloading every item again: {"changes": [...],
+    "last_seq": n}, pass last_seq as since next time (start with 0, or with the last_seq of an empty call to skip
+    the history). Each change has seq, op (create, update, stock when only the stock changed, or delete), item_id,
+    the item after the change (before it for a delete) and changed_at, in the order they were made.
+    Changes older than CHANGE_FEED_RETENTION_DAYS may be deleted: since 0 starts from the oldest change kept, a
+    since before it is answered with 410, read the items again and follow from since 0.
+    """
+    try:
+        return ORJSONResponse(await AsyncMagicItemService.get_changes(since, limit))
+    except ChangesPrunedError as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/changes/stream")
+async def stream_changes(since: int = Query(0, ge=0), last_event_id: Optional[int] = Header(None)):
+    """
+    The changes after since as Server-Sent Events (one event per change, its op as event type, its seq as id and
+    the change as JSON data), then every new change as it is made. A reconnecting EventSource sends the
+    Last-Event-ID header and resumes after it. A since whose changes are no longer kept is answered with 410.
+    """
+    since = max(since, last_event_id or 0)
+    try:
+        await AsyncMagicItemService.get_changes(since, 1)  # fails before the response starts, as a status
+    except ChangesPrunedError as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return StreamingResponse(_server_sent_events(AsyncMagicItemService.stream_changes(since)),
+                             media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+async def _server_sent_events(changes: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    async for change in changes:
+        yield b"id: %d\nevent: %s\ndata: %s\n\n" % (change["seq"], change["op"].encode(), orjson.dumps(change))
+
+
+@router.websocket("/changes/ws")
+async def changes_websocket(websocket: WebSocket, since: int = Query(0, ge=0)):
+    """
+    The changes after since, then every new change as it is made, one JSON text message per change. A since whose
+    changes are no longer kept closes the socket with code 4410.
+    """
+    await websocket.accept()
+    try:
+        await AsyncMagicItemService.get_changes(since, 1)
+    except ChangesPrunedError as e:
+        await websocket.close(code=4410, reason=str(e)[:120])  # a close reason is limited to 123 bytes
+        return
+    except Exception:
+        await websocket.close(code=1011)
+        return
+
+    async def send_changes():
+        async for change in AsyncMagicItemService.stream_changes(since):
+            await websocket.send_text(orjson.dumps(change).decode())
+
+    async def wait_for_disconnect():
+        # Nothing is expected from the client, reading just notices when it goes away
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    sender, receiver = asyncio.create_task(send_changes()), asyncio.create_task(wait_for_disconnect())
+    done, pending = await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+    for task in pending:
+        task.cancel()
+    if sender in done and sender.exception() is not None:
+        await websocket.close(code=1011)  # the feed failed, the client reconnects from its last seq
+    elif sender in done:
+        await websocket.close(code=1001)  # the server is going away, the client reconnects to another
+
+
+@router.get("/changes/stats", response_model=Dict[str, Any])
+async def get_change_feed_stats():
+    """
+    Get the counters of the change feed streams: subscribers, polls and changes sent out.
+    """
+    return AsyncMagicItemService.get_change_feed_stats()
+
+
+@router.post("/import", response_model=Dict[str, Any])
+async def import_items(request: Request, format: str = "ndjson"):
+    """
+    Create or update many items from the request body, NDJSON (one item object per line) or CSV with a header row
+    (format=csv), streamed to the database as it is received: a catalog of millions of items is one request.
+    Items are matched by name: the oldest item of a name gets the columns the row has, a new name becomes an item
+    with stock 1 and random weight, durability and rarity unless the row has them. The last row of a name wins, an
+    export can be imported again. Every row is imported or, with 400 and the failing line, none is. Returns the
+    counts of rows read, duplicates, items created, updated and unchanged.
+    """
+    try:
+        return await AsyncMagicItemService.import_items(request.stream(), format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error importing items: {str(e)}")
+
+
+@router.get("/export")
+async def export_items(format: str = "ndjson"):
+    """
+    Download every item ordered by ID, as NDJSON (one item per line) or CSV with a header row (format=csv),
+    streamed from the database whatever the size of the catalog.
+    """
+    try:
+        blocks = AsyncMagicItemService.export_items(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(blocks, media_type=MEDIA_TYPES[format],
+                             headers={"Content-Disposition": f'attachment; filename="magic_items.{format}"'})
 
 
 @router.get("/{item_id}", response_model=MagicItemRead)
-async def get_item_by_id(item_id: int):
+async def get_item_by_id(item_id: int, if_none_match: Optional[str] = Header(None)):
     """
     Fetch a magic item by its ID.
+    Send the ETag of the copy you have as If-None-Match to get a 304 without a body if it has not changed.
     """
     try:
-        item = MagicItemService.get_item_by_id(item_id)
-        if item:
-            return item
-        else:
-            raise HTTPException(status_code=404, detail="Item not found")
+        item = await AsyncMagicItemService.get_item_by_id(item_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving item by ID: {str(e)}")
+    if not item:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return _conditional_response(item, item_etag(item), if_none_match)
 
 
 @router.post("/create")
 async def create_item(item_data: Union[CreateItemRequest, List[CreateItemRequest]]):
     """
     Create new magic items with random values for weight, durability, and rarity.
-    Can add single item or a list of items
+    Can add single item or a list of items, a list is stored all-or-nothing in one transaction
     """
     try:
         # If a single item is provided, convert it to a list with one item
         if isinstance(item_data, CreateItemRequest):
             item_data = [item_data]
 
-        created_items = []
-        for data in item_data:
-            # Convert Pydantic model to dictionary
-            item_data_dict = data.dict()
-
-            # Call the service to create the item and generate random values
-            created_item = MagicItemService.generate_random_values(item_data_dict)
-            created_items.append(created_item)
+        # Generate random values for every item and insert them all in one transaction
+        created_items = await AsyncMagicItemService.create_items([data.dict() for data in item_data])
 
         # If only one item was provided, return it instead of a list
         if len(created_items) == 1:
@@ -141,13 +381,48 @@ async def create_item(item_data: Union[CreateItemRequest, List[CreateItemRequest
         raise HTTPException(status_code=500, detail=f"Error creating item: {str(e)}")
 
 
+@router.post("/adjust_stock", response_model=Dict[str, Any])
+async def adjust_stock(adjustments: List[StockAdjustment]):
+    """
+    Apply many stock changes at once, e.g. every line of an order: [{"item_id": 1, "delta": -2}, ...].
+    All lines are applied in one transaction or none is. Each line reports its status and resulting stock,
+    a batch that would leave an item missing or below zero stock is rejected with 409 and the same report.
+    """
+    if not adjustments or len(adjustments) > Config.STOCK_ADJUSTMENT_MAX_LINES:
+        raise HTTPException(status_code=400,
+                            detail=f"Send between 1 and {Config.STOCK_ADJUSTMENT_MAX_LINES} stock adjustments")
+    try:
+        report = await AsyncMagicItemService.adjust_stock([line.dict() for line in adjustments])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error adjusting stock: {str(e)}")
+    if not report['applied']:
+        raise HTTPException(status_code=409, detail=report)
+    return report
+
+
+@router.post("/use", response_model=Dict[str, Any])
+async def use_items(events: List[UseEvent]):
+    """
+    Apply a batch of use events, e.g. [{"item_id": 1, "uses": 3}, {"item_id": 7}, ...] (uses defaults to 1).
+    A use drinks a consumable (one less in stock) or wears down any other item, which loses a unit of stock when
+    the copy in use breaks at durability 0 and continues with a fresh copy. Items out of stock are skipped.
+    The whole batch is one transaction and one UPDATE, send events in batches rather than one per request.
+    """
+    if not events or len(events) > Config.USE_EVENTS_MAX:
+        raise HTTPException(status_code=400, detail=f"Send between 1 and {Config.USE_EVENTS_MAX} use events")
+    try:
+        return await AsyncMagicItemService.use_items([event.dict() for event in events])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/{item_id}/increase_stock")
 async def increase_stock(item_id: int, quantity: int):
     """
     Increase the stock of a specific item (id).
     """
     try:
-        updated_item = MagicItemService.increase_stock(item_id, quantity)
+        updated_item = await AsyncMagicItemService.increase_stock(item_id, quantity)
         if updated_item:
             return updated_item
         else:
@@ -162,7 +437,7 @@ async def decrease_stock(item_id: int, quantity: int):
     decrease the stock of a specific item (id).
     """
     try:
-        updated_item = MagicItemService.decrease_stock(item_id, quantity)
+        updated_item = await AsyncMagicItemService.decrease_stock(item_id, quantity)
         if updated_item:
             return updated_item
         else:
@@ -171,20 +446,71 @@ async def decrease_stock(item_id: int, quantity: int):
         raise HTTPException(status_code=400, detail=f"Error decreasing stock: {str(e)}")
 
 
+@router.post("/{item_id}/sell", response_model=ItemTransaction)
+async def sell_item(
+        item_id: int,
+        quantity: int = Query(1, ge=1),
+        unit_price: Optional[int] = Query(None, ge=0),
+        idempotency_key: Optional[str] = Header(None, max_length=255)
+):
+    """
+    Sell items: the stock goes down by quantity and quantity * unit_price (the item's value by default) goes
+    into the wallet, in one transaction, recorded in the ledger (/wallet/transactions).
+    Send an Idempotency-Key header to make retries safe: a key already used returns the recorded sale, with
+    replayed=true, instead of selling again. Rejected with 409 if there is not enough stock.
+    """
+    return await _trade(AsyncMagicItemService.sell_item, item_id, quantity, unit_price, idempotency_key)
+
+
+@router.post("/{item_id}/buy", response_model=ItemTransaction)
+async def buy_item(
+        item_id: int,
+        quantity: int = Query(1, ge=1),
+        unit_price: Optional[int] = Query(None, ge=0),
+        idempotency_key: Optional[str] = Header(None, max_length=255)
+):
+    """
+    Buy items: the stock goes up by quantity and quantity * unit_price (the item's value by default) is paid
+    from the wallet, in one transaction, recorded in the ledger. Idempotency-Key works as for /sell.
+    Rejected with 409 if the wallet balance does not cover it.
+    """
+    return await _trade(AsyncMagicItemService.buy_item, item_id, quantity, unit_price, idempotency_key)
+
+
+async def _trade(operation, item_id: int, quantity: int, unit_price: Optional[int],
+                 idempotency_key: Optional[str]) -> ORJSONResponse:
+    try:
+        entry = await operation(item_id, quantity, unit_price, idempotency_key)
+    except TransactionRejectedError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return ORJSONResponse(entry)
+
+
 @router.put("/update_item/{item_id}")
-async def update_item(item_id: int, update_data: MagicItemUpdate):
+async def update_item(item_id: int, update_data: MagicItemUpdate, response: Response,
+                      if_match: Optional[str] = Header(None)):
     """
-    Create a new magic item with random values for weight, durability, and rarity.
+    Update the given fields of a magic item.
+    Send the ETag you read the item with as If-Match to update it only if nobody has changed it since, it is
+    rejected with 412 (and the current ETag) otherwise. The response carries the new ETag.
     """
+    expected_versions = if_match_versions(if_match, item_id) if if_match else None
     try:
         update_data_dict = update_data.dict(exclude_unset=True)
-        updated_item = MagicItemService.update_item(item_id, update_data_dict)
-        if updated_item:
-            return updated_item
-        else:
-            raise HTTPException(status_code=404, detail="Item not found")
+        updated_item = await AsyncMagicItemService.update_item(item_id, update_data_dict, expected_versions)
+    except ItemVersionMismatchError as e:
+        raise HTTPException(status_code=412, detail=str(e),
+                            headers={"ETag": item_etag({"id": e.item_id, "version": e.version})})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating item: {str(e)}")
+    if not updated_item:
+        raise HTTPException(status_code=404, detail="Item not found")
+    response.headers["ETag"] = item_etag(updated_item)
+    return updated_item
 
 
 @router.delete("/delete/{item_id}")
@@ -193,7 +519,7 @@ async def delete_item(item_id: int):
     Delete a magic item by its ID.
     """
     try:
-        deleted_item = MagicItemService.delete_item(item_id)
+        deleted_item = await AsyncMagicItemService.delete_item(item_id)
         if deleted_item:
             return {"message": "Item deleted successfully"}
         else:
@@ -0,0 +1,36 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import ORJSONResponse
+from config import Config
+from domain.transaction import ItemTransactionPage, WalletBalance
+from services.async_magic_item_service import AsyncMagicItemService
+from metrics import TimedRoute
+
+router = APIRouter(route_class=TimedRoute)
+
+# Money moves through /items/{item_id}/sell and /items/{item_id}/buy, these routes read the result.
+
+
+@router.get("", response_model=WalletBalance)
+async def get_wallet_balance():
+    """
+    Get the wallet balance: the value of every sale minus every purchase.
+    """
+    try:
+        return await AsyncMagicItemService.get_wallet_balance()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/transactions", response_model=ItemTransactionPage)
+async def get_transactions(
+        limit: int = Query(Config.ITEMS_PAGE_SIZE, ge=1, le=Config.ITEMS_PAGE_SIZE_MAX),
+        after_id: int = 0
+):
+    """
+    Fetch the sell/buy ledger, oldest first, one page at a time.
+    Pass the returned next_after_id as after_id to get the next page, it is null on the last page.
+    """
+    try:
+        return ORJSONResponse(await AsyncMagicItemService.get_transactions_page(limit, after_id))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,6 +1,19 @@
+import asyncio
+import os
+import threading
+import time
 import psycopg2
-from contextlib import contextmanager
+from psycopg2 import extensions
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
+from contextlib import contextmanager, asynccontextmanager
 from config import Config
+from metrics import InstrumentedAsyncCursor, InstrumentedCursor, add_phase
+
+
+class PoolExhaustedError(Exception):
+    """
+    Raised when no pooled connection becomes available within the checkout timeout.
+    """
 
 
 def get_connection():
@@ -9,18 +22,298 @@ def get_connection():
         port=Config.DATABASE_PORT,
         user=Config.DATABASE_USER,
         password=Config.DATABASE_PASSWORD,
-        database=Config.DATABASE_NAME
+        database=Config.DATABASE_NAME,
+        cursor_factory=InstrumentedCursor if Config.METRICS_ENABLED else None
     )
 
 
+class ConnectionPool:
+    """
+    A thread-safe pool of psycopg2 connections.
+
+    Connections are opened lazily up to max_size and kept open between requests, so the
+    TCP + auth handshake is paid once per connection instead of once per repository call.
+    """
+
+    def __init__(self, min_size: int = 1, max_size: int = 10, timeout: float = 5.0,
+                 health_check_idle: float = 30.0, connect=get_connection):
+        """
+        Args:
+            min_size (int): Number of connections opened up front and kept when idle.
+            max_size (int): Upper bound of open connections.
+            timeout (float): Seconds to wait for a free connection before raising PoolExhaustedError.
+            health_check_idle (float): Connections idle longer than this are pinged on checkout.
+            connect (callable): Factory returning a new DB-API connection.
+        """
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min={min_size}, max={max_size}")
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_idle = health_check_idle
+        self.pid = os.getpid()
+        self._connect = connect
+        self._idle = []  # (connection, returned_at) pairs, most recently returned last
+        self._in_use = set()
+        self._opening = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._stats = {
+            "checkouts": 0,
+            "timeouts": 0,
+            "connections_created": 0,
+            "connections_discarded": 0,
+            "health_checks_failed": 0,
+        }
+        for _ in range(min_size):
+            self._idle.append((self._new_connection(), time.monotonic()))
+
+    def _new_connection(self):
+        conn = self._connect()
+        with self._cond:
+            self._stats["connections_created"] += 1
+        return conn
+
+    def _size(self) -> int:
+        return len(self._idle) + len(self._in_use) + self._opening
+
+    def _is_healthy(self, conn, idle_since: float) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - idle_since < self.health_check_idle:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._stats["connections_discarded"] += 1
+
+    def getconn(self):
+        """
+        Check a connection out of the pool.
+        Returns:
+            connection: A healthy connection, owned by the caller until putconn().
+        Raises:
+            PoolExhaustedError: If no connection is available within the pool timeout.
+        """
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise PoolExhaustedError("Connection pool is closed")
+                while not self._idle and self._size() >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolExhaustedError(
+                            f"No connection available within {self.timeout}s (max_size={self.max_size})")
+                    self._cond.wait(remaining)
+                if self._idle:
+                    conn, idle_since = self._idle.pop()
+                    self._in_use.add(conn)
+                else:
+                    conn, idle_since = None, None
+                    self._opening += 1
+
+            if conn is None:
+                try:
+                    conn = self._new_connection()
+                finally:
+                    with self._cond:
+                        self._opening -= 1
+                        if conn is not None:
+                            self._in_use.add(conn)
+                        else:
+                            self._cond.notify()
+            elif not self._is_healthy(conn, idle_since):
+                with self._cond:
+                    self._in_use.discard(conn)
+                    self._stats["health_checks_failed"] += 1
+                    self._cond.notify()
+                self._discard(conn)
+                continue
+
+            with self._cond:
+                self._stats["checkouts"] += 1
+            return conn
+
+    def putconn(self, conn, discard: bool = False):
+        """
+        Return a connection to the pool. Connections left inside a transaction are rolled back.
+        Args:
+            conn: The connection previously returned by getconn().
+            discard (bool): Close the connection instead of keeping it for reuse.
+        """
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                discard = True
+        discard = discard or conn.closed
+        with self._cond:
+            self._in_use.discard(conn)
+            keep = not discard and not self._closed
+            if keep:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        if not keep:
+            self._discard(conn)
+
+    def close(self):
+        """
+        Close all idle connections and refuse further checkouts.
+        """
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self) -> dict:
+        """
+        Get a snapshot of the pool counters.
+        Returns:
+            dict: Pool sizing and usage counters.
+        """
+        with self._cond:
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size(),
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                **self._stats,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """
+    Get the process-wide connection pool, creating it on first use.
+    A pool inherited through fork() is never reused; the child opens its own.
+    """
+    global _pool
+    if _pool is None or _pool.pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool.pid != os.getpid():
+                _pool = ConnectionPool(
+                    min_size=Config.DATABASE_POOL_MIN_SIZE,
+                    max_size=Config.DATABASE_POOL_MAX_SIZE,
+                    timeout=Config.DATABASE_POOL_TIMEOUT,
+                    health_check_idle=Config.DATABASE_POOL_HEALTH_CHECK_IDLE,
+                )
+    return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool.pid == os.getpid():
+            _pool.close()
+        _pool = None
+
+
 @contextmanager
-def get_cursor():
-    conn = get_connection()
+def pooled_connection():
+    """
+    Borrow a connection from the pool for one transaction.
+    Commits on success, rolls back on error and always returns the connection to the pool.
+    """
+    started = time.perf_counter()
+    pool = get_pool()
+    conn = pool.getconn()
+    add_phase("db_connect", started)
     try:
-        yield conn.cursor()
+        yield conn
         conn.commit()
     except Exception as e:
-        conn.rollback()
+        if not conn.closed:
+            conn.rollback()
         raise e
     finally:
-        conn.close()
+        pool.putconn(conn)
+
+
+@contextmanager
+def get_cursor():
+    with pooled_connection() as conn:
+        with conn.cursor() as cursor:
+            yield cursor
+
+
+_async_pool = None
+_async_pool_pid = None
+_async_pool_lock = asyncio.Lock()
+
+
+async def get_async_pool() -> AsyncConnectionPool:
+    """
+    Get the process-wide asyncio connection pool (psycopg 3), opening it on first use.
+    """
+    global _async_pool, _async_pool_pid
+    if _async_pool is None or _async_pool_pid != os.getpid():
+        async with _async_pool_lock:
+            if _async_pool is None or _async_pool_pid != os.getpid():
+                _async_pool, _async_pool_pid = await _open_async_pool(), os.getpid()
+    return _async_pool
+
+
+async def _open_async_pool() -> AsyncConnectionPool:
+    pool = AsyncConnectionPool(
+        kwargs={
+            "host": Config.DATABASE_HOST,
+            "port": Config.DATABASE_PORT,
+            "user": Config.DATABASE_USER,
+            "password": Config.DATABASE_PASSWORD,
+            "dbname": Config.DATABASE_NAME,
+            **({"cursor_factory": InstrumentedAsyncCursor} if Config.METRICS_ENABLED else {}),
+        },
+        min_size=Config.DATABASE_POOL_MIN_SIZE,
+        max_size=Config.DATABASE_POOL_MAX_SIZE,
+        timeout=Config.DATABASE_POOL_TIMEOUT,
+        check=AsyncConnectionPool.check_connection,
+        open=False,
+    )
+    await pool.open()
+    return pool
+
+
+async def close_async_pool():
+    global _async_pool, _async_pool_pid
+    if _async_pool is not None and _async_pool_pid == os.getpid():
+        await _async_pool.close()
+    _async_pool, _async_pool_pid = None, None
+
+
+@asynccontextmanager
+async def async_pooled_connection():
+    """
+    Borrow an async connection for one transaction.
+    Commits on success, rolls back on error and always returns the connection to the pool.
+    Raises:
+        PoolExhaustedError: If no connection is available within the pool timeout.
+    """
+    started = time.perf_counter()
+    pool = await get_async_pool()
+    try:
+        async with pool.connection() as conn:
+            add_phase("db_connect", started)
+            yield conn
+    except PoolTimeout as e:
+        raise PoolExhaustedError(str(e)) from e
@@ -0,0 +1,55 @@
+import hashlib
+from typing import Any, Iterable, List, Optional
+from domain.magic_item import MagicItemRecord
+
+# Part of every ETag, so the ETags handed out before the item layout changed (e.g. a column added) stop matching
+ITEM_LAYOUT = hashlib.blake2b(",".join(MagicItemRecord._fields).encode(), digest_size=4).hexdigest()
+
+
+def item_etag(item: dict) -> str:
+    """
+    Strong ETag of one item, from its id and version: it changes with every write that changes the item.
+    """
+    return f'"{ITEM_LAYOUT}-{item["id"]}-{item["version"]}"'
+
+
+def items_etag(items: Iterable[dict], *extra: Any) -> str:
+    """
+    Strong ETag of a list of items (a page or search result) from their ids and versions in order, plus whatever
+    else the response holds (extra, e.g. next_after_id), without serializing the items.
+    """
+    digest = hashlib.blake2b(repr(extra).encode(), digest_size=16)
+    digest.update(b",".join(b"%d.%d" % (item["id"], item["version"]) for item in items))
+    return f'"{ITEM_LAYOUT}-{digest.hexdigest()}"'
+
+
+def parse_etags(header: str) -> List[str]:
+    """
+    The entity tags of an If-Match or If-None-Match header, weak ones with their W/ prefix, ["*"] for *.
+    """
+    if header.strip() == "*":
+        return ["*"]
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def is_not_modified(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Whether an If-None-Match header lists etag, i.e. the client already has the response (weak comparison).
+    """
+    if not if_none_match:
+        return False
+    tags = parse_etags(if_none_match)
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+def if_match_versions(if_match: str, item_id: int) -> Optional[List[int]]:
+    """
+    The versions of an item an If-Match header allows a write on (strong comparison: weak tags and tags of other
+    items match nothing), None for * (any version).
+    """
+    tags = parse_etags(if_match)
+    if "*" in tags:
+        return None
+    prefix = f'"{ITEM_LAYOUT}-{item_id}-'
+    return [int(tag[len(prefix):-1]) for tag in tags
+            if tag.startswith(prefix) and tag.endswith('"') and tag[len(prefix):-1].isdigit()]
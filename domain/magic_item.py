@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, NamedTuple, Optional
+from config import Config
 
 
 class MagicItemBase(BaseModel):
@@ -21,13 +22,49 @@ class MagicItemCreate(MagicItemBase):
 class MagicItemRead(MagicItemBase):
     id: int
     rarity_value: float
-
-    # rarity_category: str
+    rarity_tier: Optional[str] = None
+    version: Optional[int] = None
 
     class Config:
         orm_mode = True
 
 
+class MagicItemPage(BaseModel):
+    items: List[MagicItemRead]
+    next_after_id: Optional[int] = None
+
+
+class RarityTierCount(BaseModel):
+    rarity_tier: Optional[str]
+    total_items: int
+
+
+class MagicItemSearchResult(BaseModel):
+    items: List[MagicItemRead]
+    rarity_tiers: List[RarityTierCount]
+
+
+class MagicItemRecord(NamedTuple):
+    """
+    One magic_items row as returned by MagicItemRepository: a tuple in the column order every repository query
+    selects (ITEM_COLUMNS), readable by name (item.stock). _asdict() turns it into a dict, _replace() into a
+    changed copy.
+    """
+    id: int
+    name: str
+    description: Optional[str]
+    level: Optional[int]
+    type: Optional[str]
+    category: Optional[str]
+    rarity_value: float
+    weight: Optional[float]
+    value: Optional[int]
+    durability: Optional[float]
+    stock: Optional[int]
+    rarity_tier: Optional[str]
+    version: Optional[int]
+
+
 class CreateItemRequest(BaseModel):
     name: str
     description: str = None
@@ -49,14 +86,51 @@ class MagicItemUpdate(BaseModel):
     value: Optional[int] = None
     stock: Optional[int] = None
 
-# class SearchCriteria(BaseModel):
-#     name: Optional[str]
-#     description: Optional[str]
-#     level: Optional[int]
-#     type: Optional[str]
-#     category: Optional[str]
-#     rarity_value: Optional[float]
-#     weight: Optional[float]
-#     value: Optional[int]
-#     durability: Optional[float]
-#     stock: Optional[int]
+
+class StockAdjustment(BaseModel):
+    item_id: int
+    delta: int  # positive to increase, negative to decrease
+
+
+class UseEvent(BaseModel):
+    item_id: int
+    uses: int = Field(1, ge=1, le=1000000)  # bounded so the per-item sums stay exact in aggregate_uses
+
+
+class RangeFilter(BaseModel):
+    gte: Optional[float] = None
+    lte: Optional[float] = None
+
+    class Config:
+        extra = "forbid"
+
+
+class SearchFilter(BaseModel):
+    """
+    Conditions an item must all match: a list of values for an IN match, an inclusive range for a numeric column.
+    """
+    id: Optional[List[int]] = None
+    name: Optional[List[str]] = None
+    type: Optional[List[str]] = None
+    category: Optional[List[str]] = None
+    rarity_tier: Optional[List[str]] = None
+    level: Optional[RangeFilter] = None
+    rarity_value: Optional[RangeFilter] = None
+    weight: Optional[RangeFilter] = None
+    value: Optional[RangeFilter] = None
+    durability: Optional[RangeFilter] = None
+    stock: Optional[RangeFilter] = None
+
+    class Config:
+        extra = "forbid"
+
+
+class SearchRequest(BaseModel):
+    where: SearchFilter = SearchFilter()  # all of these
+    any_of: List[SearchFilter] = Field(default_factory=list, max_length=20)  # and at least one of these, if any
+    sort: List[str] = Field(default_factory=list, max_length=5)  # e.g. ["-value", "name"], "-" for descending
+    limit: int = Field(Config.ITEMS_PAGE_SIZE, ge=1, le=Config.ITEMS_PAGE_SIZE_MAX)
+    offset: int = Field(0, ge=0)
+
+    class Config:
+        extra = "forbid"
@@ -0,0 +1,59 @@
+import re
+from bisect import bisect_right
+from typing import List, Optional, Tuple
+from config import Config
+
+TIER_NAME = re.compile(r'^[A-Za-z][A-Za-z ]{0,31}$')
+
+
+def parse_rarity_tiers(spec: str) -> List[Tuple[str, float]]:
+    """
+    Parse tier thresholds such as "Common:0,Rare:75,Legendary:97" (name:lowest rarity_value of the tier).
+    Returns:
+        List[Tuple[str, float]]: (tier, threshold) pairs, lowest threshold first.
+    Raises:
+        ValueError: On a malformed entry, a duplicate tier or a duplicate threshold.
+    """
+    tiers = []
+    for entry in spec.split(","):
+        name, _, threshold = entry.partition(":")
+        name = name.strip()
+        if not TIER_NAME.match(name):
+            raise ValueError(f"Invalid rarity tier name: {name!r}")
+        tiers.append((name, float(threshold)))
+    tiers.sort(key=lambda tier: tier[1])
+    if len({name for name, _ in tiers}) != len(tiers) or len({t for _, t in tiers}) != len(tiers):
+        raise ValueError(f"Duplicate rarity tier or threshold in {spec!r}")
+    return tiers
+
+
+RARITY_TIERS = parse_rarity_tiers(Config.RARITY_TIERS)
+RARITY_TIER_NAMES = [name for name, _ in RARITY_TIERS]
+_THRESHOLDS = [threshold for _, threshold in RARITY_TIERS]
+
+
+def rarity_tier(rarity_value: Optional[float]) -> Optional[str]:
+    """
+    Classify a rarity_value: the tier with the highest threshold not above it, the lowest tier below every
+    threshold.
+    """
+    if rarity_value is None:
+        return None
+    return RARITY_TIER_NAMES[max(bisect_right(_THRESHOLDS, rarity_value) - 1, 0)]
+
+
+def rarity_tier_rank(tier: Optional[str]) -> Tuple[int, int]:
+    """
+    Sort key putting tiers in threshold order, tiers no longer configured and NULL last.
+    """
+    if tier in RARITY_TIER_NAMES:
+        return 0, RARITY_TIER_NAMES.index(tier)
+    return (1, 0) if tier is not None else (2, 0)
+
+
+def rarity_tier_sql(column: str = "rarity_value") -> str:
+    """
+    The rarity_tier() classification as a SQL CASE expression over column.
+    """
+    cases = " ".join(f"WHEN {column} >= {threshold!r} THEN '{name}'" for name, threshold in reversed(RARITY_TIERS))
+    return f"CASE WHEN {column} IS NULL THEN NULL {cases} ELSE '{RARITY_TIER_NAMES[0]}' END"
@@ -0,0 +1,26 @@
+from datetime import datetime
+from pydantic import BaseModel
+from typing import List, Optional
+
+
+class ItemTransaction(BaseModel):
+    id: int
+    idempotency_key: Optional[str]
+    kind: str  # sell or buy
+    item_id: int
+    quantity: int
+    unit_price: int
+    amount: int  # added to the wallet, negative for a purchase
+    stock_after: Optional[int]
+    created_at: datetime
+    replayed: bool = False  # true when the idempotency key was already recorded and this is that entry
+
+
+class ItemTransactionPage(BaseModel):
+    items: List[ItemTransaction]
+    next_after_id: Optional[int] = None
+
+
+class WalletBalance(BaseModel):
+    balance: int
+    shards: int
@@ -0,0 +1,63 @@
+from typing import Optional, Tuple
+import numpy as np
+from config import Config
+
+CONSUMABLE_CATEGORIES = frozenset(name.strip() for name in Config.CONSUMABLE_CATEGORIES.split(",") if name.strip())
+CONSUMABLE_TYPES = frozenset(name.strip() for name in Config.CONSUMABLE_TYPES.split(",") if name.strip())
+FULL_DURABILITY = Config.FULL_DURABILITY
+
+
+def is_consumable(category: Optional[str], type: Optional[str]) -> bool:
+    """
+    Whether a use consumes the item (a potion is drunk) rather than wearing it down (a sword is swung).
+    """
+    return category in CONSUMABLE_CATEGORIES or type in CONSUMABLE_TYPES
+
+
+def aggregate_uses(item_ids: np.ndarray, uses: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sum the uses of a batch of use events per item.
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The distinct item ids, ascending, and their total uses.
+    """
+    ids, inverse = np.unique(item_ids, return_inverse=True)
+    return ids, np.bincount(inverse, weights=uses, minlength=len(ids)).astype(np.int64)
+
+
+def apply_wear(stock: np.ndarray, durability: np.ndarray, consumable: np.ndarray, uses: np.ndarray,
+               wear_per_use: float = Config.WEAR_PER_USE,
+               full_durability: float = FULL_DURABILITY) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Apply the total uses of a batch to many items at once.
+    A consumable loses one unit of stock per use. Any other item loses wear_per_use durability per use: the copy
+    in use breaks when its durability reaches 0, the stock goes down by one and the next copy starts at
+    full_durability, so enough uses can break several copies. Stock never goes below 0, the durability of an item
+    whose last copy broke is 0, and items out of stock are left as they are. An item in stock at durability 0 was
+    restocked after its last copy broke, its copy in use is a new one at full_durability.
+    Args:
+        stock (np.ndarray): Current stock per item, integers (NULL as 0).
+        durability (np.ndarray): Durability of the copy in use per item, floats (NULL as full_durability).
+        consumable (np.ndarray): Booleans, see is_consumable.
+        uses (np.ndarray): Total uses per item in the batch.
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The new stock and durability per item.
+    """
+    stock = np.asarray(stock, dtype=np.int64)
+    durability = np.asarray(durability, dtype=np.float64)
+    consumable = np.asarray(consumable, dtype=bool)
+    uses = np.asarray(uses, dtype=np.int64)
+    durability = np.where((stock > 0) & (durability <= 0) & ~consumable, full_durability, durability)
+    wear = uses * wear_per_use
+    # How far the wear goes past the durability left: 0 breaks exactly the copy in use, each further
+    # full_durability breaks one more
+    overshoot = wear - durability
+    breaks = overshoot >= 0
+    broken = np.where(breaks, 1 + np.floor(np.where(breaks, overshoot, 0) / full_durability), 0).astype(np.int64)
+    worn_durability = np.where(breaks, full_durability - np.mod(np.where(breaks, overshoot, 0), full_durability),
+                               durability - wear)
+
+    removed = np.minimum(np.where(consumable, uses, broken), stock)
+    new_stock = stock - removed
+    new_durability = np.where(consumable, durability, np.where(new_stock == 0, 0.0, worn_durability))
+    in_stock = stock > 0
+    return np.where(in_stock, new_stock, stock), np.where(in_stock, new_durability, durability)
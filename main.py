@@ -1,12 +1,142 @@
+from services.worker_state import worker_state  # first, so the startup time counts the imports below
+import argparse
+import asyncio
+import logging
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+import uvicorn
 from fastapi import FastAPI
+from uvicorn.supervisors import Multiprocess
+from config import Config
+from controllers import analytics_controller, health_controller, metrics_controller, wallet_controller
 from controllers.magic_item_controller import router
+from db import close_async_pool, close_pool, get_async_pool
+from metrics import TimingMiddleware
+from services.async_magic_item_service import AsyncMagicItemService
 
-app = FastAPI()
+logger = logging.getLogger("uvicorn.error")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs in every worker before it takes a request: the pools and caches are the worker's own, made here or on
+    # first use, never inherited from the process that started it
+    started = time.monotonic()
+    if Config.SERVER_WARM_UP:
+        await warm_up()
+    worker_state.ready(time.monotonic() - started)
+    logger.info("Worker %d ready in %.2f s (warm-up %.2f s)", os.getpid(), worker_state.startup_seconds,
+                worker_state.warm_up_seconds)
+    pruner = asyncio.create_task(prune_changes()) if Config.CHANGE_FEED_RETENTION_DAYS > 0 else None
+    yield
+    if pruner is not None:
+        pruner.cancel()
+    worker_state.drain()
+    AsyncMagicItemService.close_change_feed()
+    await close_async_pool()
+    close_pool()
+
+
+async def warm_up():
+    """
+    Open DATABASE_POOL_MIN_SIZE connections of the async pool, so the first requests do not wait for them.
+    A database that cannot be reached yet does not stop the worker: requests connect on demand once it can.
+    """
+    try:
+        pool = await get_async_pool()
+        await pool.wait(timeout=Config.DATABASE_POOL_TIMEOUT)
+    except Exception as e:
+        logger.warning("Worker %d could not open database connections ahead of requests: %s", os.getpid(), e)
+
+
+async def prune_changes():
+    """
+    Delete the changes older than CHANGE_FEED_RETENTION_DAYS every CHANGE_FEED_PRUNE_INTERVAL seconds. Every worker
+    runs this, one at a time prunes and the others skip that round.
+    """
+    while True:
+        try:
+            pruned = await AsyncMagicItemService.prune_changes()
+            if pruned:
+                logger.info("Pruned %d changes older than %g days", pruned, Config.CHANGE_FEED_RETENTION_DAYS)
+        except Exception as e:
+            logger.warning("Could not prune the change feed: %s", e)
+        await asyncio.sleep(Config.CHANGE_FEED_PRUNE_INTERVAL)
+
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(router, prefix="/items")
+app.include_router(analytics_controller.router, prefix="/items/analytics")
+app.include_router(wallet_controller.router, prefix="/wallet")
+app.include_router(metrics_controller.router)
+app.include_router(health_controller.router)
+if Config.METRICS_ENABLED:
+    app.add_middleware(TimingMiddleware)
+
+
+class DrainingServer(uvicorn.Server):
+    """
+    uvicorn server that drains before it shuts down: /health turns 503 and, after SERVER_DRAIN_DELAY seconds of
+    still taking requests, the change streams end, which would otherwise hold their connections until the
+    graceful shutdown timeout. Then uvicorn stops accepting connections and waits for the requests in flight.
+    """
+
+    async def shutdown(self, sockets=None):
+        worker_state.drain()
+        if Config.SERVER_DRAIN_DELAY > 0:
+            logger.info("Draining for %.1f s", Config.SERVER_DRAIN_DELAY)
+            await asyncio.sleep(Config.SERVER_DRAIN_DELAY)
+        AsyncMagicItemService.close_change_feed()
+        await super().shutdown(sockets)
+
+
+def cpu_limit() -> int:
+    """
+    The number of CPU cores this process can use: the cores it may run on, or fewer under a container CPU quota
+    (cgroup v2 cpu.max).
+    """
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:  # not on Linux
+        cores = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as file:
+            quota, period = file.read().split()
+        if quota != "max":
+            cores = min(cores, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cores
+
+
+def worker_count(workers: int = 0) -> int:
+    """
+    Args:
+        workers (int): Worker processes asked for, 0 for the default.
+    Returns:
+        int: workers, or one per CPU core by default; a worker's requests are async, so it keeps its core busy.
+    """
+    return workers if workers > 0 else cpu_limit()
 
 
 def main():
-    print("Start")
+    parser = argparse.ArgumentParser(description="Serve the API with one uvicorn worker process per CPU core.")
+    parser.add_argument("--host", default=Config.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=Config.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=Config.SERVER_WORKERS, help="0 for one per CPU core")
+    args = parser.parse_args()
+
+    config = uvicorn.Config("main:app", host=args.host, port=args.port, workers=worker_count(args.workers),
+                            timeout_graceful_shutdown=Config.SERVER_GRACEFUL_SHUTDOWN_TIMEOUT)
+    server = DrainingServer(config)
+    if config.workers == 1:
+        server.run()
+    else:
+        # The workers are started fresh (spawned, not forked) and share the socket bound here; on SIGTERM or
+        # SIGINT every worker drains before it exits
+        Multiprocess(config, target=server.run, sockets=[config.bind_socket()]).run()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,305 @@
+import asyncio
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, Optional, Tuple
+
+import psycopg2.extensions
+from fastapi.routing import APIRoute
+from psycopg import AsyncCursor
+from starlette.datastructures import MutableHeaders
+
+from config import Config
+
+# Request durations histogram buckets, in seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestTimings:
+    """
+    Time spent per phase, queries run and rows fetched while handling one request.
+
+    Phases: db_connect (waiting for a pooled connection), db_execute, db_fetch, rows_to_dict or rows_to_records,
+    handler (the endpoint function, db phases included) and validation (request parsing plus response validation
+    and serialization of the response model).
+    """
+    __slots__ = ("phases", "queries", "rows")
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.queries = 0
+        self.rows = 0
+
+    def add(self, phase: str, seconds: float):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def server_timing(self, total: float) -> str:
+        """
+        Format the timings as a Server-Timing header value, durations in milliseconds.
+        """
+        entries = [f"{phase};dur={seconds * 1000:.2f}" for phase, seconds in self.phases.items()]
+        entries.append(f'db_queries;desc="{self.queries} queries, {self.rows} rows"')
+        entries.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(entries)
+
+
+# Set by TimingMiddleware for the duration of a request. The hooks below do nothing while it is None,
+# which is always the case when METRICS_ENABLED is off.
+_current_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current_timings.get()
+
+
+def add_phase(phase: str, started: float):
+    """
+    Record the time since started (a time.perf_counter() value) under phase, if a request is being timed.
+    """
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add(phase, time.perf_counter() - started)
+
+
+@contextmanager
+def timed(phase: str):
+    """
+    Time the enclosed block under phase, if a request is being timed.
+    """
+    timings = _current_timings.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(phase, time.perf_counter() - started)
+
+
+def _count_rows(rows: int):
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.rows += rows
+
+
+class InstrumentedCursor(psycopg2.extensions.cursor):
+    """
+    psycopg2 cursor recording execute/fetch time, queries and rows into the current request's timings.
+    """
+
+    def execute(self, query, vars=None):
+        timings = _current_timings.get()
+        if timings is None:
+            return super().execute(query, vars)
+        timings.queries += 1
+        with timed("db_execute"):
+            return super().execute(query, vars)
+
+    def fetchone(self):
+        with timed("db_fetch"):
+            row = super().fetchone()
+        _count_rows(row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        with timed("db_fetch"):
+            rows = super().fetchmany(size) if size is not None else super().fetchmany()
+        _count_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        with timed("db_fetch"):
+            rows = super().fetchall()
+        _count_rows(len(rows))
+        return rows
+
+
+class InstrumentedAsyncCursor(AsyncCursor):
+    """
+    psycopg 3 counterpart of InstrumentedCursor, used by the asyncio pool.
+    """
+
+    async def execute(self, query, params=None, **kwargs):
+        timings = _current_timings.get()
+        if timings is None:
+            return await super().execute(query, params, **kwargs)
+        timings.queries += 1
+        with timed("db_execute"):
+            return await super().execute(query, params, **kwargs)
+
+    async def fetchone(self):
+        with timed("db_fetch"):
+            row = await super().fetchone()
+        _count_rows(row is not None)
+        return row
+
+    async def fetchmany(self, size: int = 0):
+        with timed("db_fetch"):
+            rows = await super().fetchmany(size)
+        _count_rows(len(rows))
+        return rows
+
+    async def fetchall(self):
+        with timed("db_fetch"):
+            rows = await super().fetchall()
+        _count_rows(len(rows))
+        return rows
+
+
+class TimedRoute(APIRoute):
+    """
+    APIRoute splitting a request into the endpoint call (handler) and everything FastAPI does around it
+    (validation). Behaves like a plain APIRoute when METRICS_ENABLED is off.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if Config.METRICS_ENABLED:
+            self.dependant.call = _timed_call(self.dependant.call)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        if not Config.METRICS_ENABLED:
+            return handler
+
+        async def timed_handler(request):
+            timings = _current_timings.get()
+            if timings is None:
+                return await handler(request)
+            handler_before = timings.phases.get("handler", 0.0)
+            started = time.perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                spent = time.perf_counter() - started
+                timings.add("validation", spent - (timings.phases.get("handler", 0.0) - handler_before))
+
+        return timed_handler
+
+
+def _timed_call(call):
+    if asyncio.iscoroutinefunction(call):
+        @wraps(call)
+        async def timed_call(*args, **kwargs):
+            with timed("handler"):
+                return await call(*args, **kwargs)
+    else:
+        @wraps(call)
+        def timed_call(*args, **kwargs):
+            with timed("handler"):
+                return call(*args, **kwargs)
+    return timed_call
+
+
+class MetricsRegistry:
+    """
+    Request metrics aggregated per route, rendered in the Prometheus text format. Each worker process keeps its
+    own registry.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DURATION_BUCKETS):
+        self.buckets = buckets
+        self._requests = defaultdict(int)  # (method, route, status) -> count
+        self._durations = {}  # (method, route) -> [count per bucket..., count, sum]
+        self._phases = defaultdict(float)  # (route, phase) -> seconds
+        self._queries = defaultdict(int)  # route -> queries
+        self._rows = defaultdict(int)  # route -> rows
+
+    def observe(self, method: str, route: str, status: int, duration: float, timings: RequestTimings):
+        self._requests[(method, route, status)] += 1
+        histogram = self._durations.setdefault((method, route), [0] * (len(self.buckets) + 2))
+        for i, bound in enumerate(self.buckets):
+            if duration <= bound:
+                histogram[i] += 1
+        histogram[-2] += 1
+        histogram[-1] += duration
+        for phase, seconds in timings.phases.items():
+            self._phases[(route, phase)] += seconds
+        self._queries[route] += timings.queries
+        self._rows[route] += timings.rows
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format (version 0.0.4).
+        """
+        lines = ["# HELP magic_items_http_requests_total Requests handled.",
+                 "# TYPE magic_items_http_requests_total counter"]
+        for (method, route, status), count in sorted(self._requests.items()):
+            lines.append(f"magic_items_http_requests_total{_labels(method=method, route=route, status=status)} "
+                         f"{count}")
+
+        lines += ["# HELP magic_items_http_request_duration_seconds Time to handle a request.",
+                  "# TYPE magic_items_http_request_duration_seconds histogram"]
+        for (method, route), histogram in sorted(self._durations.items()):
+            for bound, count in zip(self.buckets + ("+Inf",), histogram[:len(self.buckets)] + [histogram[-2]]):
+                lines.append(f"magic_items_http_request_duration_seconds_bucket"
+                             f"{_labels(method=method, route=route, le=bound)} {count}")
+            lines.append(f"magic_items_http_request_duration_seconds_count{_labels(method=method, route=route)} "
+                         f"{histogram[-2]}")
+            lines.append(f"magic_items_http_request_duration_seconds_sum{_labels(method=method, route=route)} "
+                         f"{histogram[-1]}")
+
+        lines += ["# HELP magic_items_request_phase_seconds_total Time spent per request phase.",
+                  "# TYPE magic_items_request_phase_seconds_total counter"]
+        for (route, phase), seconds in sorted(self._phases.items()):
+            lines.append(f"magic_items_request_phase_seconds_total{_labels(route=route, phase=phase)} {seconds}")
+
+        lines += ["# HELP magic_items_db_queries_total Queries executed.",
+                  "# TYPE magic_items_db_queries_total counter"]
+        for route, count in sorted(self._queries.items()):
+            lines.append(f"magic_items_db_queries_total{_labels(route=route)} {count}")
+
+        lines += ["# HELP magic_items_db_rows_total Rows fetched.",
+                  "# TYPE magic_items_db_rows_total counter"]
+        for route, count in sorted(self._rows.items()):
+            lines.append(f"magic_items_db_rows_total{_labels(route=route)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(**labels) -> str:
+    def escape(value) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels.items()) + "}"
+
+
+metrics_registry = MetricsRegistry()
+
+
+class TimingMiddleware:
+    """
+    ASGI middleware timing every HTTP request: adds a Server-Timing header and records the request in the
+    metrics registry under its route template (e.g. /items/{item_id}).
+    """
+
+    def __init__(self, app, registry: MetricsRegistry = metrics_registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings = RequestTimings()
+        token = _current_timings.set(timings)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(scope=message).append("Server-Timing",
+                                                     timings.server_timing(time.perf_counter() - started))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_timings.reset(token)
+            # Unmatched paths share one label so random URLs cannot blow up the number of series
+            route = getattr(scope.get("route"), "path", "unmatched")
+            self.registry.observe(scope["method"], route, status, time.perf_counter() - started, timings)
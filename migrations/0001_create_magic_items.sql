@@ -1,4 +1,4 @@
-CREATE TABLE magic_items (
+CREATE TABLE IF NOT EXISTS magic_items (
     id SERIAL PRIMARY KEY,
     name VARCHAR(255) NOT NULL,
     description TEXT,
@@ -11,4 +11,4 @@ CREATE TABLE magic_items (
     durability FLOAT,
     stock INT DEFAULT 1
 
-);
\ No newline at end of file
+);
@@ -0,0 +1,7 @@
+-- B-tree indexes for the equality and range filters of /items/search
+CREATE INDEX IF NOT EXISTS idx_magic_items_level ON magic_items (level);
+CREATE INDEX IF NOT EXISTS idx_magic_items_value ON magic_items (value);
+CREATE INDEX IF NOT EXISTS idx_magic_items_stock ON magic_items (stock);
+CREATE INDEX IF NOT EXISTS idx_magic_items_category_type ON magic_items (category, type);
+-- category alone is served by the composite index, type alone is not
+CREATE INDEX IF NOT EXISTS idx_magic_items_type ON magic_items (type);
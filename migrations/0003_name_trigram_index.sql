@@ -0,0 +1,3 @@
+-- Trigram index for name matching (=, LIKE/ILIKE '%...%' and similarity searches)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS idx_magic_items_name_trgm ON magic_items USING gin (name gin_trgm_ops);
@@ -0,0 +1,7 @@
+-- Stored full-text document over name (weight A) and description (weight B), kept in sync by Postgres
+ALTER TABLE magic_items ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED;
+CREATE INDEX IF NOT EXISTS idx_magic_items_search_vector ON magic_items USING gin (search_vector);
@@ -0,0 +1,2 @@
+-- Typo-tolerant matching on description (name is covered by idx_magic_items_name_trgm)
+CREATE INDEX IF NOT EXISTS idx_magic_items_description_trgm ON magic_items USING gin (description gin_trgm_ops);
@@ -0,0 +1,14 @@
+-- Rarity tier (Common, Rare, ...) of rarity_value, written by the application with every insert and
+-- rarity_value update (RARITY_TIERS) and indexed, so tier filters and per-tier counts are index lookups.
+-- Existing items are classified with the default thresholds, apply_migrations.py reclassifies them when
+-- RARITY_TIERS is set to something else.
+ALTER TABLE magic_items ADD COLUMN IF NOT EXISTS rarity_tier VARCHAR(32);
+UPDATE magic_items SET rarity_tier = CASE
+    WHEN rarity_value >= 97 THEN 'Legendary'
+    WHEN rarity_value >= 90 THEN 'Epic'
+    WHEN rarity_value >= 75 THEN 'Rare'
+    WHEN rarity_value >= 50 THEN 'Uncommon'
+    ELSE 'Common'
+END
+WHERE rarity_tier IS NULL;
+CREATE INDEX IF NOT EXISTS idx_magic_items_rarity_tier ON magic_items (rarity_tier);
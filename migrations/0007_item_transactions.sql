@@ -0,0 +1,32 @@
+-- Sell/buy ledger and wallet. item_transactions is append-only: one row per sale or purchase, with the
+-- client's idempotency key (unique, so a retried request is recorded once) and the stock it left behind.
+-- The wallet balance is the sum of wallet_shards: sales credit a random shard from 1 to WALLET_SHARDS so
+-- concurrent sales do not queue on one row, purchases debit shard 0, whose row lock also serializes the
+-- funds check. SUM(wallet_shards.balance) always equals SUM(item_transactions.amount).
+CREATE TABLE IF NOT EXISTS item_transactions (
+    id BIGSERIAL PRIMARY KEY,
+    idempotency_key VARCHAR(255) UNIQUE,
+    kind VARCHAR(4) NOT NULL CHECK (kind IN ('sell', 'buy')),
+    item_id INTEGER NOT NULL,
+    quantity INTEGER NOT NULL CHECK (quantity > 0),
+    unit_price INTEGER NOT NULL CHECK (unit_price >= 0),
+    amount BIGINT NOT NULL,
+    stock_after INTEGER,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION reject_item_transaction_change() RETURNS trigger AS $$
+BEGIN
+    RAISE EXCEPTION 'item_transactions is append-only';
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS item_transactions_append_only ON item_transactions;
+CREATE TRIGGER item_transactions_append_only BEFORE UPDATE OR DELETE ON item_transactions
+    FOR EACH ROW EXECUTE FUNCTION reject_item_transaction_change();
+
+CREATE TABLE IF NOT EXISTS wallet_shards (
+    shard SMALLINT PRIMARY KEY,
+    balance BIGINT NOT NULL DEFAULT 0
+);
+INSERT INTO wallet_shards (shard, balance) VALUES (0, 0) ON CONFLICT (shard) DO NOTHING;
@@ -0,0 +1,42 @@
+-- Change feed: every insert, update and delete of an item appends a row to item_changes in the same
+-- transaction, written by a trigger so no code path (bulk statements and other processes included) is missed.
+-- op is create, update, stock (only the stock changed) or delete; item is the row after the change (before it
+-- for a delete). seq stays NULL until the feed reader numbers the committed changes in id order under an
+-- advisory lock, so seq is gapless and a change committed later never gets a lower seq than one already read.
+CREATE TABLE IF NOT EXISTS item_changes (
+    id BIGSERIAL PRIMARY KEY,
+    seq BIGINT UNIQUE,
+    op VARCHAR(6) NOT NULL,
+    item_id INTEGER NOT NULL,
+    item JSONB NOT NULL,
+    changed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS idx_item_changes_unsequenced ON item_changes (id) WHERE seq IS NULL;
+
+CREATE OR REPLACE FUNCTION record_item_change() RETURNS trigger AS $$
+DECLARE
+    new_item JSONB;
+    old_item JSONB;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO item_changes (op, item_id, item) VALUES ('delete', OLD.id, to_jsonb(OLD) - 'search_vector');
+        RETURN OLD;
+    END IF;
+    new_item := to_jsonb(NEW) - 'search_vector';
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO item_changes (op, item_id, item) VALUES ('create', NEW.id, new_item);
+    ELSE
+        old_item := to_jsonb(OLD) - 'search_vector';
+        INSERT INTO item_changes (op, item_id, item)
+        VALUES (CASE WHEN old_item - 'stock' = new_item - 'stock' THEN 'stock' ELSE 'update' END, NEW.id, new_item);
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS magic_items_record_change ON magic_items;
+CREATE TRIGGER magic_items_record_change AFTER INSERT OR DELETE ON magic_items
+    FOR EACH ROW EXECUTE FUNCTION record_item_change();
+DROP TRIGGER IF EXISTS magic_items_record_update ON magic_items;
+CREATE TRIGGER magic_items_record_update AFTER UPDATE ON magic_items
+    FOR EACH ROW WHEN (OLD.* IS DISTINCT FROM NEW.*) EXECUTE FUNCTION record_item_change();
@@ -0,0 +1,43 @@
+-- Row version behind the item ETags and If-Match: 1 on insert, one more with every update that changes the row.
+-- Kept by a trigger, like the change feed, so every write path (bulk statements and other processes included)
+-- maintains it and updates that change nothing keep it. The comparison is made in the function because a BEFORE
+-- trigger's WHEN may not read NEW's generated search_vector.
+ALTER TABLE magic_items ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 1;
+
+CREATE OR REPLACE FUNCTION bump_item_version() RETURNS trigger AS $$
+BEGIN
+    IF to_jsonb(NEW) - 'search_vector' - 'version' IS DISTINCT FROM to_jsonb(OLD) - 'search_vector' - 'version' THEN
+        NEW.version := OLD.version + 1;
+    ELSE
+        NEW.version := OLD.version;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS magic_items_bump_version ON magic_items;
+CREATE TRIGGER magic_items_bump_version BEFORE UPDATE ON magic_items
+    FOR EACH ROW EXECUTE FUNCTION bump_item_version();
+
+-- A stock change also bumps the version, which must not turn it into an update in the change feed
+CREATE OR REPLACE FUNCTION record_item_change() RETURNS trigger AS $$
+DECLARE
+    new_item JSONB;
+    old_item JSONB;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO item_changes (op, item_id, item) VALUES ('delete', OLD.id, to_jsonb(OLD) - 'search_vector');
+        RETURN OLD;
+    END IF;
+    new_item := to_jsonb(NEW) - 'search_vector';
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO item_changes (op, item_id, item) VALUES ('create', NEW.id, new_item);
+    ELSE
+        old_item := to_jsonb(OLD) - 'search_vector' - 'version';
+        INSERT INTO item_changes (op, item_id, item)
+        VALUES (CASE WHEN old_item - 'stock' = new_item - 'stock' - 'version' THEN 'stock' ELSE 'update' END,
+                NEW.id, new_item);
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,4 @@
+-- Plain index on name for the bulk import, which matches the imported rows to items by name: a small import into
+-- a large catalog looks its names up instead of reading the whole table. Names are not unique, an import updates
+-- the oldest item of a name (the lowest id).
+CREATE INDEX IF NOT EXISTS idx_magic_items_name ON magic_items (name);
@@ -0,0 +1,46 @@
+-- The change feed triggers of 0008 run once per statement instead of once per row: each writes the rows of its
+-- statement (the transition table) to item_changes with one INSERT, in id order. Same rows as before, at a
+-- fraction of the cost for statements writing many items, e.g. the bulk import. An update that changes nothing
+-- (version included, see 0009) is still left out, and a stock change is still told apart from an update.
+CREATE OR REPLACE FUNCTION record_item_inserts() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO item_changes (op, item_id, item)
+    SELECT 'create', id, to_jsonb(new_items) - 'search_vector' FROM new_items ORDER BY id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION record_item_updates() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO item_changes (op, item_id, item)
+    SELECT CASE WHEN to_jsonb(o) - 'search_vector' - 'version' - 'stock'
+                     = to_jsonb(n) - 'search_vector' - 'version' - 'stock' THEN 'stock' ELSE 'update' END,
+           n.id, to_jsonb(n) - 'search_vector'
+    FROM new_items n JOIN old_items o ON o.id = n.id
+    WHERE n IS DISTINCT FROM o
+    ORDER BY n.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION record_item_deletes() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO item_changes (op, item_id, item)
+    SELECT 'delete', id, to_jsonb(old_items) - 'search_vector' FROM old_items ORDER BY id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS magic_items_record_change ON magic_items;
+DROP TRIGGER IF EXISTS magic_items_record_update ON magic_items;
+DROP FUNCTION IF EXISTS record_item_change();
+-- A trigger with transition tables takes a single event
+DROP TRIGGER IF EXISTS magic_items_record_inserts ON magic_items;
+CREATE TRIGGER magic_items_record_inserts AFTER INSERT ON magic_items
+    REFERENCING NEW TABLE AS new_items FOR EACH STATEMENT EXECUTE FUNCTION record_item_inserts();
+DROP TRIGGER IF EXISTS magic_items_record_updates ON magic_items;
+CREATE TRIGGER magic_items_record_updates AFTER UPDATE ON magic_items
+    REFERENCING OLD TABLE AS old_items NEW TABLE AS new_items FOR EACH STATEMENT EXECUTE FUNCTION record_item_updates();
+DROP TRIGGER IF EXISTS magic_items_record_deletes ON magic_items;
+CREATE TRIGGER magic_items_record_deletes AFTER DELETE ON magic_items
+    REFERENCING OLD TABLE AS old_items FOR EACH STATEMENT EXECUTE FUNCTION record_item_deletes();
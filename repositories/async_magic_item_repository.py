@@ -0,0 +1,686 @@
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple, Union
+import numpy as np
+import psycopg
+from db import async_pooled_connection
+from repositories.magic_item_repository import (ADJUST_STOCK_QUERY, ANALYZE_LATEST_IMPORT_QUERY, APPLY_WEAR_QUERY,
+                                                BULK_INSERT_QUERY, CHANGES_SINCE_QUERY, CHANGE_COLUMNS, COLUMN_NAMES,
+                                                CREATE_IMPORT_TABLE_QUERY, CREDIT_WALLET_QUERY, DEBIT_WALLET_SHARD,
+                                                EXPORT_QUERIES, GET_ITEM_BY_ID_QUERY, GET_STOCK_QUERY,
+                                                GET_TRANSACTION_BY_KEY_QUERY, GET_VERSION_QUERY, IMPORT_LOCK_ID,
+                                                INSERT_FROM_IMPORT_QUERY, INSERT_TRANSACTION_QUERY, ITEMS_PAGE_QUERY,
+                                                ITEMS_PAGE_VERSIONS_QUERY, ITEM_COLUMNS, LATEST_IMPORT_QUERY,
+                                                LOCK_DEBIT_SHARD_QUERY, LOCK_IMPORT_QUERY, LOCK_STOCK_QUERY,
+                                                LOCK_WEAR_QUERY, PRUNE_CHANGES_LOCK_ID, PRUNE_CHANGES_QUERY,
+                                                SEQUENCE_CHANGES_BATCH, SEQUENCE_CHANGES_LOCK_ID,
+                                                SEQUENCE_CHANGES_QUERY, SET_STOCK_QUERY, SNAPSHOT_COLUMNS,
+                                                SNAPSHOT_COLUMNS_QUERY, STATISTICS_EXTREMES_QUERY,
+                                                STATISTICS_TOTALS_QUERY, TRADE_STOCK_QUERY, TRANSACTIONS_PAGE_QUERY,
+                                                TRANSACTION_COLUMNS, TRY_LOCK_PRUNE_CHANGES_QUERY,
+                                                TRY_LOCK_SEQUENCER_QUERY, UPDATE_FROM_IMPORT_QUERY, UPDATE_STOCK_QUERY,
+                                                VERSION_COLUMNS, WALLET_BALANCE_QUERY, ChangesPrunedError,
+                                                ItemVersionMismatchError, TransactionRejectedError, accept_stock_deltas,
+                                                adjust_stock_params, build_import_copy_query, build_import_report,
+                                                build_search_query, build_statistics, build_stock_adjustment,
+                                                build_structured_search_query, build_text_search_query,
+                                                build_tier_counts, build_tier_counts_query, build_update_query,
+                                                build_wear_update, bulk_insert_params, query_cache, rows_to_dicts,
+                                                rows_to_versions, stock_delta, transaction_amount, with_rarity_tier)
+
+
+class AsyncMagicItemRepository:
+    """
+    Non-blocking counterpart of MagicItemRepository used by the API routes.
+    Queries run on the psycopg 3 asyncio pool so a slow query never stalls the event loop.
+    """
+
+    @staticmethod
+    async def create_item(item_data: dict) -> dict:
+        """
+        Create a new magic item in the database.
+        Args:
+            item_data (dict): A dictionary containing the data for the new item.
+        Returns:
+            dict: A dictionary containing the data for the new item, including the generated ID.
+        Raises:
+            Exception: If there is an error creating the item in the database.
+        """
+        try:
+            item_data = with_rarity_tier(item_data)
+            async with async_pooled_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute("""
+                        INSERT INTO magic_items
+                        (name, description, level, type, category, rarity_value, weight, value, durability, stock,
+                         rarity_tier)
+                        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s) RETURNING id, version
+                    """, (
+                        item_data['name'], item_data.get('description'), item_data.get('level'), item_data.get('type'),
+                        item_data.get('category'), item_data['rarity_value'], item_data['weight'],
+                        item_data.get('value'),
+                        item_data['durability'], item_data.get('stock', 1), item_data['rarity_tier']
+                    ))
+                    item_id, version = await cursor.fetchone()
+            return {**item_data, "id": item_id, "version": version}
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    async def create_items(items: List[dict]) -> List[dict]:
+        """
+        Create many magic items in a single INSERT and a single transaction.
+        Either every item is stored or, on error, none of them is.
+        Args:
+            items (List[dict]): The data for the new items.
+        Returns:
+            List[dict]: The data for the new items, including the generated IDs, in input order.
+        Raises:
+            Exception: If there is an error creating the items in the database.
+        """
+        try:
+            if not items:
+                return []
+            async with async_pooled_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(BULK_INSERT_QUERY, bulk_insert_params(items))
+                    rows = await cursor.fetchall()
+            return [{**with_rarity_tier(item), "id": item_id, "version": version}
+                    for item, (item_id, version) in zip(items, rows)]
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    async def get_all_items() -> List[Dict[Any, Any]]:
+        """
+        Get all magic items from the database.
+        Returns:
+            list[dict[Any, Any]]: A list of dictionaries containing the data for each item.
+        Raises:
+            Exception: If there is an error fetching the items from the database.
+        """
+        try:
+            async with async_pooled_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(f"SELECT {ITEM_COLUMNS} FROM magic_items")
+                    items = await cursor.fetchall()
+            return rows_to_dicts(items)
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    async def get_items_page(limit: int, after_id: int = 0, versions_only: bool = False) -> List[Dict[Any, Any]]:
+        """
+        Get one page of magic items ordered by ID.
+        Args:
+            limit (int): The maximum number of items to return.
+            after_id (int): Only items with an ID greater than this are returned.
+            versions_only (bool): Only read the id and version of the items (VERSION_COLUMNS).
+        Returns:
+            list[dict[Any, Any]]: Up to limit items.
+        Raises:
+            Exception: If there is an error fetching the items from the database.
+        """
+        try:
+            async with async_pooled_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(ITEMS_PAGE_VERSIONS_QUERY if versions_only else ITEMS_PAGE_QUERY,
+                                         (after_id, limit))
+                    items = await cursor.fetchall()
+            return rows_to_versions(items) if versions_only else rows_to_dicts(items)
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    async def stream_items(after_id: int = 0, batch_size: int = 1000) -> AsyncIterator[Dict[Any, Any]]:
+        """
+        Yield magic items ordered by ID through a server-side cursor.
+        Only batch_size rows are held in memory at a time, whatever the size of the table.
+        Args:
+            after_id (int): Only items with an ID greater than this are returned.
+            batch_size (int): The number of rows fetched from the server per round trip.
+        Yields:
+            dict[Any, Any]: One item at a time.
+        Raises:
+            Exception: If there is an error fetching the items from the database.
+        """
+        async with async_pooled_connection() as conn:
+            async with conn.cursor(name="stream_items") as cursor:
+                cursor.itersize = batch_size
+                await cursor.execute(f"SELECT {ITEM_COLUMNS} FROM magic_items WHERE id > %s ORDER BY id",
+                                     (after_id,))
+                async for item in cursor:
+                    yield dict(zip(COLUMN_NAMES, item))
+
+    @staticmethod
+    async def get_item_by_id(item_id: int) -> Optional[Dict[Any, Any]]:
+        """
+        Get a magic item from the database by its ID.
+        Args:
+            item_id (int): The ID of the item to fetch.
+        Returns:
+            Optional[dict[Any, Any]]: A dictionary containing the data for the item, or None if the item does not exist.
+        Raises:
+            Exception: If there is an error fetching the item from the database.
+        """
+        try:
+            async with async_pooled_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(GET_ITEM_BY_ID_QUERY, (item_id,), prepare=True)
+                    query_cache.count_prepared_execution()
+                    item = await cursor.fetchone()
+            return dict(zip(COLUMN_NAMES, item)) if item else None
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    async def search_items(search_criteria: Dict[str, Any], versions_only: bool = False) -> List[Dict[str, Any]]:
+        """
+        Search for magic items based on specified criteria, with versions_only reading just their id and version.
+        """
+        try:
+            query, params = build_search_query(search_criteria,
+                                               ", ".join(VERSION_COLUMNS) if versions_only else ITEM_COLUMNS)
+
+            async with async_pooled_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(query, params, prepare=True)
+                    query_cache.count_prepared_execution()
+                    items = await cursor.fetchall()
+            return rows_to_versions(items) if versions_only else rows_to_dicts(items)
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    async def structured_search_items(search: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Search magic items with IN lists, OR groups, ranges and sorting, see build_structured_search_query.
+        """
+        try:
+            query, params = build_structured_search_query(search)
+
+            async with async_pooled_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(query, params, prepare=True)
+                    query_cache.count_prepared_execution()
+                    items = await cursor.fetchall()
+            return rows_to_dicts(items)
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    async def count_rarity_tiers(search_criteria: Dict[str, Any], text: Optional[str] = None,
+                                 fuzzy: bool = True) -> List[Dict[str, Any]]:
+        """
+        Count the items a search matches per rarity tier, see build_tier_counts_query.
+        """
+        try:
+            query, params = build_tier_counts_query(search_criteria, text, fuzzy)
+
+            async with async_pooled_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(query, params, prepare=True)
+                    query_cache.count_prepared_execution()
+                    rows = await cursor.fetchall()
+            return build_tier_counts(rows)
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    async def text_search_items(text: str, search_criteria: Dict[str, Any], limit: int, offset: int = 0,
+                                fuzzy: bool = True, versions_only: bool = False) -> List[Dict[str, Any]]:
+        """
+        Search magic items by text over name and description, most relevant first.
+        See build_text_search_query for the arguments, versions_only reads just the id and version of the items.
+        """
+        try:
+            query, params = build_text_search_query(text, search_criteria, limit, offset, fuzzy,
+                                                    ", ".join(VERSION_COLUMNS) if versions_only else ITEM_COLUMNS)
+            async with async_pooled_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(query, params, prepare=True)
+                    query_cache.count_prepared_execution()
+                    items = await cursor.fetchall()
+            return rows_to_versions(items) if versions_only else rows_to_dicts(items)
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    async def update_item(item_id: int, update_data: dict) -> Optional[Dict[Any, Any]]:
+        """
+        Update an item in the database with the given item ID and update data.
+        Args:
+            item_id (int): The ID of the item to update.
+            update_data (dict): A dictionary containing the updated data for the item.
+        Returns:
+            Optional[Dict[Any, Any]]: The updated item data if the update was successful, None otherwise.
+        Raises:
+            Exception: If an error occurs during the update process.
+        """
+        updated_item, _ = await AsyncMagicItemRepository.update_item_with_previous(item_id, update_data)
+        return updated_item
+
+    @staticmethod
+    async def update_item_with_previous(item_id: int, update_data: dict,
+                                        expected_versions: Optional[List[int]] = None
+                                        ) -> Tuple[Optional[dict], Optional[dict]]:
+        """
+        Update an item and also return the row as it was before the update, in the same statement.
+        Args:
+            item_id (int): The ID of the item to update.
+            update_data (dict): A dictionary containing the updated data for the item.
+            expected_versions (Optional[List[int]]): Only update the item if its version is one of these.
+        Returns:
+            Tuple[Optional[dict], Optional[dict]]: The updated and the previous item data, (None, None) if the
+            item does not exist.
+        Raises:
+            ItemVersionMismatchError: If the item exists at a version not in expected_versions.
+            Exception: If an error occurs during the update process.
+        """
+        try:
+            query, values = build_update_query(item_id, update_data, with_previous=True,
+                                               expected_versions=expected_versions)
+
+            async with async_pooled_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(query, values)
+                    row = await cursor.fetchone()
+                    if not row and expected_versions is not None:
+                        await cursor.execute(GET_VERSION_QUERY, (item_id,), prepare=True)
+                        query_cache.count_prepared_execution()
+                        current = await cursor.fetchone()
+                        if current:
+                            raise ItemVersionMismatchError(item_id, current[0])
+            if not row:
+                return None, None
+            width = len(COLUMN_NAMES)
+            return dict(zip(COLUMN_NAMES, row[:width])), dict(zip(COLUMN_NAMES, row[width:]))
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    async def update_stock(item_id: int, quantity: int, operation: str) -> Optional[Dict[Any, Any]]:
+        """
+        Update the stock of an item in the database.
+        """
+        try:
+            sign = {'increase': 1, 'decrease': -1}[operation]
+            async with async_pooled_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(UPDATE_STOCK_QUERY, (sign * quantity, item_id), prepare=True)
+                    query_cache.count_prepared_execution()
+                    updated_item = await cursor.fetchone()
+            return dict(zip(COLUMN_NAMES, updated_item)) if updated_item else None
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    async def apply_stock_deltas(item_id: int, deltas: List[int]) -> Tuple[Optional[dict], Optional[dict],
+                                                                           List[bool]]:
+        """
+        Apply many deltas to one item with a single row lock and a single UPDATE, see accept_stock_deltas.
+        Args:
+            item_id (int): The ID of the item.
+            deltas (List[int]): Signed stock deltas in arrival order.
+        Returns:
+            Tuple[Optional[dict], Optional[dict], List[bool]]: The item after and before the update (both None if
+            it does not exist) and whether each delta was accepted.
+        """
+        try:
+            async with async_pooled_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(LOCK_STOCK_QUERY, (item_id,), prepare=True)
+                    query_cache.count_prepared_execution()
+                    row = await cursor.fetchone()
+                    if row is None:
+                        return None, None, [False] * len(deltas)
+                    stock, accepted = accept_stock_deltas(row[0], deltas)
+                    await cursor.execute(SET_STOCK_QUERY, (stock, item_id), prepare=True)
+                    query_cache.count_prepared_execution()
+                    updated_item = dict(zip(COLUMN_NAMES, await cursor.fetchone()))
+            return updated_item, {**updated_item, 'stock': row[0]}, accepted
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    async def adjust_stock(adjustments: List[dict]) -> Tuple[Dict[str, Any], List[Tuple[dict, dict]]]:
+        """
+        Apply many stock deltas in one statement and one transaction, all or nothing.
+        Returns:
+            Tuple[Dict[str, Any], List[Tuple[dict, dict]]]: The per-line report and the (previous, updated)
+            item pairs, see build_stock_adjustment.
+        """
+        try:
+            async with async_pooled_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(ADJUST_STOCK_QUERY, adjust_stock_params(adjustments))
+                    rows = await cursor.fetchall()
+            return build_stock_adjustment(adjustments, rows)
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    async def apply_wear(item_ids: np.ndarray, uses: np.ndarray) -> Tuple[Dict[str, Any], List[Tuple[dict, dict]]]:
+        """
+        Apply a batch of use events in one transaction: lock the items, work out the new stock and durability of
+        all of them at once and write them with one UPDATE, see build_wear_update.
+        Args:
+            item_ids (np.ndarray): Distinct item ids, ascending.
+            uses (np.ndarray): Total uses per item id.
+        Returns:
+            Tuple[Dict[str, Any], List[Tuple[dict, dict]]]: The batch report and the (previous, updated) item
+            pairs.
+        """
+        try:
+            async with async_pooled_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(LOCK_WEAR_QUERY, (item_ids.tolist(),), prepare=True)
+                    query_cache.count_prepared_execution()
+                    report, params, previous = build_wear_update(item_ids, uses, await cursor.fetchall())
+                    rows = []
+                    if params[0]:
+                        await cursor.execute(APPLY_WEAR_QUERY, params, prepare=True)
+                        query_cache.count_prepared_execution()
+                        rows = await cursor.fetchall()
+            changes = []
+            for row in rows:
+                updated_item = dict(zip(COLUMN_NAMES, row))
+                stock, durability = previous[updated_item['id']]
+                changes.append(({**updated_item, 'stock': stock, 'durability': durability}, updated_item))
+            return report, changes
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    async def record_transaction(kind: str, item_id: int, quantity: int, unit_price: Optional[int],
+                                 idempotency_key: Optional[str], shard: int) -> Tuple[Optional[dict],
+                                                                                     Optional[dict], bool]:
+        """
+        Sell or buy an item: change its stock, append the ledger entry and move the money, in one transaction.
+        Args:
+            kind (str): 'sell' or 'buy'.
+            item_id (int): The ID of the item.
+            quantity (int): How many items change hands, at least 1.
+            unit_price (Optional[int]): The price per item, the item's value when None.
+            idempotency_key (Optional[str]): The client's key for the request, a key already in the ledger
+                replays that entry instead of recording a new one.
+            shard (int): The wallet shard a sale is credited to.
+        Returns:
+            Tuple[Optional[dict], Optional[dict], bool]: The ledger entry, the updated item and whether the entry
+            was replayed (the item is then None). The entry is None if the item does not exist.
+        Raises:
+            TransactionRejectedError: On too little stock or funds, or without a price. Nothing is written.
+        """
+        try:
+            async with async_pooled_connection() as conn:
+                async with conn.cursor() as cursor:
+                    if idempotency_key is not None:
+                        existing = await AsyncMagicItemRepository._transaction_by_key(cursor, idempotency_key)
+                        if existing:
+                            return existing, None, True
+
+                    delta = stock_delta(kind, quantity)
+                    await cursor.execute(TRADE_STOCK_QUERY, (delta, item_id, delta), prepare=True)
+                    query_cache.count_prepared_execution()
+                    row = await cursor.fetchone()
+                    if row is None:
+                        await cursor.execute(GET_STOCK_QUERY, (item_id,), prepare=True)
+                        query_cache.count_prepared_execution()
+                        found = await cursor.fetchone()
+                        if idempotency_key is not None:
+                            # A concurrent request with the same key may have just taken the stock
+                            existing = await AsyncMagicItemRepository._transaction_by_key(cursor, idempotency_key)
+                            if existing:
+                                return existing, None, True
+                        if found is None:
+                            return None, None, False
+                        raise TransactionRejectedError(f"Insufficient stock: {found[0] or 0} in stock, "
+                                                       f"{quantity} requested")
+                    updated_item = dict(zip(COLUMN_NAMES, row))
+
+                    unit_price = unit_price if unit_price is not None else updated_item['value']
+                    if unit_price is None:
+                        raise TransactionRejectedError("The item has no value, pass a unit_price")
+                    amount = transaction_amount(kind, unit_price, quantity)
+                    if kind == "buy":
+                        # Locking the debit shard serializes purchases, the sum then counts every committed one
+                        await cursor.execute(LOCK_DEBIT_SHARD_QUERY, (DEBIT_WALLET_SHARD,), prepare=True)
+                        query_cache.count_prepared_execution()
+                        await cursor.execute(WALLET_BALANCE_QUERY, prepare=True)
+                        query_cache.count_prepared_execution()
+                        balance = (await cursor.fetchone())[0]
+                        if balance + amount < 0:
+                            raise TransactionRejectedError(f"Insufficient funds: balance {balance}, "
+                                                           f"{-amount} needed")
+                        shard = DEBIT_WALLET_SHARD
+
+                    await cursor.execute(INSERT_TRANSACTION_QUERY, (idempotency_key, kind, item_id, quantity,
+                                                                    unit_price, amount, updated_item['stock']),
+                                         prepare=True)
+                    query_cache.count_prepared_execution()
+                    entry = await cursor.fetchone()
+                    if entry is None:
+                        # The same key was committed while this request waited for it: undo and replay that one
+                        await conn.rollback()
+                        return await AsyncMagicItemRepository._transaction_by_key(cursor, idempotency_key), None, True
+                    await cursor.execute(CREDIT_WALLET_QUERY, (shard, amount), prepare=True)
+                    query_cache.count_prepared_execution()
+            return dict(zip(TRANSACTION_COLUMNS, entry)), updated_item, False
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    async def _transaction_by_key(cursor, idempotency_key: str) -> Optional[dict]:
+        await cursor.execute(GET_TRANSACTION_BY_KEY_QUERY, (idempotency_key,), prepare=True)
+        query_cache.count_prepared_execution()
+        row = await cursor.fetchone()
+        return dict(zip(TRANSACTION_COLUMNS, row)) if row else None
+
+    @staticmethod
+    async def get_transactions_page(limit: int, after_id: int = 0) -> List[Dict[str, Any]]:
+        """
+        Fetch up to limit ledger entries with an ID greater than after_id, oldest first.
+        """
+        try:
+            async with async_pooled_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(TRANSACTIONS_PAGE_QUERY, (after_id, limit), prepare=True)
+                    query_cache.count_prepared_execution()
+                    rows = await cursor.fetchall()
+            return [dict(zip(TRANSACTION_COLUMNS, row)) for row in rows]
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    async def get_wallet_balance() -> Dict[str, int]:
+        """
+        Sum the wallet shards.
+        Returns:
+            Dict[str, int]: balance, and the number of shards it is spread over.
+        """
+        try:
+            async with async_pooled_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(WALLET_BALANCE_QUERY, prepare=True)
+                    query_cache.count_prepared_execution()
+                    balance, shards = await cursor.fetchone()
+            return {"balance": balance, "shards": shards}
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    async def get_changes(since: int, limit: int) -> List[Dict[str, Any]]:
+        """
+        Number the committed changes that have no seq yet, unless another reader is doing so, then fetch the
+        changes after since.
+        Args:
+            since (int): The seq of the last change the caller has seen, 0 for all of them.
+            limit (int): The maximum number of changes.
+        Returns:
+            List[Dict[str, Any]]: seq, op (create, update, stock or delete), item_id, item (the row after the
+            change, before it for a delete) and changed_at, in seq order.
+        Raises:
+            ChangesPrunedError: If changes after since were deleted by the retention.
+        """
+        try:
+            async with async_pooled_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(TRY_LOCK_SEQUENCER_QUERY, (SEQUENCE_CHANGES_LOCK_ID,), prepare=True)
+                    query_cache.count_prepared_execution()
+                    if (await cursor.fetchone())[0]:
+                        await cursor.execute(SEQUENCE_CHANGES_QUERY, (SEQUENCE_CHANGES_BATCH,), prepare=True)
+                        query_cache.count_prepared_execution()
+                    await cursor.execute(CHANGES_SINCE_QUERY, (since, limit), prepare=True)
+                    query_cache.count_prepared_execution()
+                    rows = await cursor.fetchall()
+            # seq has no gaps, so a first change past since + 1 means the ones between were pruned; since 0 starts
+            # from the oldest change kept
+            if since > 0 and rows and rows[0][0] > since + 1:
+                raise ChangesPrunedError(since, rows[0][0])
+            return [dict(zip(CHANGE_COLUMNS, row)) for row in rows]
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    async def prune_changes(retention_seconds: float) -> int:
+        """
+        Delete the changes older than the retention, unless another process is doing so.
+        Args:
+            retention_seconds (float): How long a change is kept.
+        Returns:
+            int: The number of changes deleted.
+        """
+        try:
+            async with async_pooled_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(TRY_LOCK_PRUNE_CHANGES_QUERY, (PRUNE_CHANGES_LOCK_ID,))
+                    if not (await cursor.fetchone())[0]:
+                        return 0
+                    await cursor.execute(PRUNE_CHANGES_QUERY, (retention_seconds,))
+                    return cursor.rowcount
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    async def get_inventory_statistics() -> Dict[str, Any]:
+        """
+        Compute inventory statistics with aggregate queries in the database.
+        Returns:
+            Dict[str, Any]: Totals, the extreme items and per category/type breakdowns.
+        Raises:
+            Exception: If there is an error querying the database.
+        """
+        try:
+            async with async_pooled_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(STATISTICS_TOTALS_QUERY)
+                    totals_rows = await cursor.fetchall()
+                    await cursor.execute(STATISTICS_EXTREMES_QUERY)
+                    extreme_rows = await cursor.fetchall()
+            return build_statistics(totals_rows, extreme_rows)
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    async def get_snapshot_columns() -> Dict[str, list]:
+        """
+        Fetch the whole catalog column by column for the analytics snapshot.
+        Returns:
+            Dict[str, list]: One list per SNAPSHOT_COLUMNS entry, NULLs as None, the same item order in all.
+        Raises:
+            Exception: If there is an error querying the database.
+        """
+        try:
+            async with async_pooled_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(SNAPSHOT_COLUMNS_QUERY)
+                    row = await cursor.fetchone()
+            # array_agg over an empty table is NULL
+            return {column: values or [] for column, values in zip(SNAPSHOT_COLUMNS, row)}
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    async def import_items(columns: Tuple[str, ...], blocks: AsyncIterator[Union[bytes, List[tuple]]],
+                           csv: bool) -> Dict[str, int]:
+        """
+        Create or update items by name from a stream of rows, in one transaction: the rows are copied into a
+        temporary table as they arrive, then merged into magic_items, see UPDATE_FROM_IMPORT_QUERY and
+        INSERT_FROM_IMPORT_QUERY.
+        Args:
+            columns (Tuple[str, ...]): The columns of the rows, see build_import_copy_query.
+            blocks: CSV data without its header (csv) or batches of rows with a value per column.
+            csv (bool): Whether the blocks are CSV.
+        Returns:
+            Dict[str, int]: The counts of build_import_report.
+        Raises:
+            ValueError: On unknown columns or a value the database rejects, nothing is imported then.
+        """
+        copy_query = build_import_copy_query(columns, csv)
+        try:
+            async with async_pooled_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(CREATE_IMPORT_TABLE_QUERY)
+                    async with cursor.copy(copy_query) as copy:
+                        async for block in blocks:
+                            if csv:
+                                await copy.write(block)
+                            else:
+                                for row in block:
+                                    await copy.write_row(row)
+                    rows = cursor.rowcount
+                    await cursor.execute(LOCK_IMPORT_QUERY, (IMPORT_LOCK_ID,))
+                    await cursor.execute(LATEST_IMPORT_QUERY)
+                    names = cursor.rowcount
+                    await cursor.execute(ANALYZE_LATEST_IMPORT_QUERY)
+                    await cursor.execute(UPDATE_FROM_IMPORT_QUERY)
+                    updated = cursor.rowcount
+                    await cursor.execute(INSERT_FROM_IMPORT_QUERY)
+                    created = cursor.rowcount
+            return build_import_report(rows, names, created, updated)
+        except (psycopg.DataError, psycopg.IntegrityError) as e:
+            context = f" ({e.diag.context.strip()})" if e.diag.context else ""
+            raise ValueError(f"Invalid import data: {e.diag.message_primary}{context}")
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    async def export_items(format: str, block_size: int = 65536) -> AsyncIterator[bytes]:
+        """
+        Stream every item ordered by ID as the database writes it out with COPY, see EXPORT_QUERIES.
+        Args:
+            format (str): csv or ndjson.
+            block_size (int): The rows are gathered into blocks of about this many bytes.
+        Yields:
+            bytes: The next block of the export.
+        """
+        async with async_pooled_connection() as conn:
+            async with conn.cursor() as cursor:
+                async with cursor.copy(EXPORT_QUERIES[format]) as copy:
+                    block = bytearray()
+                    async for data in copy:
+                        block += data
+                        if len(block) >= block_size:
+                            yield bytes(block)
+                            block.clear()
+                    if block:
+                        yield bytes(block)
+
+    @staticmethod
+    async def delete_item(item_id: int) -> Optional[dict]:
+        """
+        Delete an item from the database by its ID.
+        Args:
+            item_id (int): The ID of the item to delete.
+        Returns:
+            Optional[dict]: The deleted item data if deletion was successful, None otherwise.
+        Raises:
+            Exception: If an error occurs during the deletion process.
+        """
+        try:
+            async with async_pooled_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(f"DELETE FROM magic_items WHERE id = %s RETURNING {ITEM_COLUMNS}",
+                                         (item_id,))
+                    deleted_item = await cursor.fetchone()
+            return dict(zip(COLUMN_NAMES, deleted_item)) if deleted_item else None
+        except Exception as e:
+            raise e
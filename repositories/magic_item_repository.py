@@ -1,208 +1,1118 @@
-from typing import List, Dict, Any, Optional
-from db import get_connection
+import hashlib
+import itertools
+import math
+import re
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Callable, List, Dict, Any, Optional, Tuple
+import numpy as np
+from db import pooled_connection
+from domain.magic_item import MagicItemRecord
+from domain.rarity_tier import rarity_tier, rarity_tier_rank, rarity_tier_sql
+from domain.wear import FULL_DURABILITY, apply_wear, is_consumable
+from metrics import timed
+
+# The one column layout shared by every query, MagicItemRecord and the dicts served by the API
+COLUMN_NAMES = list(MagicItemRecord._fields)
+# Queries name their columns instead of using *, so added columns (e.g. search_vector) never shift the row layout
+ITEM_COLUMNS = ", ".join(COLUMN_NAMES)
+
+
+def rows_to_dicts(rows: list) -> List[dict]:
+    """
+    Map item rows selected with ITEM_COLUMNS to dicts.
+    """
+    with timed("rows_to_dict"):
+        return [dict(zip(COLUMN_NAMES, row)) for row in rows]
+
+
+def rows_to_records(rows: list) -> List[MagicItemRecord]:
+    """
+    Wrap item rows selected with ITEM_COLUMNS in MagicItemRecord, a fraction of the memory and time of dicts.
+    """
+    with timed("rows_to_records"):
+        return list(map(MagicItemRecord._make, rows))
+
+
+def record_from_dict(item: dict) -> MagicItemRecord:
+    return MagicItemRecord._make(item.get(column) for column in COLUMN_NAMES)
+
+
+def with_rarity_tier(item: dict) -> dict:
+    """
+    The item with rarity_tier classified from its rarity_value, as every insert stores it.
+    """
+    return {**item, 'rarity_tier': rarity_tier(item.get('rarity_value'))}
+
+
+# One statement for any batch size: each column travels as a single array parameter and
+# WITH ORDINALITY keeps the generated ids in the order the items were given.
+BULK_INSERT_QUERY = """
+    INSERT INTO magic_items
+    (name, description, level, type, category, rarity_value, weight, value, durability, stock, rarity_tier)
+    SELECT name, description, level, type, category, rarity_value, weight, value, durability, stock, rarity_tier
+    FROM unnest(%s::varchar[], %s::text[], %s::int[], %s::varchar[], %s::varchar[],
+                %s::float8[], %s::float8[], %s::int[], %s::float8[], %s::int[], %s::varchar[])
+         WITH ORDINALITY AS t(name, description, level, type, category, rarity_value, weight, value, durability,
+                              stock, rarity_tier, ord)
+    ORDER BY ord
+    RETURNING id, version
+"""
+
+
+def bulk_insert_params(items: List[dict]) -> tuple:
+    """
+    Transpose a list of item dicts into the column arrays expected by BULK_INSERT_QUERY.
+    """
+    return (
+        [item['name'] for item in items],
+        [item.get('description') for item in items],
+        [item.get('level') for item in items],
+        [item.get('type') for item in items],
+        [item.get('category') for item in items],
+        [item['rarity_value'] for item in items],
+        [item['weight'] for item in items],
+        [item.get('value') for item in items],
+        [item['durability'] for item in items],
+        [item.get('stock', 1) for item in items],
+        [rarity_tier(item['rarity_value']) for item in items],
+    )
+
+
+# Keyset pagination: seeks through the primary key index, so page N costs the same as page 1.
+ITEMS_PAGE_QUERY = f"SELECT {ITEM_COLUMNS} FROM magic_items WHERE id > %s ORDER BY id LIMIT %s"
+
+# What the ETag of a list of items is made of. Reading only these for a page or a search costs a fraction of the
+# whole rows, enough to answer a client whose copy is still current (If-None-Match) with a 304
+VERSION_COLUMNS = ("id", "version")
+ITEMS_PAGE_VERSIONS_QUERY = f"SELECT {', '.join(VERSION_COLUMNS)} FROM magic_items WHERE id > %s ORDER BY id LIMIT %s"
+
+
+def rows_to_versions(rows: list) -> List[dict]:
+    """
+    Map rows selected with VERSION_COLUMNS to dicts.
+    """
+    return [{"id": item_id, "version": version} for item_id, version in rows]
+
+
+# The columns the analytics snapshot holds, fetched as one array per column in a single scan: every array_agg
+# sees the rows in the same order, and psycopg builds a few long lists instead of a tuple per row.
+SNAPSHOT_COLUMNS = ("id", "category", "type", "rarity_tier", "level", "rarity_value", "weight", "value", "durability",
+                    "stock")
+SNAPSHOT_COLUMNS_QUERY = f"SELECT {', '.join(f'array_agg({column})' for column in SNAPSHOT_COLUMNS)} FROM magic_items"
+
+# Totals plus per-category, per-type and per-rarity-tier breakdowns in a single scan of the table.
+STATISTICS_TOTALS_QUERY = """
+    SELECT GROUPING(category), GROUPING(type), GROUPING(rarity_tier), category, type, rarity_tier,
+           COUNT(*), COALESCE(SUM(stock), 0), COALESCE(SUM(value::bigint * stock), 0)
+    FROM magic_items
+    GROUP BY GROUPING SETS ((), (category), (type), (rarity_tier))
+"""
+
+# statistics key -> the column it breaks the totals down by
+STATISTICS_GROUPS = (("by_category", "category"), ("by_type", "type"), ("by_rarity_tier", "rarity_tier"))
+
+
+def statistics_group_order(group: str, value) -> tuple:
+    """
+    Sort key of a breakdown entry: tiers in threshold order, anything else by name, NULL last.
+    """
+    if group == "rarity_tier":
+        return rarity_tier_rank(value)
+    return value is None, value or ""
+
+
+# The extreme rows, each found with ORDER BY ... LIMIT 1 instead of loading the table.
+STATISTICS_EXTREMES_QUERY = f"""
+    (SELECT 'most_expensive_item', {ITEM_COLUMNS}
+     FROM magic_items WHERE value IS NOT NULL ORDER BY value DESC, id LIMIT 1)
+    UNION ALL
+    (SELECT 'cheapest_item', {ITEM_COLUMNS}
+     FROM magic_items WHERE value IS NOT NULL ORDER BY value, id LIMIT 1)
+    UNION ALL
+    (SELECT 'most_stocked_item', {ITEM_COLUMNS}
+     FROM magic_items WHERE stock IS NOT NULL ORDER BY stock DESC, id LIMIT 1)
+    UNION ALL
+    (SELECT 'highest_level_item', {ITEM_COLUMNS}
+     FROM magic_items WHERE level IS NOT NULL ORDER BY level DESC, id LIMIT 1)
+"""
+
+
+def build_statistics(totals_rows: list, extreme_rows: list) -> Dict[str, Any]:
+    """
+    Shape the rows of STATISTICS_TOTALS_QUERY and STATISTICS_EXTREMES_QUERY into the statistics response.
+    """
+    statistics = {
+        "total_items": 0,
+        "total_stock": 0,
+        "total_value": 0,
+        "most_expensive_item": None,
+        "cheapest_item": None,
+        "most_stocked_item": None,
+        "highest_level_item": None,
+        "by_category": [],
+        "by_type": [],
+        "by_rarity_tier": [],
+    }
+    # GROUPING(column) is 1 when the row is aggregated over that column
+    for category_rolled_up, type_rolled_up, tier_rolled_up, category, item_type, tier, count, stock, value \
+            in totals_rows:
+        totals = {"total_items": count, "total_stock": int(stock), "total_value": int(value)}
+        if not category_rolled_up:
+            statistics["by_category"].append({"category": category, **totals})
+        elif not type_rolled_up:
+            statistics["by_type"].append({"type": item_type, **totals})
+        elif not tier_rolled_up:
+            statistics["by_rarity_tier"].append({"rarity_tier": tier, **totals})
+        else:
+            statistics.update(totals)
+    for row in extreme_rows:
+        statistics[row[0]] = dict(zip(COLUMN_NAMES, row[1:]))
+    for key, group in STATISTICS_GROUPS:
+        statistics[key].sort(key=lambda entry: statistics_group_order(group, entry[group]))
+    return statistics
+
+
+class QueryCache:
+    """
+    Compiled SQL per query shape, plus bookkeeping of server-side prepared statements per connection.
+
+    A shape is what decides the SQL text, e.g. the set of search criteria keys, so every search for
+    {'category': ..., 'level__gte': ...} reuses one string and one prepared statement whatever the values.
+    """
+
+    def __init__(self, max_size: int = 256):
+        self.max_size = max_size
+        self._statements = OrderedDict()
+        self._prepared = weakref.WeakKeyDictionary()  # psycopg2 connection -> names prepared on it
+        self._lock = threading.Lock()
+        self._counters = {"statement_hits": 0, "statement_misses": 0, "prepares": 0, "prepared_executions": 0}
+
+    def statement(self, shape: tuple, compile_statement: Callable[[], str]) -> str:
+        """
+        Get the SQL for a query shape, compiling it on first use (least recently used shapes are evicted).
+        """
+        with self._lock:
+            query = self._statements.get(shape)
+            if query is not None:
+                self._statements.move_to_end(shape)
+                self._counters["statement_hits"] += 1
+                return query
+            self._counters["statement_misses"] += 1
+        query = compile_statement()
+        with self._lock:
+            self._statements[shape] = query
+            if len(self._statements) > self.max_size:
+                self._statements.popitem(last=False)
+        return query
+
+    def execute_prepared(self, cursor, query: str, params) -> None:
+        """
+        Run a query through a server-side prepared statement on the cursor's (psycopg2) connection.
+        The statement is PREPAREd the first time this connection sees the query and EXECUTEd afterwards,
+        so Postgres parses and plans it once per pooled connection instead of on every call.
+        """
+        name = "stmt_" + hashlib.md5(query.encode()).hexdigest()[:16]
+        with self._lock:
+            prepared = self._prepared.setdefault(cursor.connection, set())
+            is_prepared = name in prepared
+        if not is_prepared:
+            # PREPARE is not transactional, a later rollback does not drop the statement
+            cursor.execute(f"PREPARE {name} AS {_positional(query)}")
+            with self._lock:
+                prepared.add(name)
+                self._counters["prepares"] += 1
+        placeholders = ", ".join(["%s"] * len(params))
+        cursor.execute(f"EXECUTE {name}({placeholders})" if params else f"EXECUTE {name}", params)
+        with self._lock:
+            self._counters["prepared_executions"] += 1
+
+    def count_prepared_execution(self):
+        with self._lock:
+            self._counters["prepared_executions"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the statement cache counters.
+        Returns:
+            Dict[str, Any]: Hits/misses of compiled statements, statements prepared and executions through them.
+        """
+        with self._lock:
+            lookups = self._counters["statement_hits"] + self._counters["statement_misses"]
+            return {
+                **self._counters,
+                "statement_hit_rate": self._counters["statement_hits"] / lookups if lookups else 0.0,
+                "cached_statements": len(self._statements),
+            }
+
+
+def _positional(query: str) -> str:
+    """
+    Turn %s placeholders into PREPARE's $1, $2, ... (and %% back into %).
+    """
+    counter = itertools.count(1)
+    return re.sub(r"%%|%s", lambda match: "%" if match.group() == "%%" else f"${next(counter)}", query)
+
+
+query_cache = QueryCache()
+
+GET_ITEM_BY_ID_QUERY = f"SELECT {ITEM_COLUMNS} FROM magic_items WHERE id = %s"
+UPDATE_STOCK_QUERY = f"UPDATE magic_items SET stock = stock + %s WHERE id = %s RETURNING {ITEM_COLUMNS}"
+LOCK_STOCK_QUERY = "SELECT stock FROM magic_items WHERE id = %s FOR UPDATE"
+SET_STOCK_QUERY = f"UPDATE magic_items SET stock = %s WHERE id = %s RETURNING {ITEM_COLUMNS}"
+
+
+def accept_stock_deltas(stock: Optional[int], deltas: List[int]) -> Tuple[int, List[bool]]:
+    """
+    Apply deltas to a stock in arrival order, skipping every decrease that would take it below zero.
+    Returns:
+        Tuple[int, List[bool]]: The resulting stock and whether each delta was accepted.
+    """
+    stock = stock or 0
+    accepted = []
+    for delta in deltas:
+        if stock + delta >= 0:
+            stock += delta
+            accepted.append(True)
+        else:
+            accepted.append(False)
+    return stock, accepted
+
+
+# A whole batch of stock deltas in one statement. Deltas for the same item are summed, rows are locked in id
+# order so concurrent batches cannot deadlock, and nothing is written unless every item exists and keeps
+# stock >= 0. Returns one row per item: (id, found, stock before, *updated columns or NULLs).
+ADJUST_STOCK_QUERY = f"""
+    WITH request AS (
+        SELECT id, SUM(delta)::int AS delta FROM unnest(%s::int[], %s::int[]) AS r(id, delta) GROUP BY id
+    ), locked AS (
+        SELECT m.id, m.stock FROM magic_items m JOIN request r ON r.id = m.id ORDER BY m.id FOR UPDATE OF m
+    ), rejected AS (
+        SELECT r.id FROM request r LEFT JOIN locked l ON l.id = r.id
+        WHERE l.id IS NULL OR COALESCE(l.stock, 0) + r.delta < 0
+    ), updated AS (
+        UPDATE magic_items m SET stock = COALESCE(m.stock, 0) + r.delta
+        FROM request r
+        WHERE m.id = r.id AND NOT EXISTS (SELECT 1 FROM rejected)
+        RETURNING {", ".join("m." + column for column in COLUMN_NAMES)}
+    )
+    SELECT r.id, l.id IS NOT NULL, l.stock, {", ".join("u." + column for column in COLUMN_NAMES)}
+    FROM request r LEFT JOIN locked l ON l.id = r.id LEFT JOIN updated u ON u.id = r.id
+"""
+
+
+def adjust_stock_params(adjustments: List[dict]) -> tuple:
+    """
+    Transpose stock adjustments ({'item_id', 'delta'} dicts) into the arrays expected by ADJUST_STOCK_QUERY.
+    """
+    return [line['item_id'] for line in adjustments], [line['delta'] for line in adjustments]
+
+
+def build_stock_adjustment(adjustments: List[dict], rows: list) -> Tuple[Dict[str, Any], List[Tuple[dict, dict]]]:
+    """
+    Shape the rows of ADJUST_STOCK_QUERY into a per-line report.
+    Args:
+        adjustments (List[dict]): The requested lines, in request order.
+        rows (list): The rows returned by ADJUST_STOCK_QUERY.
+    Returns:
+        Tuple[Dict[str, Any], List[Tuple[dict, dict]]]: The report, {'applied': bool, 'lines': [...]} where each
+        line has item_id, delta, status ('applied', 'not_found', 'insufficient_stock' or 'aborted' when another
+        line failed) and stock (after the batch if applied, the unchanged stock otherwise), plus a
+        (previous, updated) item pair per changed item.
+    """
+    by_id = {row[0]: row for row in rows}
+    applied = all(row[3] is not None for row in rows)
+    totals = {}
+    for line in adjustments:
+        totals[line['item_id']] = totals.get(line['item_id'], 0) + line['delta']
+
+    lines = []
+    for line in adjustments:
+        item_id, found, stock_before = by_id[line['item_id']][:3]
+        if applied:
+            status, stock = 'applied', by_id[item_id][3 + COLUMN_NAMES.index('stock')]
+        elif not found:
+            status, stock = 'not_found', None
+        elif (stock_before or 0) + totals[item_id] < 0:
+            status, stock = 'insufficient_stock', stock_before
+        else:
+            status, stock = 'aborted', stock_before
+        lines.append({'item_id': item_id, 'delta': line['delta'], 'status': status, 'stock': stock})
+
+    changes = []
+    if applied:
+        for item_id, _, stock_before, *columns in rows:
+            updated_item = dict(zip(COLUMN_NAMES, columns))
+            changes.append(({**updated_item, 'stock': stock_before}, updated_item))
+    return {'applied': applied, 'lines': lines}, changes
+
+
+# The columns a search may filter and sort on, nothing else ever reaches the SQL text of a search.
+# Value-list (IN) filters match text columns or ids, range filters numeric columns.
+SEARCH_LIST_COLUMNS = ("id", "name", "type", "category", "rarity_tier")
+SEARCH_RANGE_COLUMNS = ("id", "level", "rarity_value", "weight", "value", "durability", "stock")
+SEARCH_SORT_COLUMNS = tuple(column for column in COLUMN_NAMES if column != "description")
+INTEGER_COLUMNS = ("id", "level", "value", "stock")
+
+
+def search_conditions(keys: Tuple[str, ...]) -> List[str]:
+    """
+    Translate criteria keys such as ('category', 'level__gte') into WHERE conditions, one %s each.
+    Raises:
+        ValueError: If a key names a column searches may not filter on.
+    """
+    conditions = []
+    for key in keys:
+        if key.endswith("__gte") and key[:-5] in SEARCH_RANGE_COLUMNS:
+            conditions.append(f"{key[:-5]} >= %s")
+        elif key.endswith("__lte") and key[:-5] in SEARCH_RANGE_COLUMNS:
+            conditions.append(f"{key[:-5]} <= %s")
+        elif key in SEARCH_LIST_COLUMNS or key in SEARCH_RANGE_COLUMNS:
+            conditions.append(f"{key} = %s")
+        else:
+            raise ValueError(f"Cannot search on {key}")
+    return conditions
+
+
+def _compile_search(keys: Tuple[str, ...], columns: str) -> str:
+    conditions = search_conditions(keys)
+    query = f"SELECT {columns} FROM magic_items"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    return query
+
+
+def build_search_query(search_criteria: Dict[str, Any], columns: str = ITEM_COLUMNS) -> Tuple[str, list]:
+    """
+    Build the SELECT for search_items from criteria such as {'category': 'Armor', 'level__gte': 5}, selecting
+    columns (every item column by default).
+    Returns:
+        Tuple[str, list]: The query and its parameters.
+    """
+    keys = tuple(sorted(search_criteria))
+    query = query_cache.statement(("search", keys, columns), lambda: _compile_search(keys, columns))
+    return query, [search_criteria[key] for key in keys]
+
+
+def _text_match(fuzzy: bool) -> Tuple[str, str]:
+    # The match condition and the rank expression of a text search over FROM ..., <tsquery> AS query
+    if fuzzy:
+        return ("(search_vector @@ query OR %s <%% name OR %s <%% description)",
+                "ts_rank(search_vector, query) + word_similarity(%s, name)")
+    return "search_vector @@ query", "ts_rank(search_vector, query)"
+
+
+def _compile_text_search(keys: Tuple[str, ...], fuzzy: bool, columns: str) -> str:
+    match, rank = _text_match(fuzzy)
+    return (f"SELECT {columns} FROM magic_items, websearch_to_tsquery('english', %s) AS query "
+            f"WHERE {' AND '.join([match] + search_conditions(keys))} "
+            f"ORDER BY {rank} DESC, id LIMIT %s OFFSET %s")
+
+
+def build_text_search_query(text: str, search_criteria: Dict[str, Any], limit: int, offset: int = 0,
+                            fuzzy: bool = True, columns: str = ITEM_COLUMNS) -> Tuple[str, list]:
+    """
+    Build a relevance-ranked search over name and description.
+    Matches use the stored search_vector (full text, GIN indexed); with fuzzy, names or descriptions that
+    contain a word similar to the text (pg_trgm word similarity, trigram indexed) match as well, so typos
+    such as "Clok" still find "Cloak" items.
+    Args:
+        text (str): The search text, in websearch syntax ("fire sword", "cloak -invisibility").
+        search_criteria (Dict[str, Any]): Additional filters, as for build_search_query.
+        limit (int): The page size.
+        offset (int): The number of ranked matches to skip.
+        fuzzy (bool): Also match by trigram similarity.
+        columns (str): The columns to select, every item column by default.
+    Returns:
+        Tuple[str, list]: The query and its parameters.
+    """
+    keys = tuple(sorted(search_criteria))
+    query = query_cache.statement(("text_search", keys, fuzzy, columns),
+                                  lambda: _compile_text_search(keys, fuzzy, columns))
+    filter_params = [search_criteria[key] for key in keys]
+    if fuzzy:
+        return query, [text, text, text] + filter_params + [text, limit, offset]
+    return query, [text] + filter_params + [limit, offset]
+
+
+def _filter_shape(search_filter: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+    """
+    The (column, operator) pairs of a structured search filter, e.g. (('category', 'in'), ('level', 'gte')).
+    """
+    shape = []
+    for column in sorted(search_filter):
+        condition = search_filter[column]
+        if isinstance(condition, (list, tuple)) and column in SEARCH_LIST_COLUMNS:
+            shape.append((column, "in"))
+        elif isinstance(condition, dict) and column in SEARCH_RANGE_COLUMNS and set(condition) <= {"gte", "lte"}:
+            shape += [(column, operator) for operator in ("gte", "lte") if condition.get(operator) is not None]
+        else:
+            raise ValueError(f"Cannot search on {column} with {condition!r}")
+    return tuple(shape)
+
+
+def _filter_params(search_filter: Dict[str, Any], shape: Tuple[Tuple[str, str], ...]) -> list:
+    params = []
+    for column, operator in shape:
+        condition = search_filter[column]
+        if operator == "in":
+            params.append(list(condition))
+            continue
+        bound = condition[operator]
+        if not math.isfinite(bound):
+            raise ValueError(f"Cannot search on {column} with {condition!r}")
+        if column in INTEGER_COLUMNS:
+            # An integer bound keeps the column's btree index usable, rounding inwards keeps the range exact
+            bound = math.ceil(bound) if operator == "gte" else math.floor(bound)
+        params.append(bound)
+    return params
+
+
+def _sort_keys(sort: List[str]) -> Tuple[Tuple[str, bool], ...]:
+    keys = []
+    for key in sort:
+        column = key[1:] if key.startswith("-") else key
+        if column not in SEARCH_SORT_COLUMNS:
+            raise ValueError(f"Cannot sort on {column}")
+        keys.append((column, key.startswith("-")))
+    return tuple(keys)
+
+
+def _compile_structured_search(where: tuple, any_of: tuple, sort: tuple) -> str:
+    def conditions(shape) -> List[str]:
+        operators = {"in": "= ANY(%s)", "gte": ">= %s", "lte": "<= %s"}
+        return [f"{column} {operators[operator]}" for column, operator in shape]
+
+    clauses = conditions(where)
+    if any_of:
+        clauses.append("(" + " OR ".join(f"({' AND '.join(conditions(shape)) or 'TRUE'})" for shape in any_of) + ")")
+    # PostgreSQL's default NULL placement (last ascending, first descending), which a btree index scan can serve
+    # in either direction
+    order = [f"{column} DESC" if descending else column for column, descending in sort]
+    if "id" not in (column for column, _ in sort):
+        order.append("id")  # a total order, so limit/offset pages neither repeat nor skip items
+    query = f"SELECT {ITEM_COLUMNS} FROM magic_items"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    return query + f" ORDER BY {', '.join(order)} LIMIT %s OFFSET %s"
+
+
+def build_structured_search_query(search: Dict[str, Any]) -> Tuple[str, list]:
+    """
+    Build one parameterized SELECT for a structured search.
+    Args:
+        search (Dict[str, Any]): where, a filter every item must match; any_of, filters of which an item must
+            match at least one; sort, columns with a leading - for descending order; limit and offset.
+            A filter maps a column to a list of values (IN, for SEARCH_LIST_COLUMNS) or to an inclusive range
+            {"gte": ..., "lte": ...} (for SEARCH_RANGE_COLUMNS), e.g. {"category": ["Armor"], "level": {"gte": 5}}.
+    Returns:
+        Tuple[str, list]: The query and its parameters. The SQL only depends on the columns and operators used,
+        so searches differing in values (or list lengths) share one compiled and prepared statement.
+    Raises:
+        ValueError: If a filter or sort key names a column outside the whitelist.
+    """
+    where = search.get("where") or {}
+    any_of = search.get("any_of") or []
+    where_shape = _filter_shape(where)
+    any_of_shapes = tuple(_filter_shape(group) for group in any_of)
+    sort = _sort_keys(search.get("sort") or [])
+    query = query_cache.statement(("structured_search", where_shape, any_of_shapes, sort),
+                                  lambda: _compile_structured_search(where_shape, any_of_shapes, sort))
+    params = _filter_params(where, where_shape)
+    for group, shape in zip(any_of, any_of_shapes):
+        params += _filter_params(group, shape)
+    return query, params + [search["limit"], search.get("offset", 0)]
+
+
+def _compile_tier_counts(keys: Tuple[str, ...], text_search: bool, fuzzy: bool) -> str:
+    conditions = search_conditions(keys)
+    source = "magic_items"
+    if text_search:
+        conditions.insert(0, _text_match(fuzzy)[0])
+        source += ", websearch_to_tsquery('english', %s) AS query"
+    query = f"SELECT rarity_tier, COUNT(*) FROM {source}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    return query + " GROUP BY rarity_tier"
+
+
+def build_tier_counts_query(search_criteria: Dict[str, Any], text: Optional[str] = None,
+                            fuzzy: bool = True) -> Tuple[str, list]:
+    """
+    Build the per-rarity-tier count of every item a search matches, not just of one page.
+    Args:
+        search_criteria (Dict[str, Any]): Filters, as for build_search_query.
+        text (Optional[str]): The text of a text search, as for build_text_search_query, None for a plain search.
+        fuzzy (bool): Whether the text search also matches by trigram similarity.
+    Returns:
+        Tuple[str, list]: The query and its parameters.
+    """
+    keys = tuple(sorted(search_criteria))
+    text_search = text is not None
+    query = query_cache.statement(("tier_counts", keys, text_search, fuzzy),
+                                  lambda: _compile_tier_counts(keys, text_search, fuzzy))
+    params = [search_criteria[key] for key in keys]
+    if not text_search:
+        return query, params
+    return query, [text] + ([text, text] if fuzzy else []) + params
+
+
+def build_tier_counts(rows: list) -> List[Dict[str, Any]]:
+    """
+    Shape the rows of a build_tier_counts_query query, tiers in threshold order.
+    """
+    counts = [{"rarity_tier": tier, "total_items": count} for tier, count in rows]
+    return sorted(counts, key=lambda entry: rarity_tier_rank(entry["rarity_tier"]))
+
+
+# Reclassifies the items whose stored tier differs from RARITY_TIERS, a no-op while the thresholds are unchanged
+RECLASSIFY_RARITY_TIERS_QUERY = (f"UPDATE magic_items SET rarity_tier = {rarity_tier_sql()} "
+                                 f"WHERE rarity_tier IS DISTINCT FROM {rarity_tier_sql()}")
+
+
+def _compile_update(keys: Tuple[str, ...], with_previous: bool, conditional: bool) -> str:
+    set_clause = ", ".join([f"{key} = %s" for key in keys])
+    if not with_previous:
+        return (f"UPDATE magic_items SET {set_clause} WHERE id = %s "
+                f"{'AND version = ANY(%s) ' if conditional else ''}RETURNING {ITEM_COLUMNS}")
+    # The locked row is re-read once a concurrent update commits, so the version compared is the latest one
+    return (f"UPDATE magic_items SET {set_clause} "
+            f"FROM (SELECT {ITEM_COLUMNS} FROM magic_items WHERE id = %s FOR UPDATE) AS previous "
+            f"WHERE magic_items.id = previous.id {'AND previous.version = ANY(%s) ' if conditional else ''}"
+            f"RETURNING {', '.join(f'magic_items.{column}' for column in COLUMN_NAMES)}, "
+            f"{', '.join(f'previous.{column}' for column in COLUMN_NAMES)}")
+
+
+def build_update_query(item_id: int, update_data: dict, with_previous: bool = False,
+                       expected_versions: Optional[List[int]] = None) -> Tuple[str, list]:
+    """
+    Build the UPDATE for update_item, reclassifying rarity_tier when rarity_value changes. With with_previous the
+    row before the update is returned as well, after the updated one. With expected_versions the row is only
+    updated if its version is one of them (If-Match), otherwise nothing is returned.
+    Returns:
+        Tuple[str, list]: The query and its parameters.
+    """
+    if 'rarity_value' in update_data:
+        update_data = with_rarity_tier(update_data)
+    keys = tuple(sorted(update_data))
+    conditional = expected_versions is not None
+    query = query_cache.statement(("update", keys, with_previous, conditional),
+                                  lambda: _compile_update(keys, with_previous, conditional))
+    params = [update_data[key] for key in keys] + [item_id]
+    if conditional:
+        params.append(list(expected_versions))
+    return query, params
+
+
+# The version column is kept by a trigger, see migrations/0009_item_version.sql
+GET_VERSION_QUERY = "SELECT version FROM magic_items WHERE id = %s"
+
+
+class ItemVersionMismatchError(Exception):
+    """
+    Raised when a conditional update finds the item at another version than the client has (If-Match): it was
+    changed since the client read it. Nothing is written.
+    """
+
+    def __init__(self, item_id: int, version: int):
+        super().__init__(f"Item {item_id} has changed, it is now at version {version}")
+        self.item_id = item_id
+        self.version = version
+
+
+# Sell/buy ledger and wallet, see migrations/0007_item_transactions.sql
+TRANSACTION_COLUMNS = ("id", "idempotency_key", "kind", "item_id", "quantity", "unit_price", "amount", "stock_after",
+                       "created_at")
+TRANSACTION_KINDS = ("sell", "buy")
+# The shard purchases debit. Its row lock serializes purchases, so two of them never spend the same funds
+DEBIT_WALLET_SHARD = 0
+
+# Takes stock out (sell, negative delta) or puts it in (buy), only if the stock stays >= 0
+TRADE_STOCK_QUERY = (f"UPDATE magic_items SET stock = COALESCE(stock, 0) + %s "
+                     f"WHERE id = %s AND COALESCE(stock, 0) + %s >= 0 RETURNING {ITEM_COLUMNS}")
+GET_STOCK_QUERY = "SELECT stock FROM magic_items WHERE id = %s"
+INSERT_TRANSACTION_QUERY = (f"INSERT INTO item_transactions "
+                            f"(idempotency_key, kind, item_id, quantity, unit_price, amount, stock_after) "
+                            f"VALUES (%s, %s, %s, %s, %s, %s, %s) ON CONFLICT (idempotency_key) DO NOTHING "
+                            f"RETURNING {', '.join(TRANSACTION_COLUMNS)}")
+GET_TRANSACTION_BY_KEY_QUERY = (f"SELECT {', '.join(TRANSACTION_COLUMNS)} FROM item_transactions "
+                                f"WHERE idempotency_key = %s")
+TRANSACTIONS_PAGE_QUERY = (f"SELECT {', '.join(TRANSACTION_COLUMNS)} FROM item_transactions "
+                           f"WHERE id > %s ORDER BY id LIMIT %s")
+CREDIT_WALLET_QUERY = ("INSERT INTO wallet_shards (shard, balance) VALUES (%s, %s) "
+                       "ON CONFLICT (shard) DO UPDATE SET balance = wallet_shards.balance + EXCLUDED.balance")
+LOCK_DEBIT_SHARD_QUERY = "SELECT balance FROM wallet_shards WHERE shard = %s FOR UPDATE"
+WALLET_BALANCE_QUERY = "SELECT COALESCE(SUM(balance), 0)::bigint, COUNT(*) FROM wallet_shards"
+
+
+class TransactionRejectedError(Exception):
+    """
+    Raised when a sale or purchase cannot be made: too little stock or funds, or an item without a price.
+    Nothing is written.
+    """
+
+
+def transaction_amount(kind: str, unit_price: int, quantity: int) -> int:
+    """
+    The wallet change of a transaction: positive for a sale, negative for a purchase.
+    """
+    if kind not in TRANSACTION_KINDS:
+        raise ValueError(f"Unknown transaction kind: {kind}")
+    return unit_price * quantity if kind == "sell" else -unit_price * quantity
+
+
+def stock_delta(kind: str, quantity: int) -> int:
+    """
+    The stock change of a transaction: a sale takes items out, a purchase puts them in.
+    """
+    return -quantity if kind == "sell" else quantity
+
+
+# Use events, see domain/wear.py. The rows of a batch are locked in id order, like ADJUST_STOCK_QUERY, so
+# concurrent batches cannot deadlock, and all the changed rows are written by one UPDATE
+LOCK_WEAR_QUERY = ("SELECT id, stock, durability, category, type FROM magic_items WHERE id = ANY(%s) "
+                   "ORDER BY id FOR UPDATE")
+APPLY_WEAR_QUERY = f"""
+    UPDATE magic_items m SET stock = w.stock, durability = w.durability
+    FROM unnest(%s::int[], %s::int[], %s::float8[]) AS w(id, stock, durability)
+    WHERE m.id = w.id
+    RETURNING {", ".join("m." + column for column in COLUMN_NAMES)}
+"""
+
+
+def build_wear_update(item_ids: np.ndarray, uses: np.ndarray, rows: list) -> Tuple[Dict[str, Any], tuple, dict]:
+    """
+    Work out a batch of use events on the rows of LOCK_WEAR_QUERY.
+    Args:
+        item_ids (np.ndarray): Distinct item ids, ascending, see aggregate_uses.
+        uses (np.ndarray): Total uses per item id.
+        rows (list): (id, stock, durability, category, type) of the items that exist, in id order.
+    Returns:
+        Tuple[Dict[str, Any], tuple, dict]: The batch report (items, not_found, out_of_stock: items whose uses were
+        ignored, stock_removed: units consumed or broken), the APPLY_WEAR_QUERY parameters for the items that
+        changed, and their (stock, durability) before the batch by item id.
+    """
+    found_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    found_uses = uses[np.searchsorted(item_ids, found_ids)] if len(rows) else np.zeros(0, dtype=np.int64)
+    stock = np.fromiter((row[1] or 0 for row in rows), dtype=np.int64, count=len(rows))
+    durability = np.fromiter((FULL_DURABILITY if row[2] is None else row[2] for row in rows), dtype=np.float64,
+                             count=len(rows))
+    consumable = np.fromiter((is_consumable(row[3], row[4]) for row in rows), dtype=bool, count=len(rows))
+
+    new_stock, new_durability = apply_wear(stock, durability, consumable, found_uses)
+    changed = np.flatnonzero((new_stock != stock) | (new_durability != durability))
+    report = {
+        "items": len(item_ids),
+        "not_found": len(item_ids) - len(rows),
+        "out_of_stock": int(np.count_nonzero(stock == 0)),
+        "stock_removed": int((stock - new_stock).sum()),
+    }
+    params = (found_ids[changed].tolist(), new_stock[changed].tolist(), new_durability[changed].tolist())
+    previous = {rows[i][0]: (rows[i][1], rows[i][2]) for i in changed.tolist()}
+    return report, params, previous
+
+
+# Change feed, see migrations/0008_item_changes.sql
+CHANGE_COLUMNS = ("seq", "op", "item_id", "item", "changed_at")
+# Arbitrary key for pg_advisory_xact_lock, so only one reader at a time numbers the pending changes
+SEQUENCE_CHANGES_LOCK_ID = 7302
+SEQUENCE_CHANGES_BATCH = 10000
+TRY_LOCK_SEQUENCER_QUERY = "SELECT pg_try_advisory_xact_lock(%s)"
+# Runs after the lock in its own statement, so its snapshot includes whatever the previous holder numbered
+SEQUENCE_CHANGES_QUERY = """
+    UPDATE item_changes c SET seq = head.seq + pending.n
+    FROM (SELECT id, row_number() OVER (ORDER BY id) AS n FROM item_changes
+          WHERE seq IS NULL ORDER BY id LIMIT %s) AS pending,
+         (SELECT COALESCE(MAX(seq), 0) AS seq FROM item_changes) AS head
+    WHERE c.id = pending.id
+"""
+CHANGES_SINCE_QUERY = (f"SELECT {', '.join(CHANGE_COLUMNS)} FROM item_changes WHERE seq > %s "
+                       f"ORDER BY seq LIMIT %s")
+# Retention: deletes the numbered changes up to the newest one older than the given seconds, so what is kept is
+# still gapless, and always keeps the newest change, which tells the readers where the feed stands
+PRUNE_CHANGES_LOCK_ID = 7304
+TRY_LOCK_PRUNE_CHANGES_QUERY = "SELECT pg_try_advisory_xact_lock(%s)"
+PRUNE_CHANGES_QUERY = """
+    DELETE FROM item_changes
+    WHERE seq <= (SELECT MAX(seq) FROM item_changes WHERE changed_at < now() - make_interval(secs => %s))
+      AND seq < (SELECT MAX(seq) FROM item_changes)
+"""
+
+
+class ChangesPrunedError(Exception):
+    """
+    Raised when the changes right after a reader's position were deleted by the retention
+    (CHANGE_FEED_RETENTION_DAYS): the reader cannot catch up from the feed and has to read the items again.
+    """
+
+    def __init__(self, since: int, oldest_seq: int):
+        super().__init__(f"The changes after {since} are no longer kept, the oldest is {oldest_seq}: read the items "
+                         f"again and follow the feed from since 0")
+        self.since = since
+        self.oldest_seq = oldest_seq
+
+
+# Bulk import: the rows are copied into a temporary table, then merged into magic_items by name
+IMPORT_COLUMNS = ("name", "description", "level", "type", "category", "value", "stock", "rarity_value", "weight",
+                  "durability")
+# Columns an export has but an import cannot set, accepted so an export can be imported again and ignored
+IMPORT_IGNORED_COLUMNS = ("id", "rarity_tier", "version")
+# Arbitrary key for pg_advisory_xact_lock, so two imports never both insert a name neither saw in magic_items
+IMPORT_LOCK_ID = 7303
+LOCK_IMPORT_QUERY = "SELECT pg_advisory_xact_lock(%s)"
+CREATE_IMPORT_TABLE_QUERY = """
+    CREATE TEMP TABLE import_items (
+        ord BIGSERIAL,
+        name VARCHAR(255) NOT NULL,
+        description TEXT,
+        level INT,
+        type VARCHAR(255),
+        category VARCHAR(255),
+        value INT,
+        stock INT,
+        rarity_value FLOAT,
+        weight FLOAT,
+        durability FLOAT,
+        id TEXT,
+        rarity_tier TEXT,
+        version TEXT
+    ) ON COMMIT DROP
+"""
+# The last row of each name wins, kept in a table of its own so the statements below are planned with its real
+# size: autovacuum never analyzes temporary tables, and a guess of a handful of rows can give nested loops that
+# go quadratic on a large import
+LATEST_IMPORT_QUERY = """
+    CREATE TEMP TABLE import_latest ON COMMIT DROP AS
+    SELECT DISTINCT ON (name) * FROM import_items ORDER BY name, ord DESC
+"""
+ANALYZE_LATEST_IMPORT_QUERY = "ANALYZE import_latest"
+_IMPORT_UPDATED_COLUMNS = tuple(column for column in IMPORT_COLUMNS if column != "name")
+# A row updates the oldest item of its name (names are not unique) with the columns it has, NULL keeps the item's
+# value, and an item nothing changes for is left alone
+UPDATE_FROM_IMPORT_QUERY = f"""
+    UPDATE magic_items m SET
+        {', '.join(f'{column} = COALESCE(t.{column}, m.{column})' for column in _IMPORT_UPDATED_COLUMNS)},
+        rarity_tier = {rarity_tier_sql('COALESCE(t.rarity_value, m.rarity_value)')}
+    FROM (SELECT DISTINCT ON (m.name) m.id AS item_id, {', '.join(f'l.{column}' for column in _IMPORT_UPDATED_COLUMNS)}
+          FROM import_latest l JOIN magic_items m ON m.name = l.name
+          ORDER BY m.name, m.id) AS t
+    WHERE m.id = t.item_id
+      AND ({', '.join(f'COALESCE(t.{column}, m.{column})' for column in _IMPORT_UPDATED_COLUMNS)})
+          IS DISTINCT FROM ({', '.join(f'm.{column}' for column in _IMPORT_UPDATED_COLUMNS)})
+"""
+# A new name gets an item with stock 1 and random weight, durability and rarity_value like
+# MagicItemService.generate_random_values unless the row has them, in the order of the rows
+INSERT_FROM_IMPORT_QUERY = f"""
+    INSERT INTO magic_items ({', '.join(IMPORT_COLUMNS)}, rarity_tier)
+    SELECT {', '.join(IMPORT_COLUMNS)}, {rarity_tier_sql()}
+    FROM (SELECT name, description, level, type, category, value, COALESCE(stock, 1) AS stock,
+                 COALESCE(rarity_value, random() * 100) AS rarity_value,
+                 COALESCE(weight, 0.1 + random() * 9.9) AS weight,
+                 COALESCE(durability, 0.1 + random() * 0.8) AS durability, ord
+          FROM import_latest l WHERE NOT EXISTS (SELECT 1 FROM magic_items m WHERE m.name = l.name)) AS new_items
+    ORDER BY ord
+"""
+
+
+def build_import_copy_query(columns: Tuple[str, ...], csv: bool) -> str:
+    """
+    The COPY ... FROM STDIN loading import rows of the given columns, CSV or psycopg's write_row() rows.
+    Raises:
+        ValueError: On a column that is neither imported nor ignored.
+    """
+    unknown = [column for column in columns if column not in IMPORT_COLUMNS + IMPORT_IGNORED_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown import columns {unknown}, expected some of {list(IMPORT_COLUMNS)}")
+    if "name" not in columns:
+        raise ValueError("Imported rows need a name")
+    return f"COPY import_items ({', '.join(columns)}) FROM STDIN{' WITH (FORMAT csv)' if csv else ''}"
+
+
+def build_import_report(rows: int, names: int, created: int, updated: int) -> Dict[str, int]:
+    """
+    The counts of an import: rows read, duplicates (rows overridden by a later row with the same name), items
+    created and updated, and items the import left unchanged.
+    """
+    return {"rows": rows, "duplicates": rows - names, "created": created, "updated": updated,
+            "unchanged": names - created - updated}
+
+
+# Export, streamed by the database: CSV with a header row, or one JSON object per line. The JSON lines go out
+# as CSV too, with quote and delimiter bytes JSON never holds unescaped, because the text format would escape
+# the backslashes in them
+EXPORT_QUERIES = {
+    "csv": f"COPY (SELECT {ITEM_COLUMNS} FROM magic_items ORDER BY id) TO STDOUT WITH (FORMAT csv, HEADER)",
+    "ndjson": (f"COPY (SELECT row_to_json(item) FROM (SELECT {ITEM_COLUMNS} FROM magic_items ORDER BY id) AS item) "
+               f"TO STDOUT WITH (FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02')"),
+}
 
 
 class MagicItemRepository:
 
     @staticmethod
-    def create_item(item_data: dict) -> dict:
+    def create_item(item_data: dict) -> MagicItemRecord:
         """
         Create a new magic item in the database.
         Args:
             item_data (dict): A dictionary containing the data for the new item.
         Returns:
-            dict: A dictionary containing the data for the new item, including the generated ID.
+            MagicItemRecord: The new item, including the generated ID.
         Raises:
             Exception: If there is an error creating the item in the database.
         """
         try:
-            with get_connection() as conn:
+            item_data = with_rarity_tier(item_data)
+            with pooled_connection() as conn:
                 with conn.cursor() as cursor:
                     cursor.execute("""
                         INSERT INTO magic_items
-                        (name, description, level, type, category, rarity_value, weight, value, durability, stock)
-                        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s) RETURNING id
+                        (name, description, level, type, category, rarity_value, weight, value, durability, stock,
+                         rarity_tier)
+                        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s) RETURNING id, version
                     """, (
                         item_data['name'], item_data.get('description'), item_data.get('level'), item_data.get('type'),
                         item_data.get('category'), item_data['rarity_value'], item_data['weight'],
                         item_data.get('value'),
-                        item_data['durability'], item_data.get('stock', 1)
+                        item_data['durability'], item_data.get('stock', 1), item_data['rarity_tier']
                     ))
-                    item_id = cursor.fetchone()[0]
-                conn.commit()
-            return {**item_data, "id": item_id}
+                    item_id, version = cursor.fetchone()
+            return record_from_dict({"stock": 1, **item_data, "id": item_id, "version": version})
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    def create_items(items: List[dict]) -> List[MagicItemRecord]:
+        """
+        Create many magic items in a single INSERT and a single transaction.
+        Either every item is stored or, on error, none of them is.
+        Args:
+            items (List[dict]): The data for the new items.
+        Returns:
+            List[MagicItemRecord]: The new items, including the generated IDs, in input order.
+        Raises:
+            Exception: If there is an error creating the items in the database.
+        """
+        try:
+            if not items:
+                return []
+            with pooled_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(BULK_INSERT_QUERY, bulk_insert_params(items))
+                    rows = cursor.fetchall()
+            return [record_from_dict({"stock": 1, **with_rarity_tier(item), "id": item_id, "version": version})
+                    for item, (item_id, version) in zip(items, rows)]
         except Exception as e:
             raise e
 
     @staticmethod
-    def get_all_items() -> List[Dict[Any, Any]]:
+    def get_all_items() -> List[MagicItemRecord]:
         """
         Get all magic items from the database.
         Returns:
-            list[dict[Any, Any]]: A list of dictionaries containing the data for each item.
+            List[MagicItemRecord]: Every item.
         Raises:
             Exception: If there is an error fetching the items from the database.
         """
         try:
-            with get_connection() as conn:
+            with pooled_connection() as conn:
                 with conn.cursor() as cursor:
-                    cursor.execute("SELECT * FROM magic_items")
+                    cursor.execute(f"SELECT {ITEM_COLUMNS} FROM magic_items")
                     items = cursor.fetchall()
-            column_names = ['id', 'name', 'description', 'level', 'type', 'category', 'rarity_value', 'weight', 'value',
-                            'durability', 'stock']
-            all_items = [dict(zip(column_names, item)) for item in items]
-            return all_items
+            return rows_to_records(items)
         except Exception as e:
             raise e
 
     @staticmethod
-    def get_item_by_id(item_id: int) -> Optional[Dict[Any, Any]]:
+    def get_items_page(limit: int, after_id: int = 0) -> List[MagicItemRecord]:
+        """
+        Get one page of magic items ordered by ID.
+        Args:
+            limit (int): The maximum number of items to return.
+            after_id (int): Only items with an ID greater than this are returned.
+        Returns:
+            List[MagicItemRecord]: Up to limit items.
+        Raises:
+            Exception: If there is an error fetching the items from the database.
+        """
+        try:
+            with pooled_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(ITEMS_PAGE_QUERY, (after_id, limit))
+                    items = cursor.fetchall()
+            return rows_to_records(items)
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    def get_item_by_id(item_id: int) -> Optional[MagicItemRecord]:
         """
         Get a magic item from the database by its ID.
         Args:
             item_id (int): The ID of the item to fetch.
         Returns:
-            Optional[dict[Any, Any]]: A dictionary containing the data for the item, or None if the item does not exist.
+            Optional[MagicItemRecord]: The item, or None if the item does not exist.
         Raises:
             Exception: If there is an error fetching the item from the database.
         """
         try:
-            with get_connection() as conn:
+            with pooled_connection() as conn:
                 with conn.cursor() as cursor:
-                    cursor.execute("SELECT * FROM magic_items WHERE id = %s", (item_id,))
+                    query_cache.execute_prepared(cursor, GET_ITEM_BY_ID_QUERY, (item_id,))
                     item = cursor.fetchone()
-            if item:
-                column_names = ['id', 'name', 'description', 'level', 'type', 'category', 'rarity_value', 'weight',
-                                'value', 'durability', 'stock']
-                item = dict(zip(column_names, item))
-            return item
+            return MagicItemRecord._make(item) if item else None
         except Exception as e:
             raise e
 
     @staticmethod
-    def search_items(search_criteria: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def search_items(search_criteria: Dict[str, Any]) -> List[MagicItemRecord]:
         """
         Search for magic items based on specified criteria.
         """
         try:
-            query = "SELECT * FROM magic_items WHERE "
-            params = []
-            conditions = []
-
-            for key, value in search_criteria.items():
-                if key.endswith("__gte"):
-                    conditions.append(f"{key[:-5]} >= %s")
-                elif key.endswith("__lte"):
-                    conditions.append(f"{key[:-5]} <= %s")
-                else:
-                    conditions.append(f"{key} = %s")
-                params.append(value)
-
-            query += " AND ".join(conditions)
-
-            with get_connection() as conn:
+            query, params = build_search_query(search_criteria)
+
+            with pooled_connection() as conn:
                 with conn.cursor() as cursor:
-                    cursor.execute(query, params)
+                    query_cache.execute_prepared(cursor, query, params)
                     items = cursor.fetchall()
 
-            column_names = ['id', 'name', 'description', 'level', 'type', 'category', 'rarity_value', 'weight', 'value',
-                            'durability', 'stock']
-            matched_items = [dict(zip(column_names, item)) for item in items]
+            return rows_to_records(items)
+        except Exception as e:
+            raise e
 
-            return matched_items
+    @staticmethod
+    def text_search_items(text: str, search_criteria: Dict[str, Any], limit: int, offset: int = 0,
+                          fuzzy: bool = True) -> List[MagicItemRecord]:
+        """
+        Search magic items by text over name and description, most relevant first.
+        See build_text_search_query for the arguments.
+        """
+        try:
+            query, params = build_text_search_query(text, search_criteria, limit, offset, fuzzy)
+            with pooled_connection() as conn:
+                with conn.cursor() as cursor:
+                    query_cache.execute_prepared(cursor, query, params)
+                    items = cursor.fetchall()
+            return rows_to_records(items)
         except Exception as e:
             raise e
 
     @staticmethod
-    def update_item(item_id: int, update_data: dict) -> Optional[Dict[Any, Any]]:
+    def update_item(item_id: int, update_data: dict) -> Optional[MagicItemRecord]:
         """
         Update an item in the database with the given item ID and update data.
         Args:
             item_id (int): The ID of the item to update.
             update_data (dict): A dictionary containing the updated data for the item.
         Returns:
-            Optional[Dict[Any, Any]]: The updated item data if the update was successful, None otherwise.
+            Optional[MagicItemRecord]: The updated item if the update was successful, None otherwise.
         Raises:
             Exception: If an error occurs during the update process.
         """
         try:
-            set_clause = ", ".join([f"{key} = %s" for key in update_data.keys()])
-            values = list(update_data.values())
-            values.append(item_id)
+            query, values = build_update_query(item_id, update_data)
 
-            with get_connection() as conn:
+            with pooled_connection() as conn:
                 with conn.cursor() as cursor:
-                    cursor.execute(f"""
-                        UPDATE magic_items
-                        SET {set_clause}
-                        WHERE id = %s
-                        RETURNING *
-                    """, values)
+                    cursor.execute(query, values)
                     updated_item = cursor.fetchone()
-                    conn.commit()
 
-            if updated_item:
-                column_names = ['id', 'name', 'description', 'level', 'type', 'category', 'rarity_value', 'weight',
-                                'value', 'durability', 'stock']
-                updated_item = dict(zip(column_names, updated_item))
-            return updated_item
+            return MagicItemRecord._make(updated_item) if updated_item else None
         except Exception as e:
             raise e
 
     @staticmethod
-    def update_stock(item_id: int, quantity: int, operation: str) -> Optional[Dict[Any, Any]]:
+    def update_stock(item_id: int, quantity: int, operation: str) -> Optional[MagicItemRecord]:
         """
         Update the stock of an item in the database.
         """
         try:
-            with get_connection() as conn:
+            sign = {'increase': 1, 'decrease': -1}[operation]
+            with pooled_connection() as conn:
                 with conn.cursor() as cursor:
-                    if operation == 'increase':
-                        cursor.execute("""
-                            UPDATE magic_items
-                            SET stock = stock + %s
-                            WHERE id = %s
-                            RETURNING *
-                        """, (quantity, item_id))
-                    elif operation == 'decrease':
-                        cursor.execute("""
-                            UPDATE magic_items
-                            SET stock = stock - %s
-                            WHERE id = %s
-                            RETURNING *
-                        """, (quantity, item_id))
+                    query_cache.execute_prepared(cursor, UPDATE_STOCK_QUERY, (sign * quantity, item_id))
                     updated_item = cursor.fetchone()
-                    conn.commit()
-            if updated_item:
-                column_names = ['id', 'name', 'description', 'level', 'type', 'category', 'rarity_value', 'weight',
-                                'value', 'durability', 'stock']
-                updated_item = dict(zip(column_names, updated_item))
-            return updated_item
+            return MagicItemRecord._make(updated_item) if updated_item else None
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    def adjust_stock(adjustments: List[dict]) -> Tuple[Dict[str, Any], List[Tuple[dict, dict]]]:
+        """
+        Apply many stock deltas in one statement and one transaction, all or nothing.
+        Args:
+            adjustments (List[dict]): Lines with item_id and a signed delta.
+        Returns:
+            Tuple[Dict[str, Any], List[Tuple[dict, dict]]]: The per-line report and the (previous, updated)
+            item pairs, see build_stock_adjustment.
+        Raises:
+            Exception: If there is an error updating the database.
+        """
+        try:
+            with pooled_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(ADJUST_STOCK_QUERY, adjust_stock_params(adjustments))
+                    rows = cursor.fetchall()
+            return build_stock_adjustment(adjustments, rows)
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    def get_inventory_statistics() -> Dict[str, Any]:
+        """
+        Compute inventory statistics with aggregate queries in the database.
+        Returns:
+            Dict[str, Any]: Totals, the extreme items and per category/type breakdowns.
+        Raises:
+            Exception: If there is an error querying the database.
+        """
+        try:
+            with pooled_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(STATISTICS_TOTALS_QUERY)
+                    totals_rows = cursor.fetchall()
+                    cursor.execute(STATISTICS_EXTREMES_QUERY)
+                    extreme_rows = cursor.fetchall()
+            return build_statistics(totals_rows, extreme_rows)
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    def reclassify_rarity_tiers() -> int:
+        """
+        Store the tier RARITY_TIERS gives every item whose rarity_tier is out of date, e.g. after the thresholds
+        were changed.
+        Returns:
+            int: The number of items reclassified.
+        Raises:
+            Exception: If there is an error updating the database.
+        """
+        try:
+            with pooled_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(RECLASSIFY_RARITY_TIERS_QUERY)
+                    return cursor.rowcount
         except Exception as e:
             raise e
 
     @staticmethod
-    def delete_item(item_id: int) -> Optional[dict]:
+    def delete_item(item_id: int) -> Optional[MagicItemRecord]:
         """
         Delete an item from the database by its ID.
         Args:
             item_id (int): The ID of the item to delete.
         Returns:
-            Optional[dict]: The deleted item data if deletion was successful, None otherwise.
+            Optional[MagicItemRecord]: The deleted item if deletion was successful, None otherwise.
         Raises:
             Exception: If an error occurs during the deletion process.
         """
         try:
-            with get_connection() as conn:
+            with pooled_connection() as conn:
                 with conn.cursor() as cursor:
-                    cursor.execute("DELETE FROM magic_items WHERE id = %s RETURNING *", (item_id,))
+                    cursor.execute(f"DELETE FROM magic_items WHERE id = %s RETURNING {ITEM_COLUMNS}", (item_id,))
                     deleted_item = cursor.fetchone()
-                    conn.commit()
 
-            if deleted_item:
-                column_names = ['id', 'name', 'description', 'level', 'type', 'category', 'rarity_value', 'weight',
-                                'value', 'durability', 'stock']
-                deleted_item = dict(zip(column_names, deleted_item))
-            return deleted_item
+            return MagicItemRecord._make(deleted_item) if deleted_item else None
         except Exception as e:
             raise e
@@ -0,0 +1,665 @@
+from typing import AsyncIterator, Callable, List, Dict, Any, Optional, Tuple
+import numpy as np
+from config import Config
+from domain.wear import aggregate_uses
+from repositories.async_magic_item_repository import AsyncMagicItemRepository
+from repositories.magic_item_repository import (IMPORT_COLUMNS, ChangesPrunedError, ItemVersionMismatchError,
+                                                TransactionRejectedError, query_cache, stock_delta)
+from services.catalog_snapshot import CatalogSnapshot
+from services.catalog_transfer import check_format, count_bytes, csv_blocks, ndjson_batches
+from services.change_feed import ChangeFeed
+from services.item_cache import ItemCache, LRUItemCacheBackend
+from services.statistics_cache import InventoryStatisticsCache
+from services.stock_coalescer import StockDeltaCoalescer
+import random
+import time
+
+statistics_cache = InventoryStatisticsCache(max_age=Config.STATISTICS_CACHE_MAX_AGE)
+item_cache = ItemCache(LRUItemCacheBackend(max_entries=Config.ITEM_CACHE_MAX_ENTRIES, ttl=Config.ITEM_CACHE_TTL))
+# The change feed streams share one polling loop, the database trigger records every change
+change_feed = ChangeFeed(AsyncMagicItemRepository.get_changes, poll_interval=Config.CHANGE_FEED_POLL_INTERVAL)
+# Optional: the columnar catalog copy the analytics routes read, None unless ANALYTICS_SNAPSHOT_ENABLED
+catalog_snapshot = (CatalogSnapshot(max_age=Config.ANALYTICS_SNAPSHOT_MAX_AGE)
+                    if Config.ANALYTICS_SNAPSHOT_ENABLED else None)
+
+
+def _apply_change(previous_item: Optional[dict], updated_item: Optional[dict]):
+    statistics_cache.apply_change(previous_item, updated_item)
+    if catalog_snapshot is not None:
+        catalog_snapshot.apply_change(previous_item, updated_item)
+    change_feed.notify()
+
+
+def _apply_stock_change(updated_item: dict, delta: int):
+    stock = updated_item['stock']
+    previous_item = {**updated_item, 'stock': stock - delta if stock is not None else None}
+    _apply_change(previous_item, updated_item)
+
+
+async def _flush_stock_deltas(item_id: int, deltas: List[int]):
+    updated_item, previous_item, accepted = await AsyncMagicItemRepository.apply_stock_deltas(item_id, deltas)
+    if updated_item:
+        _apply_change(previous_item, updated_item)
+        await item_cache.update(updated_item)
+    return updated_item, accepted
+
+
+async def _apply_bulk_change():
+    # The rows a bulk write changed are not read back, so everything derived from them is dropped instead
+    statistics_cache.invalidate()
+    if catalog_snapshot is not None:
+        catalog_snapshot.invalidate()
+    await item_cache.clear()
+    change_feed.notify()
+
+
+# Optional: with a window set, stock changes are applied per item in batches and never take the stock below zero
+stock_coalescer = (StockDeltaCoalescer(Config.STOCK_COALESCE_WINDOW_MS / 1000, _flush_stock_deltas)
+                   if Config.STOCK_COALESCE_WINDOW_MS > 0 else None)
+
+
+async def _record_transaction(kind: str, item_id: int, quantity: int, unit_price: Optional[int],
+                              idempotency_key: Optional[str]) -> Optional[Dict[str, Any]]:
+    entry, updated_item, replayed = await AsyncMagicItemRepository.record_transaction(
+        kind, item_id, quantity, unit_price, idempotency_key, random.randint(1, Config.WALLET_SHARDS))
+    if entry is None:
+        return None
+    # A replay must repeat the request; without a unit_price the request took the one stored then
+    requested = (kind, item_id, quantity, entry['unit_price'] if unit_price is None else unit_price)
+    if replayed and (entry['kind'], entry['item_id'], entry['quantity'], entry['unit_price']) != requested:
+        raise TransactionRejectedError(f"Idempotency key {idempotency_key!r} was used for another transaction")
+    if updated_item:
+        _apply_stock_change(updated_item, stock_delta(kind, quantity))
+        await item_cache.update(updated_item)
+    return {**entry, "replayed": replayed}
+
+
+class AnalyticsDisabledError(Exception):
+    pass
+
+
+class AsyncMagicItemService:
+    """
+    Async counterpart of MagicItemService, awaited by the API routes.
+    MagicItemService stays the entry point for synchronous scripts.
+    """
+
+    @staticmethod
+    async def generate_random_values(item_data: dict) -> dict:
+        """
+        Generate random values for weight, durability, and rarity for a magic item.
+        Args:
+            item_data (dict): The data of the magic item.
+        Returns:
+            dict: The updated item data with generated random values.
+        Raises:
+            Exception: If an error occurs during the generation process.
+        """
+        try:
+            item_data['weight'] = random.uniform(0.1, 10.0)
+            item_data['durability'] = random.uniform(0.1, 0.9)
+            item_data['rarity_value'] = random.uniform(0.0, 100.0)
+            created_item = await AsyncMagicItemRepository.create_item(item_data)
+            _apply_change(None, created_item)
+            return created_item
+        except Exception as e:
+            raise Exception("Error generating random values: " + str(e))
+
+    @staticmethod
+    async def create_items(items: List[dict]) -> List[dict]:
+        """
+        Create many magic items at once, generating random weight, durability and rarity for each.
+        All items are written in one transaction, so either all of them are created or none is.
+        Args:
+            items (List[dict]): The data of the magic items.
+        Returns:
+            List[dict]: The created items with generated random values and IDs.
+        Raises:
+            Exception: If an error occurs during the creation process.
+        """
+        try:
+            for item_data in items:
+                item_data['weight'] = random.uniform(0.1, 10.0)
+                item_data['durability'] = random.uniform(0.1, 0.9)
+                item_data['rarity_value'] = random.uniform(0.0, 100.0)
+            created_items = await AsyncMagicItemRepository.create_items(items)
+            for created_item in created_items:
+                _apply_change(None, created_item)
+            return created_items
+        except Exception as e:
+            raise Exception("Error creating items: " + str(e))
+
+    @staticmethod
+    async def update_item(item_id: int, update_data: dict,
+                          expected_versions: Optional[List[int]] = None) -> Optional[dict]:
+        """
+        Update an item in the database with the given item ID and update data.
+        Args:
+            item_id (int): The ID of the item to update.
+            update_data (dict): A dictionary containing the updated data for the item.
+            expected_versions (Optional[List[int]]): Only update the item if its version is one of these, the
+            versions the client read (If-Match). None updates it whatever its version.
+        Returns:
+            Optional[dict]: The updated item data if the update was successful, None otherwise.
+        Raises:
+            ItemVersionMismatchError: If the item has changed since the client read it.
+        """
+        try:
+            update_data = {key: value for key, value in update_data.items() if value is not None}
+            updated_item, previous_item = await AsyncMagicItemRepository.update_item_with_previous(
+                item_id, update_data, expected_versions)
+            if updated_item:
+                _apply_change(previous_item, updated_item)
+                await item_cache.update(updated_item)
+            return updated_item
+        except ItemVersionMismatchError as e:
+            raise e
+        except Exception as e:
+            raise Exception("Error updating item: " + str(e))
+
+    @staticmethod
+    async def get_all_items() -> list[dict[Any, Any]]:
+        """
+        Get all magic items from the database.
+        Returns:
+            list[dict[Any, Any]]: A list of magic items.
+        Raises:
+            Exception: If an error occurs during the retrieval process.
+        """
+        try:
+            return await AsyncMagicItemRepository.get_all_items()
+        except Exception as e:
+            raise Exception("Error retrieving all items: " + str(e))
+
+    @staticmethod
+    async def get_items_page(limit: int, after_id: int = 0, versions_only: bool = False) -> Dict[str, Any]:
+        """
+        Get one page of magic items using keyset pagination on the item ID.
+        Args:
+            limit (int): The page size.
+            after_id (int): The cursor, the next_after_id of the previous page (0 for the first page).
+            versions_only (bool): Only read the id and version of the items, what the page's ETag is made of.
+        Returns:
+            Dict[str, Any]: The page items and next_after_id, None when there are no more items.
+        Raises:
+            Exception: If an error occurs during the retrieval process.
+        """
+        try:
+            # One extra row tells whether another page follows without a COUNT(*)
+            items = await AsyncMagicItemRepository.get_items_page(limit + 1, after_id, versions_only)
+            has_more = len(items) > limit
+            items = items[:limit]
+            return {"items": items, "next_after_id": items[-1]['id'] if has_more else None}
+        except Exception as e:
+            raise Exception("Error retrieving items page: " + str(e))
+
+    @staticmethod
+    async def stream_items(after_id: int = 0) -> AsyncIterator[dict[Any, Any]]:
+        """
+        Stream all magic items ordered by ID with flat memory use, for exports and NDJSON responses.
+        Args:
+            after_id (int): Only items with an ID greater than this are returned.
+        Yields:
+            dict[Any, Any]: One magic item at a time.
+        """
+        async for item in AsyncMagicItemRepository.stream_items(after_id, Config.ITEMS_STREAM_BATCH_SIZE):
+            yield item
+
+    @staticmethod
+    async def get_item_by_id(item_id: int) -> Optional[dict[Any, Any]]:
+        """
+        Get a magic item by its ID, read through the item cache.
+        Args:
+            item_id (int): The ID of the magic item.
+        Returns:
+            Optional[dict[Any, Any]]: The magic item if found, None otherwise.
+        Raises:
+            Exception: If an error occurs during the retrieval process.
+        """
+        try:
+            return await item_cache.get_or_load(item_id, AsyncMagicItemRepository.get_item_by_id)
+        except Exception as e:
+            raise Exception("Error retrieving item by ID: " + str(e))
+
+    @staticmethod
+    async def search_items(search_criteria: Dict[str, Any], versions_only: bool = False) -> List[Dict[str, Any]]:
+        """
+        Search for magic items based on specified criteria, with versions_only reading just their id and version.
+        """
+        try:
+            return await AsyncMagicItemRepository.search_items(search_criteria, versions_only)
+        except Exception as e:
+            raise Exception("Error searching items: " + str(e))
+
+    @staticmethod
+    async def structured_search_items(search: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Search for magic items with a structured search: IN lists, OR groups, ranges on every numeric column,
+        sort keys and limit/offset, run as one parameterized query.
+        Args:
+            search (Dict[str, Any]): A SearchRequest as a dict, without unset (None) conditions.
+        Returns:
+            List[Dict[str, Any]]: The matching items in the requested order.
+        Raises:
+            ValueError: If the search filters or sorts on a column that cannot be searched.
+        """
+        try:
+            return await AsyncMagicItemRepository.structured_search_items(search)
+        except ValueError as e:
+            raise e
+        except Exception as e:
+            raise Exception("Error searching items: " + str(e))
+
+    @staticmethod
+    async def count_rarity_tiers(search_criteria: Dict[str, Any], text: Optional[str] = None,
+                                 fuzzy: bool = True) -> List[Dict[str, Any]]:
+        """
+        Count every item a search matches per rarity tier, served by the rarity_tier index.
+        Args:
+            search_criteria (Dict[str, Any]): The search filters.
+            text (Optional[str]): The text of a text search, None for a plain search.
+            fuzzy (bool): Whether the text search is typo-tolerant.
+        Returns:
+            List[Dict[str, Any]]: rarity_tier and total_items, tiers in threshold order.
+        """
+        try:
+            return await AsyncMagicItemRepository.count_rarity_tiers(search_criteria, text, fuzzy)
+        except Exception as e:
+            raise Exception("Error counting rarity tiers: " + str(e))
+
+    @staticmethod
+    async def text_search_items(text: str, search_criteria: Dict[str, Any], limit: int, offset: int = 0,
+                                fuzzy: bool = True, versions_only: bool = False) -> List[Dict[str, Any]]:
+        """
+        Search magic items by text over name and description, ranked by relevance, optionally typo-tolerant.
+        """
+        try:
+            return await AsyncMagicItemRepository.text_search_items(text, search_criteria, limit, offset, fuzzy,
+                                                                    versions_only)
+        except Exception as e:
+            raise Exception("Error searching items: " + str(e))
+
+    @staticmethod
+    async def increase_stock(item_id: int, quantity: int) -> dict:
+        """
+        Increase the stock of a specific item.
+        """
+        try:
+            if stock_coalescer is not None:
+                return await stock_coalescer.submit(item_id, quantity)
+            updated_item = await AsyncMagicItemRepository.update_stock(item_id, quantity, operation='increase')
+            if updated_item:
+                _apply_stock_change(updated_item, quantity)
+                await item_cache.update(updated_item)
+            return updated_item
+        except Exception as e:
+            raise Exception("Error increasing stock: " + str(e))
+
+    @staticmethod
+    async def decrease_stock(item_id: int, quantity: int) -> dict:
+        """
+        Decrease the stock of a specific item.
+        With STOCK_COALESCE_WINDOW_MS set, the change is applied together with the others queued for the item
+        and is rejected if it would take the stock below zero.
+        """
+        try:
+            if stock_coalescer is not None:
+                return await stock_coalescer.submit(item_id, -quantity)
+            updated_item = await AsyncMagicItemRepository.update_stock(item_id, quantity, operation='decrease')
+            if updated_item:
+                _apply_stock_change(updated_item, -quantity)
+                await item_cache.update(updated_item)
+            return updated_item
+        except Exception as e:
+            raise Exception("Error decreasing stock: " + str(e))
+
+    @staticmethod
+    async def adjust_stock(adjustments: List[dict]) -> Dict[str, Any]:
+        """
+        Apply many increase (positive delta) and decrease (negative delta) lines in one transaction.
+        Args:
+            adjustments (List[dict]): Lines with item_id and delta, an item may appear on several lines.
+        Returns:
+            Dict[str, Any]: applied, and the per-line status and resulting stock, see build_stock_adjustment.
+            Nothing is changed unless every item exists and keeps a non-negative stock.
+        Raises:
+            Exception: If an error occurs while updating the stock.
+        """
+        try:
+            report, changes = await AsyncMagicItemRepository.adjust_stock(adjustments)
+            for previous_item, updated_item in changes:
+                _apply_change(previous_item, updated_item)
+                await item_cache.update(updated_item)
+            return report
+        except Exception as e:
+            raise Exception("Error adjusting stock: " + str(e))
+
+    @staticmethod
+    async def use_items(events: List[dict]) -> Dict[str, Any]:
+        """
+        Apply a batch of use events: consumables lose one unit of stock per use, other items wear down and lose
+        a unit of stock every time the copy in use breaks (see apply_wear). The events are summed per item and
+        applied in one transaction with one UPDATE.
+        Args:
+            events (List[dict]): Events with item_id and uses, an item may appear in many events.
+        Returns:
+            Dict[str, Any]: events, items, not_found, out_of_stock (items whose uses were ignored) and
+            stock_removed (units consumed or broken).
+        Raises:
+            Exception: If an error occurs while applying the events.
+        """
+        try:
+            item_ids, uses = aggregate_uses(np.fromiter((event['item_id'] for event in events), dtype=np.int64,
+                                                        count=len(events)),
+                                            np.fromiter((event['uses'] for event in events), dtype=np.int64,
+                                                        count=len(events)))
+            report, changes = await AsyncMagicItemRepository.apply_wear(item_ids, uses)
+            for previous_item, updated_item in changes:
+                _apply_change(previous_item, updated_item)
+                await item_cache.update(updated_item)
+            return {"events": len(events), **report}
+        except Exception as e:
+            raise Exception("Error using items: " + str(e))
+
+    @staticmethod
+    async def sell_item(item_id: int, quantity: int, unit_price: Optional[int] = None,
+                        idempotency_key: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Sell items: take them out of stock and credit quantity * unit_price to the wallet, atomically.
+        Args:
+            item_id (int): The ID of the item.
+            quantity (int): How many to sell.
+            unit_price (Optional[int]): The price per item, the item's value by default.
+            idempotency_key (Optional[str]): Sent again with a retried request, the sale is then recorded once
+                and the first response returned.
+        Returns:
+            Optional[Dict[str, Any]]: The ledger entry plus replayed, None if the item does not exist.
+        Raises:
+            TransactionRejectedError: If the stock is too low, the item has no price or the key was used for
+                another transaction.
+        """
+        try:
+            return await _record_transaction("sell", item_id, quantity, unit_price, idempotency_key)
+        except TransactionRejectedError as e:
+            raise e
+        except Exception as e:
+            raise Exception("Error selling item: " + str(e))
+
+    @staticmethod
+    async def buy_item(item_id: int, quantity: int, unit_price: Optional[int] = None,
+                       idempotency_key: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Buy items: put them in stock and debit quantity * unit_price from the wallet, atomically.
+        Takes the same arguments as sell_item.
+        Raises:
+            TransactionRejectedError: If the wallet balance is too low, the item has no price or the key was used
+                for another transaction.
+        """
+        try:
+            return await _record_transaction("buy", item_id, quantity, unit_price, idempotency_key)
+        except TransactionRejectedError as e:
+            raise e
+        except Exception as e:
+            raise Exception("Error buying item: " + str(e))
+
+    @staticmethod
+    async def get_wallet_balance() -> Dict[str, int]:
+        """
+        Get the wallet balance, the sum of its shards.
+        """
+        try:
+            return await AsyncMagicItemRepository.get_wallet_balance()
+        except Exception as e:
+            raise Exception("Error reading the wallet: " + str(e))
+
+    @staticmethod
+    async def get_transactions_page(limit: int, after_id: int = 0) -> Dict[str, Any]:
+        """
+        Fetch a page of the sell/buy ledger, oldest first.
+        Returns:
+            Dict[str, Any]: items, and next_after_id to pass as after_id for the next page (None on the last one).
+        """
+        try:
+            entries = await AsyncMagicItemRepository.get_transactions_page(limit + 1, after_id)
+            has_more = len(entries) > limit
+            entries = entries[:limit]
+            return {"items": entries, "next_after_id": entries[-1]['id'] if has_more else None}
+        except Exception as e:
+            raise Exception("Error retrieving transactions: " + str(e))
+
+    @staticmethod
+    async def get_inventory_statistics(refresh: bool = False) -> Dict[str, Any]:
+        """
+        Get inventory statistics, served from the statistics cache while it is fresh.
+        Args:
+            refresh (bool): Skip the cache and recompute the statistics in the database.
+        Returns:
+            Dict[str, Any]: total_items, total_stock and total_value, the most expensive, cheapest, most stocked
+            and highest level items, and the same totals broken down by_category and by_type.
+        """
+        try:
+            if not refresh:
+                statistics = statistics_cache.get()
+                if statistics is not None:
+                    return statistics
+            generation = statistics_cache.generation
+            statistics = await AsyncMagicItemRepository.get_inventory_statistics()
+            statistics_cache.store(statistics, generation)
+            return statistics
+        except Exception as e:
+            raise Exception("Error calculating inventory statistics: " + str(e))
+
+    @staticmethod
+    def get_statistics_cache_stats() -> Dict[str, Any]:
+        """
+        Get hit/miss counters of the statistics cache.
+        """
+        return statistics_cache.stats()
+
+    @staticmethod
+    def get_item_cache_stats() -> Dict[str, Any]:
+        """
+        Get hit/miss counters of the item cache.
+        """
+        return item_cache.stats()
+
+    @staticmethod
+    def get_query_cache_stats() -> Dict[str, Any]:
+        """
+        Get hit counters of the compiled/prepared statement cache.
+        """
+        return query_cache.stats()
+
+    @staticmethod
+    async def _loaded_snapshot() -> CatalogSnapshot:
+        if catalog_snapshot is None:
+            raise AnalyticsDisabledError("Analytics are disabled, set ANALYTICS_SNAPSHOT_ENABLED=true")
+        await catalog_snapshot.ensure_loaded(AsyncMagicItemRepository.get_snapshot_columns)
+        return catalog_snapshot
+
+    @staticmethod
+    async def get_analytics_summary(search_criteria: Dict[str, Any], group_by: str,
+                                    bucket_width: float = 1.0) -> Dict[str, Any]:
+        """
+        Totals of the items matching the criteria per category, type or bucket of a numeric column, computed on
+        the analytics snapshot.
+        Args:
+            search_criteria (Dict[str, Any]): category/type and <numeric column>__gte/__lte filters.
+            group_by (str): category, type or a numeric column.
+            bucket_width (float): Bucket size when grouping by a numeric column.
+        Returns:
+            Dict[str, Any]: See CatalogSnapshot.summary.
+        Raises:
+            AnalyticsDisabledError: If ANALYTICS_SNAPSHOT_ENABLED is off.
+            ValueError: On an unsupported filter or grouping.
+        """
+        try:
+            snapshot = await AsyncMagicItemService._loaded_snapshot()
+            return snapshot.summary(search_criteria, group_by, bucket_width)
+        except (AnalyticsDisabledError, ValueError):
+            raise
+        except Exception as e:
+            raise Exception("Error computing analytics summary: " + str(e))
+
+    @staticmethod
+    async def get_analytics_histogram(column: str, search_criteria: Dict[str, Any], bins: int,
+                                      value_range: Optional[Tuple[float, float]] = None) -> Dict[str, Any]:
+        """
+        Histogram of a numeric column over the items matching the criteria, computed on the analytics snapshot.
+        See CatalogSnapshot.histogram.
+        """
+        try:
+            snapshot = await AsyncMagicItemService._loaded_snapshot()
+            return snapshot.histogram(column, search_criteria, bins, value_range)
+        except (AnalyticsDisabledError, ValueError):
+            raise
+        except Exception as e:
+            raise Exception("Error computing analytics histogram: " + str(e))
+
+    @staticmethod
+    async def get_analytics_distribution(column: str, search_criteria: Dict[str, Any], group_by: Optional[str],
+                                         percentiles: List[float], bucket_width: float = 1.0) -> Dict[str, Any]:
+        """
+        Percentiles of a numeric column over the items matching the criteria, optionally per group, computed on
+        the analytics snapshot. See CatalogSnapshot.distribution.
+        """
+        try:
+            snapshot = await AsyncMagicItemService._loaded_snapshot()
+            return snapshot.distribution(column, search_criteria, group_by, percentiles, bucket_width)
+        except (AnalyticsDisabledError, ValueError):
+            raise
+        except Exception as e:
+            raise Exception("Error computing analytics distribution: " + str(e))
+
+    @staticmethod
+    def get_analytics_snapshot_stats() -> Optional[Dict[str, Any]]:
+        """
+        Get the analytics snapshot counters, None if ANALYTICS_SNAPSHOT_ENABLED is off.
+        """
+        return catalog_snapshot.stats() if catalog_snapshot is not None else None
+
+    @staticmethod
+    async def get_changes(since: int, limit: int) -> Dict[str, Any]:
+        """
+        Get the changes made to items after a position in the change feed.
+        Args:
+            since (int): The last_seq of the previous call, 0 to start from the oldest change.
+            limit (int): The maximum number of changes.
+        Returns:
+            Dict[str, Any]: changes, each with seq, op (create, update, stock or delete), item_id, item and
+            changed_at, oldest first, and last_seq to pass as since next time.
+        Raises:
+            ChangesPrunedError: If changes after since are no longer kept (CHANGE_FEED_RETENTION_DAYS).
+            Exception: If an error occurs while reading the feed.
+        """
+        try:
+            changes = await AsyncMagicItemRepository.get_changes(since, limit)
+            return {"changes": changes, "last_seq": changes[-1]['seq'] if changes else since}
+        except ChangesPrunedError as e:
+            raise e
+        except Exception as e:
+            raise Exception("Error retrieving changes: " + str(e))
+
+    @staticmethod
+    async def prune_changes() -> int:
+        """
+        Delete the changes older than CHANGE_FEED_RETENTION_DAYS, the newest change is always kept.
+        Returns:
+            int: The number of changes deleted, 0 when the retention is off or another process is pruning.
+        Raises:
+            Exception: If an error occurs while deleting.
+        """
+        if Config.CHANGE_FEED_RETENTION_DAYS <= 0:
+            return 0
+        try:
+            return await AsyncMagicItemRepository.prune_changes(Config.CHANGE_FEED_RETENTION_DAYS * 86400)
+        except Exception as e:
+            raise Exception("Error pruning changes: " + str(e))
+
+    @staticmethod
+    def stream_changes(since: int) -> AsyncIterator[dict]:
+        """
+        Every change after since, then each new change as it is made, see ChangeFeed.subscribe.
+        """
+        return change_feed.subscribe(since)
+
+    @staticmethod
+    def get_change_feed_stats() -> Dict[str, Any]:
+        """
+        Get the change feed stream counters.
+        """
+        return change_feed.stats()
+
+    @staticmethod
+    def close_change_feed():
+        """
+        End the open change streams of this process, for a server shutting down.
+        """
+        change_feed.close()
+
+    @staticmethod
+    async def import_items(data: AsyncIterator[bytes], format: str = "ndjson",
+                           on_progress: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+        """
+        Create or update items by name from an NDJSON or CSV stream, read and copied to the database as it
+        arrives so the memory used does not grow with its size, and merged in one transaction: every row is
+        imported or, on error, none is. See UPDATE_FROM_IMPORT_QUERY and INSERT_FROM_IMPORT_QUERY for how rows
+        become items.
+        Args:
+            data (AsyncIterator[bytes]): The file or request body in chunks. NDJSON lines are objects with some of
+            IMPORT_COLUMNS as keys, CSV starts with a header row naming its columns; an export is accepted as is.
+            format (str): ndjson or csv.
+            on_progress (Optional[Callable[[int], None]]): Called with the number of bytes read after every chunk.
+        Returns:
+            Dict[str, Any]: rows read, duplicates, created, updated and unchanged items (see build_import_report)
+            and the seconds the import took.
+        Raises:
+            ValueError: On an unsupported format, unknown columns or a row that cannot be imported.
+        """
+        try:
+            check_format(format)
+            started = time.perf_counter()
+            data = count_bytes(data, on_progress)
+            if format == "csv":
+                columns, blocks = await csv_blocks(data)
+            else:
+                columns, blocks = IMPORT_COLUMNS, ndjson_batches(data, Config.IMPORT_BATCH_ROWS)
+            report = await AsyncMagicItemRepository.import_items(columns, blocks, format == "csv")
+            if report['created'] or report['updated']:
+                await _apply_bulk_change()
+            return {**report, "seconds": round(time.perf_counter() - started, 3)}
+        except ValueError as e:
+            raise e
+        except Exception as e:
+            raise Exception("Error importing items: " + str(e))
+
+    @staticmethod
+    def export_items(format: str = "ndjson") -> AsyncIterator[bytes]:
+        """
+        Every item ordered by ID as NDJSON (the items as the API returns them) or CSV with a header row, streamed
+        by the database in blocks; the output can be imported again.
+        Raises:
+            ValueError: On an unsupported format.
+        """
+        check_format(format)
+        return AsyncMagicItemRepository.export_items(format)
+
+    @staticmethod
+    async def delete_item(item_id: int) -> Optional[dict]:
+        """
+        Delete an item from the database by its ID.
+        Args:
+            item_id (int): The ID of the item to delete.
+        Returns:
+            Optional[dict]: The deleted item data if deletion was successful, None otherwise.
+        Raises:
+            Exception: If an error occurs during the deletion process.
+        """
+        try:
+            deleted_item = await AsyncMagicItemRepository.delete_item(item_id)
+            if deleted_item:
+                _apply_change(deleted_item, None)
+                await item_cache.invalidate(item_id)
+            return deleted_item
+        except Exception as e:
+            raise Exception("Error deleting item: " + str(e))
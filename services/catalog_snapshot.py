@@ -0,0 +1,394 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from domain.rarity_tier import rarity_tier_rank
+
+# Held as float64 arrays, NULL as NaN
+NUMERIC_COLUMNS = ("level", "rarity_value", "weight", "value", "durability", "stock")
+# Held as int32 codes into the list of distinct values seen, NULL included
+LABEL_COLUMNS = ("category", "type", "rarity_tier")
+# Upper bound on the buckets a numeric group_by may produce
+MAX_GROUPS = 10000
+
+
+class CatalogSnapshot:
+    """
+    In-process columnar copy of magic_items for analytics: one NumPy array per column, so filters and grouped
+    aggregates over the whole catalog are a handful of vectorized operations instead of a query.
+
+    The snapshot is loaded with load() and kept current with apply_change(), like the statistics cache: updates
+    overwrite the item's row in place, new items are appended and deleted items are only flagged until more
+    than half the rows are dead. A snapshot older than max_age seconds is reloaded by ensure_loaded(), which
+    also bounds drift from writes made by other processes.
+    """
+
+    def __init__(self, max_age: float = 300.0):
+        self.max_age = max_age
+        self._size = 0  # rows in use, deleted rows included
+        self._deleted = 0
+        self._ids = np.empty(0, dtype=np.int64)
+        self._alive = np.empty(0, dtype=bool)
+        self._numeric = {column: np.empty(0, dtype=np.float64) for column in NUMERIC_COLUMNS}
+        self._codes = {column: np.empty(0, dtype=np.int32) for column in LABEL_COLUMNS}
+        self._labels: Dict[str, list] = {column: [] for column in LABEL_COLUMNS}
+        self._label_codes: Dict[str, dict] = {column: {} for column in LABEL_COLUMNS}
+        self._rows: Dict[int, int] = {}  # item id -> row
+        self._loaded_at: Optional[float] = None
+        self._pending: Optional[List[Tuple[Optional[dict], Optional[dict]]]] = None
+        self._generation = 0  # bumped by invalidate()
+        self._lock = asyncio.Lock()
+        self._counters = {"loads": 0, "incremental_updates": 0, "compactions": 0}
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    def is_fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at <= self.max_age
+
+    async def ensure_loaded(self, load: Callable[[], Awaitable[Dict[str, list]]]):
+        """
+        Load the snapshot unless a fresh one is held, concurrent callers share one load.
+        Args:
+            load: Coroutine function returning the catalog as one list per column, see load().
+        """
+        if self.is_fresh():
+            return
+        async with self._lock:
+            if self.is_fresh():
+                return
+            # Changes made while the query runs may or may not be in its result, they are replayed on top of it
+            self._pending = []
+            generation = self._generation
+            try:
+                columns = await load()
+            except Exception:
+                self._pending = None
+                raise
+            self.load(columns)
+            if generation != self._generation:
+                self._loaded_at = None  # the query may have missed what invalidated it, reload on the next read
+
+    def invalidate(self):
+        """
+        Reload the snapshot on the next read, e.g. after a bulk import changed items without reading them back.
+        """
+        self._generation += 1
+        self._loaded_at = None
+
+    def load(self, columns: Dict[str, Sequence]):
+        """
+        Replace the snapshot.
+        Args:
+            columns (Dict[str, Sequence]): id, NUMERIC_COLUMNS and LABEL_COLUMNS, one value per item in the same
+                order, None for NULL.
+        """
+        self._ids = np.asarray(columns["id"], dtype=np.int64)
+        self._size = len(self._ids)
+        self._deleted = 0
+        self._alive = np.ones(self._size, dtype=bool)
+        for column in NUMERIC_COLUMNS:
+            self._numeric[column] = np.array(columns[column], dtype=np.float64)
+        for column in LABEL_COLUMNS:
+            index = {}
+            codes = [index.setdefault(value, len(index)) for value in columns[column]]
+            self._codes[column] = np.array(codes, dtype=np.int32)
+            self._labels[column] = list(index)
+            self._label_codes[column] = index
+        self._rows = dict(zip(self._ids.tolist(), range(self._size)))
+        self._loaded_at = time.monotonic()
+        self._counters["loads"] += 1
+
+        pending, self._pending = self._pending or [], None
+        for old, new in pending:
+            self._apply(old, new)
+
+    def apply_change(self, old: Optional[dict], new: Optional[dict]):
+        """
+        Fold a single item change into the snapshot. Ignored until the snapshot is first loaded.
+        Args:
+            old (Optional[dict]): The item before the change, None for a newly created item.
+            new (Optional[dict]): The item after the change, None for a deleted item.
+        """
+        if self._pending is not None:
+            self._pending.append((old, new))
+        if self._loaded_at is not None:
+            self._apply(old, new)
+
+    def _apply(self, old: Optional[dict], new: Optional[dict]):
+        # new is the whole item after the change, so applying it again (a replay) gives the same row
+        if new is not None:
+            self._upsert(new)
+        elif old is not None:
+            self._remove(old["id"])
+        self._counters["incremental_updates"] += 1
+
+    def _upsert(self, item: dict):
+        row = self._rows.get(item["id"])
+        if row is None:
+            if self._size == len(self._ids):
+                self._resize(max(1024, 2 * self._size))
+            row = self._size
+            self._size += 1
+            self._rows[item["id"]] = row
+            self._ids[row] = item["id"]
+            self._alive[row] = True
+        for column in NUMERIC_COLUMNS:
+            value = item.get(column)
+            self._numeric[column][row] = np.nan if value is None else value
+        for column in LABEL_COLUMNS:
+            self._codes[column][row] = self._code(column, item.get(column))
+
+    def _remove(self, item_id: int):
+        row = self._rows.pop(item_id, None)
+        if row is None:
+            return
+        self._alive[row] = False
+        self._deleted += 1
+        if self._deleted > 1024 and self._deleted * 2 > self._size:
+            self._compact()
+
+    def _code(self, column: str, value) -> int:
+        codes = self._label_codes[column]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self._labels[column])
+            self._labels[column].append(value)
+        return code
+
+    def _resize(self, capacity: int):
+        def resized(array: np.ndarray) -> np.ndarray:
+            new = np.empty(capacity, dtype=array.dtype)
+            new[:self._size] = array[:self._size]
+            return new
+
+        self._ids = resized(self._ids)
+        self._alive = resized(self._alive)
+        for column in NUMERIC_COLUMNS:
+            self._numeric[column] = resized(self._numeric[column])
+        for column in LABEL_COLUMNS:
+            self._codes[column] = resized(self._codes[column])
+
+    def _compact(self):
+        keep = self._alive[:self._size]
+        self._ids = self._ids[:self._size][keep]
+        for column in NUMERIC_COLUMNS:
+            self._numeric[column] = self._numeric[column][:self._size][keep]
+        for column in LABEL_COLUMNS:
+            self._codes[column] = self._codes[column][:self._size][keep]
+        self._size = len(self._ids)
+        self._alive = np.ones(self._size, dtype=bool)
+        self._deleted = 0
+        self._rows = dict(zip(self._ids.tolist(), range(self._size)))
+        self._counters["compactions"] += 1
+
+    def mask(self, search_criteria: Dict[str, Any]) -> np.ndarray:
+        """
+        Select the items matching the criteria.
+        Args:
+            search_criteria (Dict[str, Any]): Like search_items: category/type equal to a value, and
+                <numeric column>__gte / __lte bounds. An item with NULL in a filtered column never matches.
+        Returns:
+            np.ndarray: One bool per snapshot row.
+        Raises:
+            ValueError: If a criterion names a column the snapshot does not hold.
+        """
+        selected = self._alive[:self._size].copy()
+        for key, value in search_criteria.items():
+            column, _, operator = key.partition("__")
+            if column in LABEL_COLUMNS and not operator:
+                code = self._label_codes[column].get(value)
+                if code is None:
+                    selected[:] = False
+                else:
+                    selected &= self._codes[column][:self._size] == code
+            elif column in NUMERIC_COLUMNS and operator in ("gte", "lte"):
+                values = self._numeric[column][:self._size]
+                selected &= values >= value if operator == "gte" else values <= value
+            else:
+                raise ValueError(f"Unsupported analytics filter: {key}")
+        return selected
+
+    def _matching_rows(self, search_criteria: Dict[str, Any]) -> np.ndarray:
+        # Positions of the matching rows: take() with them is several times faster than a boolean index per column
+        return np.flatnonzero(self.mask(search_criteria))
+
+    def _groups(self, group_by: Optional[str], rows: np.ndarray, bucket_width: float) -> Tuple[np.ndarray, list]:
+        """
+        Group codes of the given rows and the label of each code. A numeric column is grouped into buckets of
+        bucket_width, labelled with their lower bound. NULL gets a group of its own, labelled None.
+        """
+        if group_by is None:
+            return np.zeros(len(rows), dtype=np.intp), [None]
+        if group_by in LABEL_COLUMNS:
+            return self._codes[group_by].take(rows).astype(np.intp), list(self._labels[group_by])
+        if group_by not in NUMERIC_COLUMNS:
+            raise ValueError(f"Cannot group by {group_by}")
+        if bucket_width <= 0:
+            raise ValueError("bucket_width must be positive")
+        buckets = np.floor(self._numeric[group_by].take(rows) / bucket_width)
+        known = ~np.isnan(buckets)
+        if not known.any():
+            return np.zeros(len(buckets), dtype=np.intp), [None]
+        first, last = buckets[known].min(), buckets[known].max()
+        count = int(last - first) + 1
+        if count > MAX_GROUPS:
+            raise ValueError(f"Grouping {group_by} by {bucket_width} gives {count} buckets, "
+                             f"at most {MAX_GROUPS} are allowed")
+        codes = np.where(known, buckets - first, count).astype(np.intp)
+        return codes, [float((first + i) * bucket_width) for i in range(count)] + [None]
+
+    def summary(self, search_criteria: Dict[str, Any], group_by: str, bucket_width: float = 1.0) -> Dict[str, Any]:
+        """
+        Totals of the matching items per group.
+        Args:
+            search_criteria (Dict[str, Any]): Filters, see mask().
+            group_by (str): A label column, or a numeric column grouped into buckets of bucket_width.
+            bucket_width (float): Bucket size when grouping by a numeric column.
+        Returns:
+            Dict[str, Any]: The number of matching items and, per non-empty group, total_items, total_stock,
+            total_value (value * stock) and avg/min/max value and avg level, NULLs skipped.
+        Raises:
+            ValueError: On an unsupported filter or grouping.
+        """
+        rows = self._matching_rows(search_criteria)
+        codes, labels = self._groups(group_by, rows, bucket_width)
+        groups = len(labels)
+        value = self._numeric["value"].take(rows)
+        stock = self._numeric["stock"].take(rows)
+        level = self._numeric["level"].take(rows)
+
+        items = np.bincount(codes, minlength=groups)
+        value_known, value_sum = _group_sum(codes, value, groups)
+        stock_known, stock_sum = _group_sum(codes, stock, groups)
+        level_known, level_sum = _group_sum(codes, level, groups)
+        total_value = np.bincount(codes, _zero_nulls(value) * _zero_nulls(stock), minlength=groups)
+        value_min = np.full(groups, np.nan)
+        value_max = np.full(groups, np.nan)
+        # fmin/fmax skip NaN, so a group keeps NaN only if all of its values are NULL
+        np.fmin.at(value_min, codes, value)
+        np.fmax.at(value_max, codes, value)
+
+        result = []
+        for code in _ordered_codes(group_by, labels, items):
+            result.append({
+                group_by: labels[code],
+                "total_items": int(items[code]),
+                "total_stock": int(stock_sum[code]),
+                "total_value": int(total_value[code]),
+                "avg_value": value_sum[code] / value_known[code] if value_known[code] else None,
+                "min_value": _number(value_min[code]),
+                "max_value": _number(value_max[code]),
+                "avg_level": level_sum[code] / level_known[code] if level_known[code] else None,
+            })
+        return {"total_items": len(rows), "group_by": group_by, "groups": result}
+
+    def histogram(self, column: str, search_criteria: Dict[str, Any], bins: int = 10,
+                  value_range: Optional[Tuple[float, float]] = None) -> Dict[str, Any]:
+        """
+        Histogram of a numeric column over the matching items.
+        Args:
+            column (str): One of NUMERIC_COLUMNS.
+            search_criteria (Dict[str, Any]): Filters, see mask().
+            bins (int): Number of equal width bins.
+            value_range (Optional[Tuple[float, float]]): Lower and upper edge, the data's min and max if None.
+        Returns:
+            Dict[str, Any]: bins + 1 edges, the item count per bin and the number of matching items with NULL.
+        Raises:
+            ValueError: On an unsupported column or filter.
+        """
+        if column not in NUMERIC_COLUMNS:
+            raise ValueError(f"No histogram for {column}")
+        values = self._numeric[column].take(self._matching_rows(search_criteria))
+        known = values[~np.isnan(values)]
+        counts, edges = np.histogram(known, bins=bins, range=value_range)
+        return {"column": column, "total_items": len(values), "nulls": len(values) - len(known),
+                "edges": edges.tolist(), "counts": counts.tolist()}
+
+    def distribution(self, column: str, search_criteria: Dict[str, Any], group_by: Optional[str] = None,
+                     percentiles: Sequence[float] = (0, 25, 50, 75, 100),
+                     bucket_width: float = 1.0) -> Dict[str, Any]:
+        """
+        Percentiles of a numeric column over the matching items, optionally per group.
+        Args:
+            column (str): One of NUMERIC_COLUMNS, NULLs are skipped.
+            search_criteria (Dict[str, Any]): Filters, see mask().
+            group_by (Optional[str]): As in summary(), None for one distribution over every matching item.
+            percentiles (Sequence[float]): Between 0 and 100.
+            bucket_width (float): Bucket size when grouping by a numeric column.
+        Returns:
+            Dict[str, Any]: Per non-empty group, the item count, mean and the values at the percentiles.
+        Raises:
+            ValueError: On an unsupported column, filter or grouping, or a percentile out of range.
+        """
+        if column not in NUMERIC_COLUMNS:
+            raise ValueError(f"No distribution for {column}")
+        if any(not 0 <= p <= 100 for p in percentiles):
+            raise ValueError("Percentiles must be between 0 and 100")
+        rows = self._matching_rows(search_criteria)
+        codes, labels = self._groups(group_by, rows, bucket_width)
+        values = self._numeric[column].take(rows)
+        nulls = np.isnan(values)
+        if nulls.any():
+            values, codes = values[~nulls], codes[~nulls]
+
+        # One stable sort by group (a radix sort for int16 codes) puts each group's values in a contiguous slice
+        order = np.argsort(codes.astype(np.int16) if len(labels) < 2 ** 15 else codes, kind="stable")
+        values = values[order]
+        items = np.bincount(codes, minlength=len(labels))
+        ends = np.cumsum(items)
+
+        result = []
+        for code in _ordered_codes(group_by, labels, items):
+            group = values[ends[code] - items[code]:ends[code]]
+            entry = {group_by: labels[code]} if group_by is not None else {}
+            entry.update({"total_items": int(items[code]), "mean": float(group.mean()),
+                          "values": np.percentile(group, percentiles).tolist()})
+            result.append(entry)
+        return {"column": column, "group_by": group_by, "percentiles": list(percentiles), "groups": result}
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the snapshot counters.
+        Returns:
+            Dict[str, Any]: Loads, incremental updates and compactions, items held, memory used by the arrays
+            and the age of the snapshot.
+        """
+        arrays = [self._ids, self._alive, *self._numeric.values(), *self._codes.values()]
+        return {
+            **self._counters,
+            "items": self._size - self._deleted,
+            "deleted_rows": self._deleted,
+            "array_bytes": sum(array.nbytes for array in arrays),
+            "max_age": self.max_age,
+            "age": time.monotonic() - self._loaded_at if self._loaded_at is not None else None,
+        }
+
+
+def _group_sum(codes: np.ndarray, values: np.ndarray, groups: int) -> Tuple[np.ndarray, np.ndarray]:
+    # Count of non-NULL values and their sum per group, weighting instead of indexing to skip the NULLs
+    nulls = np.isnan(values)
+    if not nulls.any():
+        return np.bincount(codes, minlength=groups), np.bincount(codes, values, minlength=groups)
+    return (np.bincount(codes, ~nulls, minlength=groups),
+            np.bincount(codes, np.where(nulls, 0.0, values), minlength=groups))
+
+
+def _zero_nulls(values: np.ndarray) -> np.ndarray:
+    nulls = np.isnan(values)
+    return np.where(nulls, 0.0, values) if nulls.any() else values
+
+
+def _ordered_codes(group_by: Optional[str], labels: list, items: np.ndarray) -> List[int]:
+    # Non-empty groups by label (tiers in threshold order), the NULL group last
+    codes = [code for code in range(len(labels)) if items[code]]
+    if group_by == "rarity_tier":
+        return sorted(codes, key=lambda code: rarity_tier_rank(labels[code]))
+    return sorted(codes, key=lambda code: (labels[code] is None, labels[code] if labels[code] is not None else 0))
+
+
+def _number(value) -> Optional[float]:
+    return None if np.isnan(value) else float(value)
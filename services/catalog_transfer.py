@@ -0,0 +1,92 @@
+import csv
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+import orjson
+from repositories.magic_item_repository import IMPORT_COLUMNS, IMPORT_IGNORED_COLUMNS
+
+# Formats of the bulk import and export, NDJSON is one item object per line
+TRANSFER_FORMATS = ("ndjson", "csv")
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+_KNOWN_KEYS = frozenset(IMPORT_COLUMNS + IMPORT_IGNORED_COLUMNS)
+
+
+def check_format(format: str):
+    """
+    Raises:
+        ValueError: Unless format is one of TRANSFER_FORMATS.
+    """
+    if format not in TRANSFER_FORMATS:
+        raise ValueError(f"Unsupported format {format!r}, expected one of {list(TRANSFER_FORMATS)}")
+
+
+async def count_bytes(data: AsyncIterator[bytes],
+                      on_progress: Optional[Callable[[int], None]]) -> AsyncIterator[bytes]:
+    """
+    Pass data through, calling on_progress with the number of bytes read so far after every chunk.
+    """
+    read = 0
+    async for chunk in data:
+        read += len(chunk)
+        if on_progress is not None:
+            on_progress(read)
+        yield chunk
+
+
+def _ndjson_row(line: bytes, line_number: int) -> tuple:
+    try:
+        item = orjson.loads(line)
+    except orjson.JSONDecodeError as e:
+        raise ValueError(f"Line {line_number} is not valid JSON: {e}")
+    if not isinstance(item, dict) or not _KNOWN_KEYS.issuperset(item):
+        raise ValueError(f"Line {line_number} is not an item with some of the keys {list(IMPORT_COLUMNS)}")
+    row = tuple(item.get(column) for column in IMPORT_COLUMNS)
+    if any(isinstance(value, (dict, list)) for value in row):
+        raise ValueError(f"Line {line_number} has a value that is not a string or a number")
+    return row
+
+
+async def ndjson_batches(data: AsyncIterator[bytes], batch_rows: int) -> AsyncIterator[List[tuple]]:
+    """
+    Parse an NDJSON stream into rows of IMPORT_COLUMNS values, None for a missing key, batch_rows or a little
+    more at a time. Blank lines are skipped.
+    Raises:
+        ValueError: On a line that is not an item object, naming the line.
+    """
+    batch, line_number, rest = [], 0, b""
+    async for chunk in data:
+        lines = (rest + chunk).split(b"\n")
+        rest = lines.pop()  # the start of a line the next chunk continues
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                batch.append(_ndjson_row(line, line_number))
+        if len(batch) >= batch_rows:
+            yield batch
+            batch = []
+    if rest.strip():
+        batch.append(_ndjson_row(rest, line_number + 1))
+    if batch:
+        yield batch
+
+
+async def csv_blocks(data: AsyncIterator[bytes]) -> Tuple[Tuple[str, ...], AsyncIterator[bytes]]:
+    """
+    Read the header row of a CSV stream. The rest goes to COPY as it is, which parses it far faster than the csv
+    module would.
+    Returns:
+        Tuple[Tuple[str, ...], AsyncIterator[bytes]]: The column names and the data after the header.
+    """
+    head = b""
+    async for chunk in data:
+        head += chunk
+        if b"\n" in head:
+            break
+    header, _, rest = head.partition(b"\n")
+    columns = tuple(column.strip().lower() for column in next(csv.reader([header.decode("utf-8-sig")]), []))
+
+    async def rows() -> AsyncIterator[bytes]:
+        if rest:
+            yield rest
+        async for more in data:
+            yield more
+
+    return columns, rows()
@@ -0,0 +1,141 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+
+class ChangeFeed:
+    """
+    Streams the change feed (item_changes) to any number of subscribers from a single polling loop, so a hundred
+    open streams cost one query per poll rather than a hundred.
+    Each subscriber first catches up from its own position with direct reads, then receives the changes the loop
+    fetches. The loop runs only while somebody subscribes, polls every poll_interval seconds and right away after
+    notify(), which writes made by this process call. A subscriber too slow to keep up falls back to direct reads
+    until it has caught up again, so it never misses a change.
+    close() ends every subscription, so open streams do not hold up a server shutting down.
+    """
+
+    def __init__(self, fetch: Callable[[int, int], Awaitable[List[dict]]], poll_interval: float,
+                 batch_size: int = 1000, queue_size: int = 10000):
+        """
+        Args:
+            fetch: Coroutine function returning up to limit changes after a seq, (since, limit) -> changes.
+            poll_interval (float): Seconds between polls when no write wakes the loop earlier.
+            batch_size (int): Changes per read.
+            queue_size (int): Changes buffered per subscriber before it has to catch up by itself.
+        """
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self._fetch = fetch
+        self._subscribers: Dict[int, asyncio.Queue] = {}
+        self._next_subscriber = 0
+        self._wake: Optional[asyncio.Event] = None
+        self._poller: Optional[asyncio.Task] = None
+        self._position = 0
+        self._closed = False
+        self._counters = {"polls": 0, "failed_polls": 0, "changes_fetched": 0, "catch_up_reads": 0, "overflows": 0}
+
+    def notify(self):
+        """
+        Tell the loop that something changed, so it polls now instead of at the end of the interval.
+        """
+        if self._wake is not None:
+            self._wake.set()
+
+    def close(self):
+        """
+        End every subscription and stop the loop. Subscriptions made afterwards end right away.
+        """
+        self._closed = True
+        for queue in self._subscribers.values():
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(None)  # wakes the subscriber, which sees the feed is closed
+        if self._poller is not None:
+            self._poller.cancel()
+
+    async def subscribe(self, since: int) -> AsyncIterator[dict]:
+        """
+        Yield every change after since, in seq order, then each new one as it comes, until the caller stops or
+        the feed is closed.
+        Args:
+            since (int): The seq of the last change the subscriber has, 0 for the whole feed.
+        """
+        subscriber = self._next_subscriber
+        self._next_subscriber += 1
+        queue = self._subscribers[subscriber] = asyncio.Queue(self.queue_size)
+        try:
+            while not self._closed:
+                # Registered before reading, so nothing fetched by the loop meanwhile is lost; what the read
+                # already returned is skipped below
+                while True:
+                    self._counters["catch_up_reads"] += 1
+                    changes = await self._fetch(since, self.batch_size)
+                    for change in changes:
+                        yield change
+                        since = change["seq"]
+                    if len(changes) < self.batch_size or self._closed:
+                        break
+                if self._closed:
+                    break
+                self._start(since)
+
+                while True:
+                    change = await queue.get()
+                    if change is None:  # the queue overflowed and was emptied, read from the database again
+                        break
+                    if change["seq"] > since:
+                        yield change
+                        since = change["seq"]
+        finally:
+            del self._subscribers[subscriber]
+
+    def _start(self, position: int):
+        if self._poller is None or self._poller.done():
+            self._position = position
+            self._wake = asyncio.Event()
+            self._wake.set()  # a change made since the subscriber's last read is not left for the next interval
+            self._poller = asyncio.create_task(self._poll())
+
+    async def _poll(self):
+        while self._subscribers:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            while self._subscribers:
+                self._counters["polls"] += 1
+                try:
+                    changes = await self._fetch(self._position, self.batch_size)
+                except Exception:
+                    # e.g. the database is briefly unreachable: the subscribers keep waiting, try again next poll
+                    self._counters["failed_polls"] += 1
+                    break
+                self._counters["changes_fetched"] += len(changes)
+                for change in changes:
+                    self._publish(change)
+                if changes:
+                    self._position = changes[-1]["seq"]
+                if len(changes) < self.batch_size:
+                    break
+
+    def _publish(self, change: dict):
+        for queue in self._subscribers.values():
+            if queue.full():
+                # Replace the backlog with a marker telling the subscriber to read from the database, changes
+                # queued after it that the read already returned are skipped
+                self._counters["overflows"] += 1
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+            else:
+                queue.put_nowait(change)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the feed counters.
+        Returns:
+            Dict[str, Any]: Subscribers, polls run and failed, changes fetched by the loop, catch-up reads,
+            overflows and the seq the loop has reached.
+        """
+        return {**self._counters, "subscribers": len(self._subscribers), "position": self._position}
@@ -0,0 +1,146 @@
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class ItemCacheBackend(ABC):
+    """
+    Storage behind ItemCache. The in-process LRUItemCacheBackend is the default, a backend talking to a
+    shared cache (e.g. Redis) can be swapped in with ItemCache.use_backend() to share entries across workers.
+    """
+
+    @abstractmethod
+    async def get(self, item_id: int) -> Optional[dict]:
+        """Return the cached item, or None if it is missing or expired."""
+
+    @abstractmethod
+    async def set(self, item_id: int, item: dict):
+        """Store an item."""
+
+    @abstractmethod
+    async def delete(self, item_id: int):
+        """Drop an item if present."""
+
+    @abstractmethod
+    async def clear(self):
+        """Drop every item."""
+
+    def size(self) -> Optional[int]:
+        """Number of stored items, None if the backend cannot tell cheaply."""
+        return None
+
+
+class LRUItemCacheBackend(ItemCacheBackend):
+    """
+    Bounded in-process cache: at most max_entries items, each kept for ttl seconds, least recently used evicted.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self._items = OrderedDict()  # item_id -> (expires_at, item)
+
+    async def get(self, item_id: int) -> Optional[dict]:
+        entry = self._items.get(item_id)
+        if entry is None:
+            return None
+        expires_at, item = entry
+        if expires_at < time.monotonic():
+            del self._items[item_id]
+            return None
+        self._items.move_to_end(item_id)
+        return item
+
+    async def set(self, item_id: int, item: dict):
+        if self.max_entries <= 0:
+            return
+        self._items[item_id] = (time.monotonic() + self.ttl, item)
+        self._items.move_to_end(item_id)
+        while len(self._items) > self.max_entries:
+            self._items.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, item_id: int):
+        self._items.pop(item_id, None)
+
+    async def clear(self):
+        self._items.clear()
+
+    def size(self) -> Optional[int]:
+        return len(self._items)
+
+
+class ItemCache:
+    """
+    Read-through cache of item rows keyed by ID, kept current by the service's write paths.
+    """
+
+    def __init__(self, backend: ItemCacheBackend):
+        self.backend = backend
+        self._generation = 0
+        self._counters = {"hits": 0, "misses": 0, "updates": 0, "invalidations": 0}
+
+    def use_backend(self, backend: ItemCacheBackend):
+        self.backend = backend
+        self._generation += 1
+
+    async def get_or_load(self, item_id: int, load: Callable[[int], Awaitable[Optional[dict]]]) -> Optional[dict]:
+        """
+        Get an item from the cache, loading and caching it on a miss. Missing items are not cached.
+        Args:
+            item_id (int): The ID of the item.
+            load: Coroutine function fetching the item from the database.
+        Returns:
+            Optional[dict]: A copy of the item, or None if it does not exist.
+        """
+        item = await self.backend.get(item_id)
+        if item is not None:
+            self._counters["hits"] += 1
+            return dict(item)
+        self._counters["misses"] += 1
+        generation = self._generation
+        item = await load(item_id)
+        # A write that landed while loading may be newer than what was loaded, so skip caching then
+        if item is not None and generation == self._generation:
+            await self.backend.set(item_id, dict(item))
+        return item
+
+    async def update(self, item: dict):
+        """
+        Replace the cached copy of an item after it was written.
+        """
+        self._generation += 1
+        self._counters["updates"] += 1
+        await self.backend.set(item['id'], dict(item))
+
+    async def invalidate(self, item_id: int):
+        """
+        Drop an item, e.g. after it was deleted.
+        """
+        self._generation += 1
+        self._counters["invalidations"] += 1
+        await self.backend.delete(item_id)
+
+    async def clear(self):
+        """
+        Drop every item, e.g. after a bulk import changed items without reading them back.
+        """
+        self._generation += 1
+        self._counters["invalidations"] += 1
+        await self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the cache counters.
+        Returns:
+            Dict[str, Any]: Hit/miss/update/invalidation counters, the hit rate and the number of cached items.
+        """
+        lookups = self._counters["hits"] + self._counters["misses"]
+        return {
+            **self._counters,
+            "hit_rate": self._counters["hits"] / lookups if lookups else 0.0,
+            "size": self.backend.size(),
+            "backend": type(self.backend).__name__,
+        }
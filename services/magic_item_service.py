@@ -1,4 +1,5 @@
 from typing import List, Dict, Any, Optional
+from domain.magic_item import MagicItemRecord
 from repositories.magic_item_repository import MagicItemRepository
 import random
 
@@ -6,13 +7,13 @@ import random
 class MagicItemService:
 
     @staticmethod
-    def generate_random_values(item_data: dict) -> dict:
+    def generate_random_values(item_data: dict) -> MagicItemRecord:
         """
         Generate random values for weight, durability, and rarity for a magic item.
         Args:
             item_data (dict): The data of the magic item.
         Returns:
-            dict: The updated item data with generated random values.
+            MagicItemRecord: The created item with generated random values.
         Raises:
             Exception: If an error occurs during the generation process.
         """
@@ -25,14 +26,35 @@ class MagicItemService:
             raise Exception("Error generating random values: " + str(e))
 
     @staticmethod
-    def update_item(item_id: int, update_data: dict) -> Optional[dict]:
+    def create_items(items: List[dict]) -> List[MagicItemRecord]:
+        """
+        Create many magic items at once, generating random weight, durability and rarity for each.
+        All items are written in one transaction, so either all of them are created or none is.
+        Args:
+            items (List[dict]): The data of the magic items.
+        Returns:
+            List[MagicItemRecord]: The created items with generated random values and IDs.
+        Raises:
+            Exception: If an error occurs during the creation process.
+        """
+        try:
+            for item_data in items:
+                item_data['weight'] = random.uniform(0.1, 10.0)
+                item_data['durability'] = random.uniform(0.1, 0.9)
+                item_data['rarity_value'] = random.uniform(0.0, 100.0)
+            return MagicItemRepository.create_items(items)
+        except Exception as e:
+            raise Exception("Error creating items: " + str(e))
+
+    @staticmethod
+    def update_item(item_id: int, update_data: dict) -> Optional[MagicItemRecord]:
         """
         Update an item in the database with the given item ID and update data.
         Args:
             item_id (int): The ID of the item to update.
             update_data (dict): A dictionary containing the updated data for the item.
         Returns:
-            Optional[dict]: The updated item data if the update was successful, None otherwise.
+            Optional[MagicItemRecord]: The updated item if the update was successful, None otherwise.
         """
         try:
             update_data = {key: value for key, value in update_data.items() if value is not None}
@@ -41,11 +63,11 @@ class MagicItemService:
             raise Exception("Error updating item: " + str(e))
 
     @staticmethod
-    def get_all_items() -> list[dict[Any, Any]]:
+    def get_all_items() -> List[MagicItemRecord]:
         """
         Get all magic items from the database.
         Returns:
-            list[dict[Any, Any]]: A list of magic items.
+            List[MagicItemRecord]: A list of magic items.
         Raises:
             Exception: If an error occurs during the retrieval process.
         """
@@ -54,27 +76,45 @@ class MagicItemService:
         except Exception as e:
             raise Exception("Error retrieving all items: " + str(e))
 
+    @staticmethod
+    def get_items_page(limit: int, after_id: int = 0) -> Dict[str, Any]:
+        """
+        Get one page of magic items using keyset pagination on the item ID.
+        Args:
+            limit (int): The page size.
+            after_id (int): The cursor, the next_after_id of the previous page (0 for the first page).
+        Returns:
+            Dict[str, Any]: The page items and next_after_id, None when there are no more items.
+        Raises:
+            Exception: If an error occurs during the retrieval process.
+        """
+        try:
+            # One extra row tells whether another page follows without a COUNT(*)
+            items = MagicItemRepository.get_items_page(limit + 1, after_id)
+            has_more = len(items) > limit
+            items = items[:limit]
+            return {"items": items, "next_after_id": items[-1].id if has_more else None}
+        except Exception as e:
+            raise Exception("Error retrieving items page: " + str(e))
+
     @classmethod
-    def get_item_by_id(cls, item_id: int) -> Optional[dict[Any, Any]]:
+    def get_item_by_id(cls, item_id: int) -> Optional[MagicItemRecord]:
         """
         Get a magic item from the database by its ID.
         Args:
             item_id (int): The ID of the magic item.
         Returns:
-            Optional[dict[Any, Any]]: The magic item if found, None otherwise.
+            Optional[MagicItemRecord]: The magic item if found, None otherwise.
         Raises:
             Exception: If an error occurs during the retrieval process.
         """
         try:
-            item = MagicItemRepository.get_item_by_id(item_id)
-            if item:
-                item['id'] = item_id
-            return item
+            return MagicItemRepository.get_item_by_id(item_id)
         except Exception as e:
             raise Exception("Error retrieving item by ID: " + str(e))
 
     @staticmethod
-    def search_items(search_criteria: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def search_items(search_criteria: Dict[str, Any]) -> List[MagicItemRecord]:
         """
         Search for magic items based on specified criteria.
         """
@@ -84,7 +124,18 @@ class MagicItemService:
             raise Exception("Error searching items: " + str(e))
 
     @staticmethod
-    def increase_stock(item_id: int, quantity: int) -> dict:
+    def text_search_items(text: str, search_criteria: Dict[str, Any], limit: int, offset: int = 0,
+                          fuzzy: bool = True) -> List[MagicItemRecord]:
+        """
+        Search magic items by text over name and description, ranked by relevance, optionally typo-tolerant.
+        """
+        try:
+            return MagicItemRepository.text_search_items(text, search_criteria, limit, offset, fuzzy)
+        except Exception as e:
+            raise Exception("Error searching items: " + str(e))
+
+    @staticmethod
+    def increase_stock(item_id: int, quantity: int) -> Optional[MagicItemRecord]:
         """
         Increase the stock of a specific item.
         """
@@ -94,7 +145,7 @@ class MagicItemService:
             raise Exception("Error increasing stock: " + str(e))
 
     @staticmethod
-    def decrease_stock(item_id: int, quantity: int) -> dict:
+    def decrease_stock(item_id: int, quantity: int) -> Optional[MagicItemRecord]:
         """
         Decrease the stock of a specific item.
         """
@@ -104,42 +155,38 @@ class MagicItemService:
             raise Exception("Error decreasing stock: " + str(e))
 
     @staticmethod
-    def get_inventory_statistics() -> Dict[str, Any]:
+    def adjust_stock(adjustments: List[dict]) -> Dict[str, Any]:
         """
-        Get inventory statistics.
+        Apply many increase (positive delta) and decrease (negative delta) lines in one transaction.
+        Nothing is changed unless every item exists and keeps a non-negative stock.
         """
         try:
-            all_items = MagicItemRepository.get_all_items()
-            total_items = len(all_items)
-            total_stock = sum(item['stock'] for item in all_items)
-            total_value = sum(item['value'] * item['stock'] for item in all_items if item['value'] is not None)
-
-            most_expensive_item = max(all_items, key=lambda x: x['value'], default=None)
-            cheapest_item = min(all_items, key=lambda x: x['value'], default=None)
-            most_stocked_item = max(all_items, key=lambda x: x['stock'], default=None)
-            highest_level_item = max(all_items, key=lambda x: x['level'], default=None)
+            report, _ = MagicItemRepository.adjust_stock(adjustments)
+            return report
+        except Exception as e:
+            raise Exception("Error adjusting stock: " + str(e))
 
-            statistics = {
-                "total_items": total_items,
-                "total_stock": total_stock,
-                "total_value": total_value,
-                "most_expensive_item": most_expensive_item,
-                "cheapest_item": cheapest_item,
-                "most_stocked_item": most_stocked_item,
-                "highest_level_item": highest_level_item,
-            }
-            return statistics
+    @staticmethod
+    def get_inventory_statistics() -> Dict[str, Any]:
+        """
+        Get inventory statistics, computed by aggregate queries in the database.
+        Returns:
+            Dict[str, Any]: total_items, total_stock and total_value, the most expensive, cheapest, most stocked
+            and highest level items, and the same totals broken down by_category and by_type.
+        """
+        try:
+            return MagicItemRepository.get_inventory_statistics()
         except Exception as e:
             raise Exception("Error calculating inventory statistics: " + str(e))
 
     @staticmethod
-    def delete_item(item_id: int) -> Optional[dict]:
+    def delete_item(item_id: int) -> Optional[MagicItemRecord]:
         """
         Delete an item from the database by its ID.
         Args:
             item_id (int): The ID of the item to delete.
         Returns:
-            Optional[dict]: The deleted item data if deletion was successful, None otherwise.
+            Optional[MagicItemRecord]: The deleted item if deletion was successful, None otherwise.
         Raises:
             Exception: If an error occurs during the deletion process.
         """
@@ -147,9 +194,3 @@ class MagicItemService:
             return MagicItemRepository.delete_item(item_id)
         except Exception as e:
             raise Exception("Error deleting item: " + str(e))
-
-# create a sell method to "sell items"  (reduce stock by INT and add the value of items sold to a "wallet")
-# create a buy option,
-# create something to convert rarity to text, Common/Rare etc.
-# create something like "use_item" or "test_item" with each use/test reduce durability in items or reduce stock in
-# consumables (potions) in items, if the durability reaches <0 then reduce stock by 1.
@@ -0,0 +1,155 @@
+import copy
+import time
+from typing import Any, Dict, Optional
+from domain.magic_item import MagicItemRecord
+from repositories.magic_item_repository import STATISTICS_GROUPS, statistics_group_order
+
+COLUMN_NAMES = MagicItemRecord._fields
+
+# statistics key -> (column, True if the largest value wins)
+EXTREMES = {
+    "most_expensive_item": ("value", True),
+    "cheapest_item": ("value", False),
+    "most_stocked_item": ("stock", True),
+    "highest_level_item": ("level", True),
+}
+
+
+class InventoryStatisticsCache:
+    """
+    Holds the last computed inventory statistics and keeps them current as items change.
+
+    Writes are folded in with apply_change() instead of re-running the aggregate queries. When a change
+    cannot be applied exactly (e.g. the most expensive item got cheaper, so the runner-up is unknown) the
+    cache is invalidated and the next read recomputes. Entries older than max_age seconds are never served,
+    which also bounds drift from writes made by other processes.
+    """
+
+    def __init__(self, max_age: float = 30.0):
+        self.max_age = max_age
+        self.generation = 0
+        self._statistics = None
+        self._stored_at = 0.0
+        self._counters = {"hits": 0, "misses": 0, "refreshes": 0, "incremental_updates": 0, "invalidations": 0}
+
+    def get(self) -> Optional[Dict[str, Any]]:
+        """
+        Get a copy of the cached statistics.
+        Returns:
+            Optional[Dict[str, Any]]: The statistics, or None if nothing fresh is cached.
+        """
+        if self._statistics is None or time.monotonic() - self._stored_at > self.max_age:
+            self._counters["misses"] += 1
+            return None
+        self._counters["hits"] += 1
+        return copy.deepcopy(self._statistics)
+
+    def store(self, statistics: Dict[str, Any], generation: int):
+        """
+        Cache freshly computed statistics.
+        Args:
+            statistics (Dict[str, Any]): The statistics computed by the repository.
+            generation (int): The cache generation read before the statistics were computed. If items changed
+                since then the result may or may not include those changes, so it is not cached.
+        """
+        self._counters["refreshes"] += 1
+        if generation == self.generation:
+            self._statistics = copy.deepcopy(statistics)
+            self._stored_at = time.monotonic()
+
+    def invalidate(self):
+        self.generation += 1
+        if self._statistics is not None:
+            self._counters["invalidations"] += 1
+        self._statistics = None
+
+    def apply_change(self, old: Optional[dict], new: Optional[dict]):
+        """
+        Fold a single item change into the cached statistics.
+        Args:
+            old (Optional[dict]): The item before the change, None for a newly created item.
+            new (Optional[dict]): The item after the change, None for a deleted item.
+        """
+        self.generation += 1
+        statistics = self._statistics
+        if statistics is None:
+            return
+        old = _normalize(old)
+        new = _normalize(new)
+
+        for key, (column, largest_wins) in EXTREMES.items():
+            current = statistics[key]
+            if old is not None and current is not None and current["id"] == old["id"]:
+                if new is None or not _at_least_as_good(new[column], old[column], largest_wins):
+                    self.invalidate()
+                    return
+                statistics[key] = new
+            elif new is not None and new[column] is not None and (
+                    current is None or _better(new, current, column, largest_wins)):
+                statistics[key] = new
+
+        if old is not None:
+            _add_totals(statistics, old, -1)
+        if new is not None:
+            _add_totals(statistics, new, 1)
+        self._counters["incremental_updates"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the cache counters.
+        Returns:
+            Dict[str, Any]: Hit/miss counters, the hit rate and the age of the cached entry.
+        """
+        lookups = self._counters["hits"] + self._counters["misses"]
+        return {
+            **self._counters,
+            "hit_rate": self._counters["hits"] / lookups if lookups else 0.0,
+            "max_age": self.max_age,
+            "age": time.monotonic() - self._stored_at if self._statistics is not None else None,
+        }
+
+
+def _normalize(item: Optional[dict]) -> Optional[dict]:
+    if item is None:
+        return None
+    return {column: item.get(column) for column in COLUMN_NAMES}
+
+
+def _at_least_as_good(new_value, old_value, largest_wins: bool) -> bool:
+    if new_value is None:
+        return False
+    return new_value >= old_value if largest_wins else new_value <= old_value
+
+
+def _better(candidate: dict, current: dict, column: str, largest_wins: bool) -> bool:
+    # Mirrors ORDER BY column DESC/ASC, id in STATISTICS_EXTREMES_QUERY
+    if candidate[column] == current[column]:
+        return candidate["id"] < current["id"]
+    return candidate[column] > current[column] if largest_wins else candidate[column] < current[column]
+
+
+def _contribution(item: dict) -> Dict[str, int]:
+    stock = item["stock"]
+    value = item["value"]
+    return {
+        "total_items": 1,
+        "total_stock": stock or 0,
+        "total_value": value * stock if value is not None and stock is not None else 0,
+    }
+
+
+def _add_totals(statistics: Dict[str, Any], item: dict, sign: int):
+    contribution = _contribution(item)
+    for field, amount in contribution.items():
+        statistics[field] += sign * amount
+    for key, group in STATISTICS_GROUPS:
+        entries = statistics[key]
+        entry = next((entry for entry in entries if entry[group] == item[group]), None)
+        if entry is None:
+            entry = {group: item[group], "total_items": 0, "total_stock": 0, "total_value": 0}
+            entries.append(entry)
+            entries.sort(key=lambda e: statistics_group_order(group, e[group]))
+        for field, amount in contribution.items():
+            entry[field] += sign * amount
+        if entry["total_items"] <= 0:
+            entries.remove(entry)
@@ -0,0 +1,87 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+class InsufficientStockError(Exception):
+    pass
+
+
+class StockDeltaCoalescer:
+    """
+    Collects stock deltas per item for a short window and flushes each item's deltas together, so a burst of
+    increase/decrease calls on a hot item costs one row lock and one UPDATE per window instead of one per call.
+    Every caller waits for the flush of its window and gets the item as it is after that flush.
+    """
+
+    def __init__(self, window: float,
+                 flush: Callable[[int, List[int]], Awaitable[Tuple[Optional[dict], List[bool]]]]):
+        """
+        Args:
+            window (float): Seconds to collect deltas for an item before flushing them.
+            flush: Coroutine function applying (item_id, deltas) and returning the updated item (None if it does
+                not exist) and whether each delta was accepted.
+        """
+        self.window = window
+        self._flush = flush
+        self._pending: Dict[int, List[Tuple[int, asyncio.Future]]] = {}
+        self._tasks = set()
+        self._counters = {"deltas": 0, "flushes": 0, "rejected": 0}
+
+    async def submit(self, item_id: int, delta: int) -> Optional[dict]:
+        """
+        Queue a stock delta and wait until it is flushed.
+        Args:
+            item_id (int): The ID of the item.
+            delta (int): Positive to increase the stock, negative to decrease it.
+        Returns:
+            Optional[dict]: The item after the flush, None if it does not exist.
+        Raises:
+            InsufficientStockError: If the delta would have taken the stock below zero, it is not applied then.
+        """
+        future = asyncio.get_running_loop().create_future()
+        pending = self._pending.get(item_id)
+        if pending is None:
+            pending = self._pending[item_id] = []
+            task = asyncio.create_task(self._flush_after_window(item_id))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        pending.append((delta, future))
+        self._counters["deltas"] += 1
+        return await future
+
+    async def _flush_after_window(self, item_id: int):
+        await asyncio.sleep(self.window)
+        batch = self._pending.pop(item_id)
+        self._counters["flushes"] += 1
+        try:
+            item, accepted = await self._flush(item_id, [delta for delta, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (delta, future), is_accepted in zip(batch, accepted):
+            # A caller that went away still had its delta applied, there is just nobody left to tell
+            if future.done():
+                continue
+            if item is None:
+                future.set_result(None)
+            elif is_accepted:
+                future.set_result(dict(item))
+            else:
+                self._counters["rejected"] += 1
+                future.set_exception(InsufficientStockError(
+                    f"Not enough stock for item {item_id} to apply {delta}, {item['stock']} left"))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the coalescing counters.
+        Returns:
+            Dict[str, Any]: Deltas submitted, flushes run, deltas rejected and deltas per flush.
+        """
+        return {
+            **self._counters,
+            "deltas_per_flush": self._counters["deltas"] / self._counters["flushes"] if self._counters["flushes"]
+            else 0.0,
+            "window_ms": self.window * 1000,
+        }
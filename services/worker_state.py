@@ -0,0 +1,55 @@
+import os
+import time
+from typing import Any, Dict, Optional
+
+
+class WorkerState:
+    """
+    Startup and shutdown of this server process: how long it took to be ready for requests and whether it is
+    draining, i.e. finishing the requests it has before it stops.
+    """
+
+    def __init__(self):
+        self.started_at = time.monotonic()  # when this module was first imported, see main.py
+        self.startup_seconds: Optional[float] = None
+        self.warm_up_seconds: Optional[float] = None
+        self.ready_at: Optional[float] = None
+        self.draining = False
+
+    def ready(self, warm_up_seconds: float):
+        """
+        Record that the worker is about to take requests.
+        Args:
+            warm_up_seconds (float): The part of the startup spent opening connections ahead of the requests.
+        """
+        self.ready_at = time.monotonic()
+        self.startup_seconds = self.ready_at - self.started_at
+        self.warm_up_seconds = warm_up_seconds
+
+    def drain(self):
+        """
+        Record that the worker is shutting down: it finishes what it has and should get no new requests.
+        """
+        self.draining = True
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the worker status.
+        Returns:
+            Dict[str, Any]: The status (starting, ready or draining), the pid, the seconds from the imports to
+            the first request and the warm-up part of them, and the seconds since the worker became ready.
+        """
+        if self.draining:
+            status = "draining"
+        else:
+            status = "starting" if self.ready_at is None else "ready"
+        return {
+            "status": status,
+            "pid": os.getpid(),
+            "startup_seconds": self.startup_seconds,
+            "warm_up_seconds": self.warm_up_seconds,
+            "uptime_seconds": None if self.ready_at is None else time.monotonic() - self.ready_at,
+        }
+
+
+worker_state = WorkerState()
@@ -0,0 +1,53 @@
+import uuid
+import pytest
+from apply_migrations import apply_migrations
+from db import get_connection
+from repositories.magic_item_repository import bulk_insert_params
+from services.magic_item_service import MagicItemService
+
+
+def test_items_are_transposed_into_column_arrays():
+    params = bulk_insert_params([
+        {"name": "Aetherial Cloak", "level": 5, "rarity_value": 42.5, "weight": 1.25, "durability": 0.5,
+         "stock": 3},
+        {"name": "Ember Wand", "description": "Warm.", "type": "Wand", "category": "Weapon", "value": 900,
+         "rarity_value": 98.0, "weight": 0.5, "durability": 0.75},
+    ])
+    names, descriptions, levels, types, categories, rarity_values, weights, values, durabilities, stock, tiers = params
+    assert names == ["Aetherial Cloak", "Ember Wand"]
+    assert descriptions == [None, "Warm."] and levels == [5, None]
+    assert types == [None, "Wand"] and categories == [None, "Weapon"] and values == [None, 900]
+    assert rarity_values == [42.5, 98.0] and weights == [1.25, 0.5] and durabilities == [0.5, 0.75]
+    assert stock == [3, 1]  # one in stock unless given
+    assert tiers == ["Common", "Legendary"]
+
+
+def test_no_items_give_empty_arrays():
+    assert bulk_insert_params([]) == ([],) * 11
+
+
+@pytest.fixture(scope="module")
+def conn():
+    try:
+        conn = get_connection()
+    except Exception as e:
+        pytest.skip(f"Database not reachable: {e}")
+    apply_migrations()
+    yield conn
+    conn.close()
+
+
+def test_a_list_is_created_whole_or_not_at_all(conn):
+    name = f"Bulk {uuid.uuid4().hex}"
+    created = MagicItemService.create_items([{"name": name, "stock": 2}, {"name": name, "level": 3}])
+    assert [item.name for item in created] == [name, name]
+    assert created[0].id < created[1].id  # in the order given
+    with pytest.raises(Exception):
+        MagicItemService.create_items([{"name": f"{name} 2"}, {"name": None}])
+
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT count(*) FILTER (WHERE name = %s), count(*) FILTER (WHERE name = %s) "
+                       "FROM magic_items", (name, f"{name} 2"))
+        assert cursor.fetchone() == (2, 0)
+        cursor.execute("DELETE FROM magic_items WHERE name = %s", (name,))
+    conn.commit()
@@ -0,0 +1,136 @@
+import asyncio
+import random
+
+import numpy as np
+import pytest
+
+from domain.rarity_tier import rarity_tier
+from repositories.magic_item_repository import SNAPSHOT_COLUMNS
+from services.catalog_snapshot import CatalogSnapshot
+
+
+def make_item(item_id, rng):
+    rarity_value = rng.uniform(0, 100)
+    return {"id": item_id, "name": f"item {item_id}", "category": rng.choice(["Armor", "Weapon", "Potion", None]),
+            "type": rng.choice(["Sword", "Cloak"]), "level": rng.choice([None, *range(1, 21)]),
+            "rarity_value": rarity_value, "rarity_tier": rarity_tier(rarity_value), "weight": rng.uniform(0.1, 10),
+            "value": rng.choice([None, 5, 50, 500]), "durability": rng.uniform(0.1, 0.9), "stock": rng.randint(0, 20)}
+
+
+def columns_of(items):
+    return {column: [item[column] for item in items] for column in SNAPSHOT_COLUMNS}
+
+
+def loaded(items):
+    snapshot = CatalogSnapshot(max_age=60)
+    snapshot.load(columns_of(items))
+    return snapshot
+
+
+def expected_summary(items, group_by):
+    groups = {}
+    for item in items:
+        groups.setdefault(item[group_by], []).append(item)
+    result = []
+    for label in sorted(groups, key=lambda label: (label is None, label or "")):
+        group = groups[label]
+        values = [i["value"] for i in group if i["value"] is not None]
+        levels = [i["level"] for i in group if i["level"] is not None]
+        result.append({
+            group_by: label,
+            "total_items": len(group),
+            "total_stock": sum(i["stock"] for i in group),
+            "total_value": sum((i["value"] or 0) * i["stock"] for i in group),
+            "avg_value": pytest.approx(sum(values) / len(values)) if values else None,
+            "min_value": min(values) if values else None,
+            "max_value": max(values) if values else None,
+            "avg_level": pytest.approx(sum(levels) / len(levels)) if levels else None,
+        })
+    return result
+
+
+def test_summary_matches_python():
+    rng = random.Random(1)
+    items = [make_item(i, rng) for i in range(1, 501)]
+    summary = loaded(items).summary({}, "category")
+    assert summary["total_items"] == 500
+    assert summary["groups"] == expected_summary(items, "category")
+
+
+def test_filters_skip_nulls_like_sql():
+    rng = random.Random(2)
+    items = [make_item(i, rng) for i in range(1, 301)]
+    criteria = {"type": "Sword", "level__gte": 5, "level__lte": 10, "value__lte": 50}
+    matching = [i for i in items if i["type"] == "Sword" and i["level"] is not None and 5 <= i["level"] <= 10
+                and i["value"] is not None and i["value"] <= 50]
+    summary = loaded(items).summary(criteria, "type")
+    assert summary["total_items"] == len(matching)
+    assert summary["groups"] == expected_summary(matching, "type")
+    assert loaded(items).summary({"category": "Unknown"}, "category")["groups"] == []
+
+
+def test_numeric_buckets_and_histogram():
+    rng = random.Random(3)
+    items = [make_item(i, rng) for i in range(1, 301)]
+    snapshot = loaded(items)
+    groups = snapshot.summary({}, "rarity_value", bucket_width=25)["groups"]
+    assert [group["rarity_value"] for group in groups] == [0.0, 25.0, 50.0, 75.0]
+    assert [group["total_items"] for group in groups] == [
+        sum(1 for i in items if lower <= i["rarity_value"] < lower + 25) for lower in (0, 25, 50, 75)]
+
+    histogram = snapshot.histogram("level", {}, bins=4, value_range=(1, 21))
+    assert histogram["edges"] == [1, 6, 11, 16, 21]
+    assert histogram["nulls"] == sum(1 for i in items if i["level"] is None)
+    assert histogram["counts"] == list(np.histogram([i["level"] for i in items if i["level"] is not None],
+                                                    bins=4, range=(1, 21))[0])
+
+    with pytest.raises(ValueError):
+        snapshot.summary({}, "weight", bucket_width=0.0001)
+    with pytest.raises(ValueError):
+        snapshot.summary({"name": "item 1"}, "category")
+
+
+def test_distribution_per_group():
+    rng = random.Random(4)
+    items = [make_item(i, rng) for i in range(1, 401)]
+    distribution = loaded(items).distribution("weight", {}, "type", percentiles=[0, 50, 100])
+    for group in distribution["groups"]:
+        weights = [i["weight"] for i in items if i["type"] == group["type"]]
+        assert group["total_items"] == len(weights)
+        assert group["values"] == pytest.approx([min(weights), float(np.median(weights)), max(weights)])
+
+
+def test_changes_are_applied_incrementally():
+    rng = random.Random(5)
+    items = {i: make_item(i, rng) for i in range(1, 101)}
+    snapshot = loaded(list(items.values()))
+    for step in range(3000):
+        item_id = rng.randint(1, 150)
+        if item_id in items and step % 3 == 0:
+            snapshot.apply_change(items.pop(item_id), None)
+        else:
+            new = make_item(item_id, rng)
+            snapshot.apply_change(items.get(item_id), new)
+            items[item_id] = new
+    assert snapshot.summary({}, "category")["groups"] == expected_summary(list(items.values()), "category")
+    assert snapshot.stats()["items"] == len(items)
+
+
+def test_changes_made_during_a_load_are_replayed():
+    rng = random.Random(6)
+    items = [make_item(i, rng) for i in range(1, 11)]
+    snapshot = CatalogSnapshot(max_age=60)
+    snapshot.apply_change(None, make_item(99, rng))  # not loaded yet: ignored
+
+    async def load():
+        # The query result predates these writes
+        result = columns_of(items)
+        snapshot.apply_change(items[0], {**items[0], "stock": 1000})
+        snapshot.apply_change(items[1], None)
+        return result
+
+    asyncio.run(snapshot.ensure_loaded(load))
+    summary = snapshot.summary({}, "type")
+    assert summary["total_items"] == 9
+    assert sum(group["total_stock"] for group in summary["groups"]) == \
+           1000 + sum(i["stock"] for i in items[2:])
@@ -0,0 +1,149 @@
+import asyncio
+import uuid
+import httpx
+import orjson
+import pytest
+from fastapi import FastAPI
+from apply_migrations import apply_migrations
+from controllers.magic_item_controller import router
+from db import close_async_pool, get_connection
+from repositories.magic_item_repository import IMPORT_COLUMNS, build_import_copy_query
+from services.async_magic_item_service import AsyncMagicItemService
+from services.catalog_transfer import csv_blocks, ndjson_batches
+
+
+async def chunked(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def collect(blocks):
+    return [block async for block in blocks]
+
+
+def test_ndjson_lines_split_across_chunks_become_rows():
+    data = b'{"name": "Wand", "stock": 2}\n\n{"name": "Orb", "level": 3, "id": 9, "version": 1}\n{"name": "Rod"}'
+    batches = asyncio.run(collect(ndjson_batches(chunked(data, 5), batch_rows=2)))
+    assert [len(batch) for batch in batches] == [2, 1]
+    rows = [dict(zip(IMPORT_COLUMNS, row)) for batch in batches for row in batch]
+    assert [row["name"] for row in rows] == ["Wand", "Orb", "Rod"]
+    assert rows[0]["stock"] == 2 and rows[1]["level"] == 3 and rows[2]["stock"] is None
+
+
+def test_bad_ndjson_lines_are_named():
+    for data, message in ((b'{"name": "Wand"}\n{"name": \n', "Line 2 is not valid JSON"),
+                          (b'{"name": "Wand", "colour": "red"}\n', "Line 1 is not an item"),
+                          (b'["Wand"]\n', "Line 1 is not an item"),
+                          (b'{"name": "Wand", "level": [1]}\n', "Line 1 has a value")):
+        with pytest.raises(ValueError, match=message):
+            asyncio.run(collect(ndjson_batches(chunked(data, 4), batch_rows=10)))
+
+
+def test_csv_header_is_read_and_the_rest_passed_through():
+    data = '﻿Name, stock\n"Wand, long",2\nOrb,\n'.encode()
+
+    async def scenario():
+        columns, blocks = await csv_blocks(chunked(data, 3))
+        return columns, b"".join(await collect(blocks))
+
+    assert asyncio.run(scenario()) == (("name", "stock"), b'"Wand, long",2\nOrb,\n')
+
+
+def test_import_columns_are_checked():
+    assert build_import_copy_query(("name", "stock"), csv=True) == \
+        "COPY import_items (name, stock) FROM STDIN WITH (FORMAT csv)"
+    with pytest.raises(ValueError, match="Unknown import columns"):
+        build_import_copy_query(("name", "name; DROP TABLE magic_items"), csv=True)
+    with pytest.raises(ValueError, match="need a name"):
+        build_import_copy_query(("stock",), csv=False)
+
+
+def test_import_route_streams_the_body_and_rejects_bad_input(monkeypatch):
+    received = []
+
+    async def import_items(data, format):
+        received.append((format, b"".join([chunk async for chunk in data])))
+        if format == "csv":
+            raise ValueError("Unknown import columns")
+        return {"rows": 1}
+
+    monkeypatch.setattr(AsyncMagicItemService, "import_items", import_items)
+    app = FastAPI()
+    app.include_router(router, prefix="/items")
+
+    async def send():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            accepted = await client.post("/items/import", content=b'{"name": "Wand"}\n')
+            rejected = await client.post("/items/import?format=csv", content=b"colour\nred\n")
+            unsupported = await client.get("/items/export?format=xml")
+            return accepted, rejected, unsupported
+
+    accepted, rejected, unsupported = asyncio.run(send())
+    assert accepted.json() == {"rows": 1}
+    assert received[0] == ("ndjson", b'{"name": "Wand"}\n')
+    assert rejected.status_code == 400 and unsupported.status_code == 400
+
+
+@pytest.fixture(scope="module")
+def conn():
+    try:
+        conn = get_connection()
+    except Exception as e:
+        pytest.skip(f"Database not reachable: {e}")
+    apply_migrations()
+    yield conn
+    conn.close()
+
+
+def test_import_upserts_by_name_and_export_round_trips(conn):
+    prefix = f"Import {uuid.uuid4().hex}"
+    ndjson = b"".join(orjson.dumps(row) + b"\n" for row in [
+        {"name": f"{prefix} wand", "level": 2, "stock": 4},
+        {"name": f"{prefix} orb", "rarity_value": 99.5, "weight": 1.5, "durability": 0.5},
+        {"name": f"{prefix} wand", "level": 3},
+    ])
+    csv = f'name,description,stock\n{prefix} orb,"Glows,\nfaintly",7\n{prefix} wand,,\n'.encode()
+
+    async def scenario():
+        try:
+            created = await AsyncMagicItemService.import_items(chunked(ndjson, 16))
+            updated = await AsyncMagicItemService.import_items(chunked(csv, 16), "csv")
+            with pytest.raises(ValueError, match="level"):
+                await AsyncMagicItemService.import_items(
+                    chunked(f'{{"name": "{prefix} rod"}}\n{{"name": "{prefix} rod", "level": "high"}}\n'.encode(), 8))
+            exported = {}
+            for format in ("ndjson", "csv"):
+                export = b"".join([block async for block in AsyncMagicItemService.export_items(format)])
+                exported[format] = export
+            reimported = await AsyncMagicItemService.import_items(chunked(exported["csv"], 1 << 16), "csv")
+            items = [item for name in ("wand", "orb", "rod")
+                     for item in await AsyncMagicItemService.search_items({"name": f"{prefix} {name}"})]
+            for item in items:
+                await AsyncMagicItemService.delete_item(item["id"])
+            return created, updated, exported, reimported, {item["name"]: item for item in items}
+        finally:
+            await close_async_pool()
+
+    created, updated, exported, reimported, items = asyncio.run(scenario())
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT op, item->>'name' FROM item_changes WHERE item->>'name' LIKE %s AND op <> 'delete' "
+                       "ORDER BY id", (f"{prefix}%",))
+        changes = cursor.fetchall()
+    conn.rollback()
+    assert created == {**created, "rows": 3, "duplicates": 1, "created": 2, "updated": 0, "unchanged": 0}
+    assert updated == {**updated, "rows": 2, "created": 0, "updated": 1, "unchanged": 1}
+    assert reimported["created"] == reimported["updated"] == 0
+
+    wand, orb = items[f"{prefix} wand"], items[f"{prefix} orb"]
+    assert set(items) == {f"{prefix} wand", f"{prefix} orb"}  # the failed import left nothing behind
+    assert (wand["level"], wand["stock"], wand["version"]) == (3, 1, 1)  # the last row of a name wins
+    assert 0.1 <= wand["weight"] <= 10 and 0.1 <= wand["durability"] <= 0.9 and wand["rarity_tier"] is not None
+    assert (orb["weight"], orb["rarity_tier"], orb["stock"], orb["version"]) == (1.5, "Legendary", 7, 2)
+    assert orb["description"] == "Glows,\nfaintly"
+
+    # The imports reach the change feed like any other write, the unchanged rows do not
+    assert changes == [("create", f"{prefix} orb"), ("create", f"{prefix} wand"), ("update", f"{prefix} orb")]
+
+    lines = [orjson.loads(line) for line in exported["ndjson"].splitlines() if prefix.encode() in line]
+    assert lines == sorted([wand, orb], key=lambda item: item["id"])
+    assert exported["csv"].startswith(b"id,name,description,level,type,category,rarity_value,")
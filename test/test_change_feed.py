@@ -0,0 +1,194 @@
+import asyncio
+import uuid
+import pytest
+from apply_migrations import apply_migrations
+from db import close_async_pool, get_connection
+from repositories.async_magic_item_repository import AsyncMagicItemRepository
+from repositories.magic_item_repository import ChangesPrunedError
+from services.async_magic_item_service import AsyncMagicItemService
+from services.change_feed import ChangeFeed
+
+
+class FakeFeed:
+    """
+    An in-memory item_changes table for ChangeFeed.
+    """
+
+    def __init__(self):
+        self.changes = []
+        self.reads = 0
+
+    def add(self, count: int = 1):
+        for _ in range(count):
+            self.changes.append({"seq": len(self.changes) + 1, "op": "update"})
+
+    async def fetch(self, since: int, limit: int):
+        self.reads += 1
+        await asyncio.sleep(0)
+        return [change for change in self.changes if change["seq"] > since][:limit]
+
+
+async def take(stream, count: int):
+    return [(await stream.__anext__())["seq"] for _ in range(count)]
+
+
+def test_subscribers_catch_up_then_follow_the_feed():
+    feed = FakeFeed()
+    feed.add(25)
+    change_feed = ChangeFeed(feed.fetch, poll_interval=60, batch_size=10)
+
+    async def scenario():
+        first, second = change_feed.subscribe(0), change_feed.subscribe(20)
+        assert await take(first, 25) == list(range(1, 26))
+        assert await take(second, 5) == list(range(21, 26))
+        assert change_feed.stats()["subscribers"] == 2
+
+        feed.add(3)
+        change_feed.notify()  # polls now rather than after the minute
+        assert await asyncio.wait_for(take(first, 3), 1) == [26, 27, 28]
+        assert await asyncio.wait_for(take(second, 3), 1) == [26, 27, 28]
+        await first.aclose()
+        await second.aclose()
+        return change_feed.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["subscribers"] == 0
+    assert stats["position"] == 28
+    assert stats["changes_fetched"] == 3
+
+
+def test_slow_subscriber_reads_what_overflowed_from_the_database():
+    feed = FakeFeed()
+    change_feed = ChangeFeed(feed.fetch, poll_interval=60, batch_size=10, queue_size=4)
+
+    async def scenario():
+        stream = change_feed.subscribe(0)
+        reader = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.01)  # caught up, now waiting on its queue
+        feed.add(30)
+        change_feed.notify()
+        assert (await asyncio.wait_for(reader, 1))["seq"] == 1
+        await asyncio.sleep(0.01)  # the loop publishes the other 29 changes while the subscriber is busy
+        seqs = [1] + await asyncio.wait_for(take(stream, 29), 1)
+        await stream.aclose()
+        return seqs
+
+    assert asyncio.run(scenario()) == list(range(1, 31))
+    assert change_feed.stats()["overflows"] > 0
+
+
+def test_failed_polls_are_retried():
+    feed = FakeFeed()
+    fetch, failures = feed.fetch, []
+
+    async def flaky_fetch(since, limit):
+        if failures:
+            failures.pop()
+            raise ConnectionError("database unreachable")
+        return await fetch(since, limit)
+
+    change_feed = ChangeFeed(flaky_fetch, poll_interval=0.01)
+
+    async def scenario():
+        stream = change_feed.subscribe(0)
+        reader = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.01)
+        failures.append(True)
+        feed.add()
+        change_feed.notify()
+        change = await asyncio.wait_for(reader, 1)
+        await stream.aclose()
+        return change
+
+    assert asyncio.run(scenario())["seq"] == 1
+    assert change_feed.stats()["failed_polls"] == 1
+
+
+def test_close_ends_every_subscription():
+    feed = FakeFeed()
+    feed.add(2)
+    change_feed = ChangeFeed(feed.fetch, poll_interval=60)
+
+    async def drain(stream):
+        return [change["seq"] async for change in stream]
+
+    async def scenario():
+        readers = [asyncio.ensure_future(drain(change_feed.subscribe(since))) for since in (0, 2)]
+        await asyncio.sleep(0.01)
+        change_feed.close()
+        ended = await asyncio.wait_for(asyncio.gather(*readers), 1)
+        late = await asyncio.wait_for(drain(change_feed.subscribe(0)), 1)
+        return ended, late
+
+    ended, late = asyncio.run(scenario())
+    assert ended == [[1, 2], []]
+    assert late == []
+    assert change_feed.stats()["subscribers"] == 0
+
+
+@pytest.fixture(scope="module")
+def conn():
+    try:
+        conn = get_connection()
+    except Exception as e:
+        pytest.skip(f"Database not reachable: {e}")
+    apply_migrations()
+    yield conn
+    conn.close()
+
+
+def test_writes_are_recorded_in_seq_order(conn):
+    name = f"Feed {uuid.uuid4().hex}"
+
+    async def scenario():
+        try:
+            since = (await AsyncMagicItemService.get_changes(0, 1))["last_seq"]
+            while True:
+                page = await AsyncMagicItemService.get_changes(since, 1000)
+                if not page["changes"]:
+                    break
+                since = page["last_seq"]
+
+            item = (await AsyncMagicItemService.create_items([{"name": name, "stock": 5}]))[0]
+            await AsyncMagicItemService.adjust_stock([{"item_id": item["id"], "delta": -2}])
+            await AsyncMagicItemService.update_item(item["id"], {"stock": 3})  # no change
+            await AsyncMagicItemService.update_item(item["id"], {"value": 9})
+            await AsyncMagicItemService.delete_item(item["id"])
+            return item, since, await AsyncMagicItemService.get_changes(since, 1000)
+        finally:
+            await close_async_pool()
+
+    item, since, page = asyncio.run(scenario())
+    changes = [change for change in page["changes"] if change["item_id"] == item["id"]]
+    assert [change["op"] for change in changes] == ["create", "stock", "update", "delete"]
+    assert [change["item"]["stock"] for change in changes] == [5, 3, 3, 3]
+    assert changes[2]["item"]["value"] == 9
+    assert [change["seq"] for change in page["changes"]] == list(range(since + 1, page["last_seq"] + 1))
+
+
+def test_old_changes_are_pruned_and_readers_behind_them_told(conn):
+    async def scenario():
+        try:
+            item = (await AsyncMagicItemService.create_items([{"name": f"Feed {uuid.uuid4().hex}", "stock": 5}]))[0]
+            await AsyncMagicItemService.adjust_stock([{"item_id": item["id"], "delta": -1}])
+            await AsyncMagicItemService.get_changes(2 ** 62, 1)  # numbers the pending changes
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT seq FROM item_changes WHERE item_id = %s ORDER BY seq", (item["id"],))
+                created, stocked = [row[0] for row in cursor.fetchall()]
+                cursor.execute("UPDATE item_changes SET changed_at = now() - interval '1000 days' WHERE seq <= %s",
+                               (created,))
+            conn.commit()
+            pruned = await AsyncMagicItemRepository.prune_changes(999 * 86400)
+            with pytest.raises(ChangesPrunedError):
+                await AsyncMagicItemService.get_changes(created - 1, 10)
+            after_created = await AsyncMagicItemService.get_changes(created, 1)
+            from_start = await AsyncMagicItemService.get_changes(0, 1)
+            await AsyncMagicItemService.delete_item(item["id"])
+            return pruned, created, stocked, after_created, from_start
+        finally:
+            await close_async_pool()
+
+    pruned, created, stocked, after_created, from_start = asyncio.run(scenario())
+    assert pruned >= 1
+    assert [change["seq"] for change in after_created["changes"]] == [stocked]
+    assert from_start["changes"][0]["seq"] == created + 1  # since 0 starts from the oldest change kept
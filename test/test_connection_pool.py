@@ -0,0 +1,92 @@
+import threading
+import pytest
+from psycopg2 import extensions
+from db import ConnectionPool, PoolExhaustedError
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, query, params=None):
+        if self.conn.broken:
+            raise Exception("server closed the connection unexpectedly")
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.broken = False
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def get_transaction_status(self):
+        return self.status
+
+    def commit(self):
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+def test_connections_are_reused():
+    pool = ConnectionPool(min_size=1, max_size=2, connect=FakeConnection)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    assert pool.getconn() is conn
+    assert pool.stats()["connections_created"] == 1
+
+
+def test_exhausted_pool_times_out():
+    pool = ConnectionPool(min_size=0, max_size=1, timeout=0.05, connect=FakeConnection)
+    pool.getconn()
+    with pytest.raises(PoolExhaustedError):
+        pool.getconn()
+    assert pool.stats()["timeouts"] == 1
+
+
+def test_waiter_receives_returned_connection():
+    pool = ConnectionPool(min_size=0, max_size=1, timeout=2, connect=FakeConnection)
+    conn = pool.getconn()
+    received = []
+    waiter = threading.Thread(target=lambda: received.append(pool.getconn()))
+    waiter.start()
+    pool.putconn(conn)
+    waiter.join()
+    assert received == [conn]
+
+
+def test_unhealthy_connection_is_replaced_on_checkout():
+    pool = ConnectionPool(min_size=1, max_size=1, health_check_idle=0, connect=FakeConnection)
+    conn = pool.getconn()
+    conn.broken = True
+    pool.putconn(conn)
+    fresh = pool.getconn()
+    assert fresh is not conn
+    assert conn.closed
+    stats = pool.stats()
+    assert stats["health_checks_failed"] == 1
+    assert stats["size"] == 1
+
+
+def test_open_transaction_is_rolled_back_on_return():
+    pool = ConnectionPool(min_size=0, max_size=1, connect=FakeConnection)
+    conn = pool.getconn()
+    conn.status = extensions.TRANSACTION_STATUS_INTRANS
+    pool.putconn(conn)
+    assert conn.rollbacks == 1
+    assert pool.stats()["idle"] == 1
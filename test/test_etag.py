@@ -0,0 +1,146 @@
+import asyncio
+import uuid
+import httpx
+import pytest
+from fastapi import FastAPI
+from apply_migrations import apply_migrations
+from controllers.magic_item_controller import router
+from db import close_async_pool, get_connection
+from domain.etag import if_match_versions, is_not_modified, item_etag, items_etag
+from repositories.magic_item_repository import ItemVersionMismatchError, build_update_query
+from services.async_magic_item_service import AsyncMagicItemService
+
+ITEM = {"id": 7, "name": "Aetherial Cloak", "description": None, "level": 5, "type": "Cloak", "category": "Armor",
+        "rarity_value": 42.5, "weight": 1.25, "value": 500, "durability": 0.5, "stock": 3, "rarity_tier": "Common",
+        "version": 4}
+
+
+def request(method, url, **kwargs):
+    app = FastAPI()
+    app.include_router(router, prefix="/items")
+
+    async def send():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.request(method, url, **kwargs)
+
+    return asyncio.run(send())
+
+
+def test_etags_follow_ids_and_versions():
+    assert item_etag(ITEM) == item_etag({**ITEM, "stock": 9})  # the version is what changes on a write
+    assert item_etag(ITEM) != item_etag({**ITEM, "version": 5})
+    other = {**ITEM, "id": 8}
+    assert items_etag([ITEM, other]) == items_etag([ITEM, other])
+    assert items_etag([ITEM, other]) != items_etag([other, ITEM])
+    assert items_etag([ITEM, other]) != items_etag([ITEM, {**other, "version": 5}])
+    assert items_etag([ITEM], None) != items_etag([ITEM], 7)
+
+
+def test_if_none_match_compares_weakly():
+    etag = item_etag(ITEM)
+    assert is_not_modified(etag, etag)
+    assert is_not_modified(f'"other", W/{etag}', etag)
+    assert is_not_modified("*", etag)
+    assert not is_not_modified('"other"', etag)
+    assert not is_not_modified(None, etag)
+
+
+def test_if_match_names_versions_of_the_item():
+    etag = item_etag(ITEM)
+    assert if_match_versions(etag, 7) == [4]
+    assert if_match_versions(f'{etag}, {item_etag({**ITEM, "version": 6})}', 7) == [4, 6]
+    assert if_match_versions(f'W/{etag}, "junk", {item_etag({**ITEM, "id": 8})}', 7) == []
+    assert if_match_versions("*", 7) is None
+
+    query, params = build_update_query(7, {"stock": 2}, with_previous=True, expected_versions=[4])
+    assert "previous.version = ANY(%s)" in query and params == [2, 7, [4]]
+
+
+def test_unchanged_responses_are_not_sent_again(monkeypatch):
+    full_reads = []
+
+    def items(versions_only):
+        if versions_only:
+            return [{"id": ITEM["id"], "version": ITEM["version"]}]
+        full_reads.append(True)
+        return [ITEM]
+
+    async def get_item_by_id(item_id):
+        return ITEM
+
+    async def get_items_page(limit, after_id, versions_only=False):
+        return {"items": items(versions_only), "next_after_id": None}
+
+    async def search_items(search_criteria, versions_only=False):
+        return items(versions_only)
+
+    monkeypatch.setattr(AsyncMagicItemService, "get_item_by_id", get_item_by_id)
+    monkeypatch.setattr(AsyncMagicItemService, "get_items_page", get_items_page)
+    monkeypatch.setattr(AsyncMagicItemService, "search_items", search_items)
+
+    for url in ("/items/7", "/items/all", "/items/search?category=Armor"):
+        response = request("GET", url)
+        assert response.status_code == 200
+        etag = response.headers["etag"]
+        full_reads.clear()
+        not_modified = request("GET", url, headers={"If-None-Match": etag})
+        assert (not_modified.status_code, not_modified.content) == (304, b"")
+        assert not_modified.headers["etag"] == etag
+        assert not full_reads  # answered from the ids and versions alone
+        assert request("GET", url, headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_stale_if_match_is_rejected(monkeypatch):
+    async def update_item(item_id, update_data, expected_versions):
+        assert expected_versions == [3]
+        raise ItemVersionMismatchError(item_id, 4)
+
+    monkeypatch.setattr(AsyncMagicItemService, "update_item", update_item)
+    response = request("PUT", "/items/update_item/7", json={"stock": 1},
+                       headers={"If-Match": item_etag({**ITEM, "version": 3})})
+    assert response.status_code == 412
+    assert response.headers["etag"] == item_etag(ITEM)
+
+
+@pytest.fixture(scope="module")
+def conn():
+    try:
+        conn = get_connection()
+    except Exception as e:
+        pytest.skip(f"Database not reachable: {e}")
+    apply_migrations()
+    yield conn
+    conn.close()
+
+
+def test_every_write_moves_the_version(conn):
+    app = FastAPI()
+    app.include_router(router, prefix="/items")
+
+    async def scenario():
+        try:
+            item = (await AsyncMagicItemService.create_items([{"name": f"ETag {uuid.uuid4().hex}", "stock": 5}]))[0]
+            url = f"/items/{item['id']}"
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                etag = (await client.get(url)).headers["etag"]
+                await AsyncMagicItemService.adjust_stock([{"item_id": item["id"], "delta": -1}])
+                after_stock = (await client.get(url, headers={"If-None-Match": etag})).headers["etag"]
+                unchanged = await client.put(f"/items/update_item/{item['id']}", json={"stock": 4},
+                                             headers={"If-Match": after_stock})
+                updated = await client.put(f"/items/update_item/{item['id']}", json={"value": 9},
+                                           headers={"If-Match": after_stock})
+                stale = await client.put(f"/items/update_item/{item['id']}", json={"value": 10},
+                                         headers={"If-Match": after_stock})
+                current = await client.get(url)
+            await AsyncMagicItemService.delete_item(item["id"])
+            return item, etag, after_stock, unchanged, updated, stale, current
+        finally:
+            await close_async_pool()
+
+    item, etag, after_stock, unchanged, updated, stale, current = asyncio.run(scenario())
+    assert item["version"] == 1
+    assert after_stock != etag
+    assert unchanged.headers["etag"] == after_stock  # an update that changes nothing keeps the version
+    assert updated.status_code == 200 and updated.json()["version"] == 3
+    assert stale.status_code == 412 and stale.headers["etag"] == updated.headers["etag"]
+    assert current.json()["value"] == 9 and current.headers["etag"] == updated.headers["etag"]
@@ -0,0 +1,71 @@
+import uuid
+import pytest
+from apply_migrations import apply_migrations
+from db import get_connection
+from repositories.magic_item_repository import COLUMN_NAMES, build_statistics
+from services.magic_item_service import MagicItemService
+
+CLOAK = (7, "Aetherial Cloak", None, 5, "Cloak", "Armor", 42.5, 1.25, 500, 0.5, 3, "Common", 1)
+WAND = (9, "Ember Wand", None, 12, "Wand", "Weapon", 98.0, 0.5, 900, 0.75, 1, "Legendary", 2)
+
+
+def test_statistics_are_shaped_from_the_query_rows():
+    # (GROUPING(category), GROUPING(type), GROUPING(rarity_tier), category, type, rarity_tier, count, stock, value)
+    statistics = build_statistics([
+        (1, 1, 1, None, None, None, 3, 5, 2400),
+        (0, 1, 1, "Weapon", None, None, 1, 1, 900),
+        (0, 1, 1, None, None, None, 1, 1, 0),
+        (0, 1, 1, "Armor", None, None, 1, 3, 1500),
+        (1, 0, 1, None, "Wand", None, 1, 1, 900),
+        (1, 0, 1, None, "Cloak", None, 2, 4, 1500),
+    ], [("most_expensive_item",) + WAND, ("cheapest_item",) + CLOAK, ("most_stocked_item",) + CLOAK])
+    assert (statistics["total_items"], statistics["total_stock"], statistics["total_value"]) == (3, 5, 2400)
+    assert [entry["category"] for entry in statistics["by_category"]] == ["Armor", "Weapon", None]  # NULL last
+    assert statistics["by_type"] == [{"type": "Cloak", "total_items": 2, "total_stock": 4, "total_value": 1500},
+                                     {"type": "Wand", "total_items": 1, "total_stock": 1, "total_value": 900}]
+    assert statistics["most_expensive_item"] == dict(zip(COLUMN_NAMES, WAND))
+    assert statistics["cheapest_item"]["id"] == statistics["most_stocked_item"]["id"] == 7
+    assert statistics["highest_level_item"] is None  # no row for it
+    assert statistics["by_rarity_tier"] == []
+
+
+def test_an_empty_catalog_has_zero_totals():
+    statistics = build_statistics([(1, 1, 1, None, None, None, 0, 0, 0)], [])
+    assert (statistics["total_items"], statistics["total_stock"], statistics["total_value"]) == (0, 0, 0)
+    assert statistics["by_category"] == statistics["by_type"] == []
+
+
+@pytest.fixture(scope="module")
+def conn():
+    try:
+        conn = get_connection()
+    except Exception as e:
+        pytest.skip(f"Database not reachable: {e}")
+    apply_migrations()
+    yield conn
+    conn.close()
+
+
+def test_statistics_match_the_table(conn):
+    category = f"Statistics {uuid.uuid4().hex}"
+    MagicItemService.create_items([
+        {"name": "Lantern", "category": category, "type": "Lantern", "value": 30, "stock": 2, "level": 1},
+        {"name": "Lantern", "category": category, "type": "Lantern", "value": 5, "stock": 4, "level": 2},
+    ])
+    try:
+        statistics = MagicItemService.get_inventory_statistics()
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT count(*), COALESCE(SUM(stock), 0), COALESCE(SUM(value::bigint * stock), 0) "
+                           "FROM magic_items")
+            totals = cursor.fetchone()
+        conn.rollback()
+    finally:
+        with conn.cursor() as cursor:
+            cursor.execute("DELETE FROM magic_items WHERE category = %s", (category,))
+        conn.commit()
+
+    assert (statistics["total_items"], statistics["total_stock"], statistics["total_value"]) == totals
+    assert [entry for entry in statistics["by_category"] if entry["category"] == category] == [
+        {"category": category, "total_items": 2, "total_stock": 6, "total_value": 80}]
+    assert statistics["most_expensive_item"]["value"] >= 30
+    assert statistics["cheapest_item"]["value"] <= 5
@@ -0,0 +1,85 @@
+import asyncio
+from services.item_cache import ItemCache, LRUItemCacheBackend
+
+
+def make_item(item_id, stock=1):
+    return {"id": item_id, "name": f"item {item_id}", "stock": stock}
+
+
+def loader(items, calls):
+    async def load(item_id):
+        calls.append(item_id)
+        return items.get(item_id)
+    return load
+
+
+def test_read_through_counts_hits_and_misses():
+    async def scenario():
+        cache, calls = ItemCache(LRUItemCacheBackend()), []
+        load = loader({1: make_item(1)}, calls)
+        assert await cache.get_or_load(1, load) == make_item(1)
+        assert await cache.get_or_load(1, load) == make_item(1)
+        assert await cache.get_or_load(2, load) is None
+        assert await cache.get_or_load(2, load) is None
+        return cache, calls
+
+    cache, calls = asyncio.run(scenario())
+    assert calls == [1, 2, 2]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 3, 1)
+    assert stats["hit_rate"] == 0.25
+
+
+def test_writes_update_and_invalidate_entries():
+    async def scenario():
+        cache, calls = ItemCache(LRUItemCacheBackend()), []
+        load = loader({1: make_item(1)}, calls)
+        await cache.get_or_load(1, load)
+        await cache.update(make_item(1, stock=5))
+        updated = await cache.get_or_load(1, load)
+        await cache.invalidate(1)
+        await cache.get_or_load(1, load)
+        return updated, calls
+
+    updated, calls = asyncio.run(scenario())
+    assert updated["stock"] == 5
+    assert calls == [1, 1]
+
+
+def test_load_racing_a_write_is_not_cached():
+    async def scenario():
+        cache = ItemCache(LRUItemCacheBackend())
+
+        async def stale_load(item_id):
+            await cache.update(make_item(item_id, stock=7))
+            return make_item(item_id, stock=1)
+
+        await cache.get_or_load(1, stale_load)
+        return await cache.backend.get(1)
+
+    assert asyncio.run(scenario())["stock"] == 7
+
+
+def test_backend_evicts_least_recently_used_and_expired_items():
+    async def scenario():
+        backend = LRUItemCacheBackend(max_entries=2, ttl=60)
+        await backend.set(1, make_item(1))
+        await backend.set(2, make_item(2))
+        await backend.get(1)
+        await backend.set(3, make_item(3))
+        kept = [item_id for item_id in (1, 2, 3) if await backend.get(item_id)]
+        expiring = LRUItemCacheBackend(ttl=-1)
+        await expiring.set(1, make_item(1))
+        return kept, backend.evictions, await expiring.get(1), expiring.size()
+
+    assert asyncio.run(scenario()) == ([1, 3], 1, None, 0)
+
+
+def test_cached_items_are_copies():
+    async def scenario():
+        cache = ItemCache(LRUItemCacheBackend())
+        load = loader({1: make_item(1)}, [])
+        (await cache.get_or_load(1, load))["stock"] = 99
+        return await cache.get_or_load(1, load)
+
+    assert asyncio.run(scenario())["stock"] == 1
@@ -0,0 +1,66 @@
+import asyncio
+import httpx
+import orjson
+from fastapi import FastAPI
+from controllers.magic_item_controller import router
+from domain.magic_item import MagicItemPage, MagicItemRead
+from repositories.async_magic_item_repository import AsyncMagicItemRepository
+from services.async_magic_item_service import AsyncMagicItemService
+
+ITEM = {"id": 7, "name": "Aetherial Cloak", "description": None, "level": 5, "type": "Cloak", "category": "Armor",
+        "rarity_value": 42.5, "weight": 1.25, "value": 500, "durability": 0.5, "stock": 3, "rarity_tier": "Common",
+        "version": 1}
+
+
+def get(url):
+    app = FastAPI()
+    app.include_router(router, prefix="/items")
+
+    async def request():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.get(url)
+
+    return asyncio.run(request())
+
+
+def test_item_routes_skip_validation_but_keep_the_schema(monkeypatch):
+    async def get_items_page(limit, after_id, versions_only=False):
+        return {"items": [ITEM], "next_after_id": None}
+
+    async def get_item_by_id(item_id):
+        return ITEM
+
+    monkeypatch.setattr(AsyncMagicItemService, "get_items_page", get_items_page)
+    monkeypatch.setattr(AsyncMagicItemService, "get_item_by_id", get_item_by_id)
+
+    page = get("/items/all")
+    assert page.json() == MagicItemPage.model_validate(page.json()).model_dump(mode="json")
+    item = get("/items/7")
+    assert item.json() == MagicItemRead.model_validate(ITEM).model_dump(mode="json")
+
+
+def test_pages_follow_the_id_cursor(monkeypatch):
+    items = [{**ITEM, "id": item_id} for item_id in (2, 3, 5, 8, 13)]
+    reads = []
+
+    async def get_items_page(limit, after_id, versions_only=False):
+        reads.append((limit, after_id))
+        return [item for item in items if item["id"] > after_id][:limit]
+
+    async def stream_items(after_id=0):
+        for item in items:
+            if item["id"] > after_id:
+                yield item
+
+    monkeypatch.setattr(AsyncMagicItemRepository, "get_items_page", get_items_page)
+    monkeypatch.setattr(AsyncMagicItemService, "stream_items", stream_items)
+
+    first = get("/items/all?limit=2").json()
+    assert [item["id"] for item in first["items"]] == [2, 3] and first["next_after_id"] == 3
+    last = get("/items/all?limit=3&after_id=3").json()
+    assert [item["id"] for item in last["items"]] == [5, 8, 13] and last["next_after_id"] is None
+    assert reads == [(3, 0), (4, 3)]  # one row more than the page tells whether another follows
+
+    stream = get("/items/all?stream=true&after_id=5")
+    assert stream.headers["content-type"] == "application/x-ndjson"
+    assert [orjson.loads(line)["id"] for line in stream.content.splitlines()] == [8, 13]
@@ -0,0 +1,70 @@
+import asyncio
+import re
+import httpx
+from fastapi import APIRouter, FastAPI
+from config import Config
+from metrics import MetricsRegistry, RequestTimings, TimedRoute, TimingMiddleware, timed
+
+
+def make_app(registry):
+    router = APIRouter(route_class=TimedRoute)
+
+    @router.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        with timed("db_execute"):
+            pass
+        return {"id": item_id}
+
+    app = FastAPI()
+    app.include_router(router)
+    app.add_middleware(TimingMiddleware, registry=registry)
+    return app
+
+
+def get(app, url):
+    async def request():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.get(url)
+
+    return asyncio.run(request())
+
+
+def test_requests_get_server_timing_and_metrics_per_route(monkeypatch):
+    monkeypatch.setattr(Config, "METRICS_ENABLED", True)
+    registry = MetricsRegistry(buckets=(0.5, 1.0))
+    app = make_app(registry)
+    response = get(app, "/items/7")
+    get(app, "/items/8")
+    get(app, "/missing")
+
+    phases = re.findall(r'(?:^|, )(\w+);', response.headers["server-timing"])
+    assert phases == ["db_execute", "handler", "validation", "db_queries", "total"]
+    rendered = registry.render()
+    assert 'magic_items_http_requests_total{method="GET",route="/items/{item_id}",status="200"} 2' in rendered
+    assert 'magic_items_http_requests_total{method="GET",route="unmatched",status="404"} 1' in rendered
+    assert ('magic_items_http_request_duration_seconds_bucket{method="GET",route="/items/{item_id}",le="+Inf"} 2'
+            in rendered)
+    assert 'magic_items_request_phase_seconds_total{route="/items/{item_id}",phase="handler"}' in rendered
+
+
+def test_timing_hooks_are_inert_outside_a_timed_request(monkeypatch):
+    monkeypatch.setattr(Config, "METRICS_ENABLED", False)
+    registry = MetricsRegistry()
+    router = APIRouter(route_class=TimedRoute)
+
+    @router.get("/ping")
+    async def ping():
+        return {}
+
+    assert router.routes[0].dependant.call is ping
+    with timed("db_execute"):
+        pass
+    assert registry.render().count("\n") == 10  # only HELP/TYPE lines
+
+
+def test_server_timing_format():
+    timings = RequestTimings()
+    timings.add("db_execute", 0.0015)
+    timings.add("db_execute", 0.0005)
+    timings.queries, timings.rows = 2, 10
+    assert timings.server_timing(0.004) == 'db_execute;dur=2.00, db_queries;desc="2 queries, 10 rows", total;dur=4.00'
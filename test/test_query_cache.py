@@ -0,0 +1,25 @@
+from repositories.magic_item_repository import QueryCache, _positional, build_search_query, query_cache
+
+
+def test_positional_placeholders():
+    assert _positional("SELECT %s <%% name WHERE id = %s") == "SELECT $1 <% name WHERE id = $2"
+
+
+def test_same_criteria_shape_reuses_statement():
+    before = query_cache.stats()["statement_hits"]
+    first, first_params = build_search_query({"level__gte": 1, "category": "Armor"})
+    second, second_params = build_search_query({"category": "Weapon", "level__gte": 9})
+    assert first is second
+    assert first_params == ["Armor", 1]
+    assert second_params == ["Weapon", 9]
+    assert query_cache.stats()["statement_hits"] == before + 1
+
+
+def test_least_recently_used_statement_is_evicted():
+    cache = QueryCache(max_size=2)
+    cache.statement(("a",), lambda: "A")
+    cache.statement(("b",), lambda: "B")
+    cache.statement(("a",), lambda: "A")
+    cache.statement(("c",), lambda: "C")
+    assert cache.statement(("b",), lambda: "B2") == "B2"
+    assert cache.stats()["statement_misses"] == 4
@@ -0,0 +1,55 @@
+import pytest
+from domain.rarity_tier import RARITY_TIER_NAMES, parse_rarity_tiers, rarity_tier, rarity_tier_rank
+from repositories.magic_item_repository import (build_statistics, build_tier_counts, build_tier_counts_query,
+                                                build_update_query)
+
+
+def test_tiers_are_parsed_in_threshold_order():
+    assert parse_rarity_tiers("Rare:75, Common:0,Legendary:97") == [("Common", 0.0), ("Rare", 75.0),
+                                                                     ("Legendary", 97.0)]
+    for spec in ("Common:0,Common:50", "Common:0,Rare:0", "Com'mon:0", "Common"):
+        with pytest.raises(ValueError):
+            parse_rarity_tiers(spec)
+
+
+def test_rarity_value_is_classified_by_threshold():
+    assert RARITY_TIER_NAMES == ["Common", "Uncommon", "Rare", "Epic", "Legendary"]
+    assert [rarity_tier(value) for value in (-1, 0, 49.99, 50, 89.9, 90, 97, 100)] == [
+        "Common", "Common", "Common", "Uncommon", "Rare", "Epic", "Legendary", "Legendary"]
+    assert rarity_tier(None) is None
+
+
+def test_tier_lists_follow_threshold_order():
+    assert sorted(["Rare", None, "Mythic", "Common"], key=rarity_tier_rank) == ["Common", "Rare", "Mythic", None]
+    assert build_tier_counts([("Legendary", 1), ("Common", 7)]) == [{"rarity_tier": "Common", "total_items": 7},
+                                                                   {"rarity_tier": "Legendary", "total_items": 1}]
+
+
+def test_statistics_break_totals_down_by_tier():
+    # (GROUPING(category), GROUPING(type), GROUPING(rarity_tier), category, type, rarity_tier, count, stock, value)
+    statistics = build_statistics([
+        (1, 1, 1, None, None, None, 3, 6, 60),
+        (0, 1, 1, "Armor", None, None, 3, 6, 60),
+        (1, 0, 1, None, "Cloak", None, 3, 6, 60),
+        (1, 1, 0, None, None, "Rare", 1, 1, 10),
+        (1, 1, 0, None, None, "Common", 2, 5, 50),
+    ], [])
+    assert (statistics["total_items"], statistics["total_stock"]) == (3, 6)
+    assert statistics["by_rarity_tier"] == [{"rarity_tier": "Common", "total_items": 2, "total_stock": 5,
+                                             "total_value": 50},
+                                            {"rarity_tier": "Rare", "total_items": 1, "total_stock": 1,
+                                             "total_value": 10}]
+
+
+def test_tier_follows_rarity_value_updates():
+    query, params = build_update_query(1, {"rarity_value": 95.0})
+    assert "rarity_tier = %s" in query and params == ["Epic", 95.0, 1]
+    query, params = build_update_query(1, {"stock": 2})
+    assert "rarity_tier" not in query.split("RETURNING")[0]
+
+
+def test_tier_counts_cover_text_search_matches():
+    query, params = build_tier_counts_query({"category": "Armor"}, "cloak", fuzzy=True)
+    assert query.startswith("SELECT rarity_tier, COUNT(*) FROM magic_items, websearch_to_tsquery")
+    assert params == ["cloak", "cloak", "cloak", "Armor"]
+    assert build_tier_counts_query({"category": "Armor"})[1] == ["Armor"]
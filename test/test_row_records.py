@@ -0,0 +1,21 @@
+from domain.magic_item import MagicItemRead, MagicItemRecord
+from repositories.magic_item_repository import COLUMN_NAMES, ITEM_COLUMNS, record_from_dict, rows_to_records
+
+
+def test_record_layout_matches_the_queried_columns():
+    assert COLUMN_NAMES == list(MagicItemRecord._fields)
+    assert ITEM_COLUMNS.split(", ") == COLUMN_NAMES
+    assert set(COLUMN_NAMES) == set(MagicItemRead.model_fields)
+
+
+def test_rows_become_records_readable_by_name():
+    row = (7, "Aetherial Cloak", None, 5, "Cloak", "Armor", 42.5, 1.25, 500, 0.5, 3, "Common", 2)
+    [record] = rows_to_records([row])
+    assert record == row
+    assert (record.id, record.stock) == (7, 3)
+    assert record._asdict()["name"] == "Aetherial Cloak"
+
+
+def test_record_from_dict_fills_missing_columns_with_none():
+    record = record_from_dict({"id": 1, "name": "Potion", "rarity_value": 1.0, "stock": 2, "ignored": True})
+    assert record == MagicItemRecord(1, "Potion", None, None, None, None, 1.0, None, None, None, 2, None, None)
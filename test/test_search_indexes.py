@@ -0,0 +1,100 @@
+import json
+import pytest
+from apply_migrations import apply_migrations
+from db import get_connection
+from repositories.magic_item_repository import (build_search_query, build_structured_search_query,
+                                                build_text_search_query, build_tier_counts_query)
+
+
+@pytest.fixture(scope="module")
+def conn():
+    try:
+        conn = get_connection()
+    except Exception as e:
+        pytest.skip(f"Database not reachable: {e}")
+    try:
+        apply_migrations()
+    except Exception:
+        if trigram_available(conn):
+            raise
+    yield conn
+    conn.close()
+
+
+def trigram_available(conn) -> bool:
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        available = cursor.fetchone() is not None
+    conn.rollback()
+    return available
+
+
+def index_names(plan: dict) -> set:
+    names = {plan["Index Name"]} if "Index Name" in plan else set()
+    for child in plan.get("Plans", []):
+        names |= index_names(child)
+    return names
+
+
+def explain(conn, search_criteria: dict) -> set:
+    return explain_query(conn, *build_search_query(search_criteria))
+
+
+def explain_query(conn, query: str, params: list) -> set:
+    try:
+        with conn.cursor() as cursor:
+            # A test table is small enough for a sequential scan to win, so only ask whether an index can serve it
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute("EXPLAIN (FORMAT JSON) " + query, params)
+            plan = cursor.fetchone()[0]
+    finally:
+        conn.rollback()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return index_names(plan[0]["Plan"])
+
+
+@pytest.mark.parametrize("search_criteria, index", [
+    ({"level__gte": 5, "level__lte": 10}, "idx_magic_items_level"),
+    ({"value__gte": 100}, "idx_magic_items_value"),
+    ({"stock__lte": 2}, "idx_magic_items_stock"),
+    ({"category": "Armor", "type": "Cloak"}, "idx_magic_items_category_type"),
+    ({"category": "Armor"}, "idx_magic_items_category_type"),
+    ({"type": "Cloak"}, "idx_magic_items_type"),
+    ({"rarity_tier": "Legendary"}, "idx_magic_items_rarity_tier"),
+])
+def test_search_uses_btree_indexes(conn, search_criteria, index):
+    assert index in explain(conn, search_criteria)
+
+
+def test_tier_counts_use_rarity_tier_index(conn):
+    assert "idx_magic_items_rarity_tier" in explain_query(conn, *build_tier_counts_query({}))
+
+
+@pytest.mark.parametrize("where, sort, index", [
+    ({"category": ["Armor", "Weapon"], "type": ["Cloak"]}, [], "idx_magic_items_category_type"),
+    ({"rarity_tier": ["Epic", "Legendary"]}, [], "idx_magic_items_rarity_tier"),
+    ({"level": {"gte": 4.5, "lte": 10}}, ["level"], "idx_magic_items_level"),
+    ({}, ["-value"], "idx_magic_items_value"),
+])
+def test_structured_search_uses_btree_indexes(conn, where, sort, index):
+    search = {"where": where, "sort": sort, "limit": 1000}
+    assert index in explain_query(conn, *build_structured_search_query(search))
+
+
+def test_name_search_uses_trigram_index(conn):
+    if not trigram_available(conn):
+        pytest.skip("pg_trgm extension is not available on this server")
+    assert "idx_magic_items_name_trgm" in explain(conn, {"name": "Aetherial Cloak"})
+
+
+def test_text_search_uses_search_vector_index(conn):
+    query, params = build_text_search_query("invisibility cloak", {}, limit=10, fuzzy=False)
+    assert "idx_magic_items_search_vector" in explain_query(conn, query, params)
+
+
+def test_fuzzy_text_search_uses_trigram_indexes(conn):
+    if not trigram_available(conn):
+        pytest.skip("pg_trgm extension is not available on this server")
+    query, params = build_text_search_query("clok", {}, limit=10)
+    assert {"idx_magic_items_name_trgm", "idx_magic_items_description_trgm"} <= explain_query(conn, query, params)
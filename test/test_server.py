@@ -0,0 +1,81 @@
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import httpx
+from fastapi import FastAPI
+from controllers import health_controller
+from main import cpu_limit, worker_count
+from services.worker_state import WorkerState
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def get_health(app):
+    async def send():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.get("/health")
+
+    return asyncio.run(send())
+
+
+def test_one_worker_per_core_by_default():
+    assert cpu_limit() >= 1
+    assert worker_count(0) == cpu_limit()
+    assert worker_count(3) == 3
+
+
+def test_health_follows_the_worker_from_start_to_drain(monkeypatch):
+    state = WorkerState()
+    monkeypatch.setattr(health_controller, "worker_state", state)
+    app = FastAPI()
+    app.include_router(health_controller.router)
+
+    starting = get_health(app)
+    assert (starting.status_code, starting.json()["status"]) == (503, "starting")
+
+    state.ready(0.25)
+    ready = get_health(app)
+    assert (ready.status_code, ready.json()["status"]) == (200, "ready")
+    assert ready.json()["warm_up_seconds"] == 0.25
+    assert ready.json()["startup_seconds"] >= 0.0 and ready.json()["pid"] == os.getpid()
+
+    state.drain()
+    draining = get_health(app)
+    assert (draining.status_code, draining.json()["status"]) == (503, "draining")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_workers_start_and_drain_on_sigterm():
+    port = free_port()
+    # No database needed: the warm-up is off and /health does not query
+    server = subprocess.Popen([sys.executable, "main.py", "--workers", "2", "--port", str(port)], cwd=ROOT,
+                              env={**os.environ, "SERVER_WARM_UP": "false"}, stderr=subprocess.PIPE, text=True)
+    try:
+        deadline, pids = time.monotonic() + 30, set()
+        while time.monotonic() < deadline and server.poll() is None:
+            try:
+                response = httpx.get(f"http://127.0.0.1:{port}/health")
+                assert response.status_code == 200
+                pids.add(response.json()["pid"])
+                break
+            except httpx.TransportError:
+                time.sleep(0.05)
+        assert pids and server.pid not in pids  # answered by a worker, not by the process that started them
+        server.send_signal(signal.SIGTERM)
+        _, log = server.communicate(timeout=30)
+    finally:
+        if server.poll() is None:
+            server.kill()
+            server.communicate()
+    assert server.returncode == 0
+    assert log.count("ready in") == 2
+    assert log.count("Application shutdown complete") == 2
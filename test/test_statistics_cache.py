@@ -0,0 +1,85 @@
+from domain.rarity_tier import RARITY_TIER_NAMES
+from services.statistics_cache import InventoryStatisticsCache
+
+
+def make_item(item_id, value, stock, level=1, category="Weapon", item_type="Sword", tier="Common"):
+    return {"id": item_id, "name": f"item {item_id}", "description": None, "level": level, "type": item_type,
+            "category": category, "rarity_value": 1.0, "weight": 1.0, "value": value, "durability": 0.5,
+            "stock": stock, "rarity_tier": tier, "version": 1}
+
+
+def make_statistics(items):
+    def totals(group):
+        return {"total_items": len(group), "total_stock": sum(i["stock"] for i in group),
+                "total_value": sum(i["value"] * i["stock"] for i in group)}
+
+    return {
+        **totals(items),
+        "most_expensive_item": max(items, key=lambda i: (i["value"], -i["id"])),
+        "cheapest_item": min(items, key=lambda i: (i["value"], i["id"])),
+        "most_stocked_item": max(items, key=lambda i: (i["stock"], -i["id"])),
+        "highest_level_item": max(items, key=lambda i: (i["level"], -i["id"])),
+        "by_category": [{"category": c, **totals([i for i in items if i["category"] == c])}
+                        for c in sorted({i["category"] for i in items})],
+        "by_type": [{"type": t, **totals([i for i in items if i["type"] == t])}
+                    for t in sorted({i["type"] for i in items})],
+        "by_rarity_tier": [{"rarity_tier": t, **totals([i for i in items if i["rarity_tier"] == t])}
+                           for t in RARITY_TIER_NAMES if any(i["rarity_tier"] == t for i in items)],
+    }
+
+
+def cache_with(items):
+    cache = InventoryStatisticsCache(max_age=60)
+    cache.store(make_statistics(items), cache.generation)
+    return cache
+
+
+def test_hits_and_misses_are_counted():
+    cache = InventoryStatisticsCache(max_age=60)
+    assert cache.get() is None
+    cache.store(make_statistics([make_item(1, 10, 1)]), cache.generation)
+    assert cache.get()["total_items"] == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_stale_entries_are_not_served():
+    cache = InventoryStatisticsCache(max_age=0)
+    cache.store(make_statistics([make_item(1, 10, 1)]), cache.generation)
+    assert cache.get() is None
+
+
+def test_result_computed_across_a_write_is_not_cached():
+    cache = InventoryStatisticsCache(max_age=60)
+    generation = cache.generation
+    cache.apply_change(None, make_item(2, 5, 1))
+    cache.store(make_statistics([make_item(1, 10, 1)]), generation)
+    assert cache.get() is None
+
+
+def test_incremental_changes_match_recomputation():
+    items = [make_item(1, 10, 2), make_item(2, 50, 1, level=3, category="Armor", item_type="Cloak")]
+    cache = cache_with(items)
+
+    created = make_item(3, 100, 4, level=5, category="Armor", item_type="Cloak", tier="Legendary")
+    cache.apply_change(None, created)
+    items.append(created)
+    assert cache.get() == make_statistics(items)
+
+    restocked = {**items[0], "stock": 10}
+    cache.apply_change(items[0], restocked)
+    items[0] = restocked
+    assert cache.get() == make_statistics(items)
+
+    moved = {**items[1], "category": "Weapon", "value": 1}
+    cache.apply_change(items[1], moved)
+    items[1] = moved
+    assert cache.get() == make_statistics(items)
+
+
+def test_losing_an_extreme_item_invalidates():
+    items = [make_item(1, 10, 1), make_item(2, 50, 1)]
+    cache = cache_with(items)
+    cache.apply_change(items[1], None)
+    assert cache.get() is None
+    assert cache.stats()["invalidations"] == 1
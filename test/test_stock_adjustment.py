@@ -0,0 +1,33 @@
+from repositories.magic_item_repository import COLUMN_NAMES, adjust_stock_params, build_stock_adjustment
+
+
+def updated_columns(item_id, stock):
+    item = {"id": item_id, "name": f"item {item_id}", "description": None, "level": 1, "type": "Sword",
+            "category": "Weapon", "rarity_value": 1.0, "weight": 1.0, "value": 10, "durability": 0.5, "stock": stock,
+            "rarity_tier": "Common", "version": 1}
+    return [item[column] for column in COLUMN_NAMES]
+
+
+def test_params_keep_request_order():
+    assert adjust_stock_params([{"item_id": 2, "delta": -1}, {"item_id": 1, "delta": 4}]) == ([2, 1], [-1, 4])
+
+
+def test_applied_batch_reports_stock_after_and_changes():
+    lines = [{"item_id": 1, "delta": -2}, {"item_id": 2, "delta": 3}, {"item_id": 1, "delta": -1}]
+    rows = [(1, True, 5, *updated_columns(1, 2)), (2, True, 1, *updated_columns(2, 4))]
+    report, changes = build_stock_adjustment(lines, rows)
+    assert report["applied"]
+    assert [(line["status"], line["stock"]) for line in report["lines"]] == [("applied", 2), ("applied", 4),
+                                                                            ("applied", 2)]
+    assert [(previous["stock"], updated["stock"]) for previous, updated in changes] == [(5, 2), (1, 4)]
+
+
+def test_rejected_batch_reports_every_line():
+    lines = [{"item_id": 1, "delta": -3}, {"item_id": 2, "delta": -1}, {"item_id": 3, "delta": 1}]
+    rows = [(1, True, 2, *[None] * len(COLUMN_NAMES)), (2, True, 4, *[None] * len(COLUMN_NAMES)),
+            (3, False, None, *[None] * len(COLUMN_NAMES))]
+    report, changes = build_stock_adjustment(lines, rows)
+    assert not report["applied"]
+    assert [(line["status"], line["stock"]) for line in report["lines"]] == [
+        ("insufficient_stock", 2), ("aborted", 4), ("not_found", None)]
+    assert changes == []
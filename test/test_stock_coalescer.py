@@ -0,0 +1,44 @@
+import asyncio
+import pytest
+from repositories.magic_item_repository import accept_stock_deltas
+from services.stock_coalescer import InsufficientStockError, StockDeltaCoalescer
+
+
+def test_decreases_below_zero_are_skipped_in_arrival_order():
+    assert accept_stock_deltas(2, [-1, -3, 4, -3]) == (2, [True, False, True, True])
+    assert accept_stock_deltas(None, [-1, 1]) == (1, [False, True])
+
+
+def test_deltas_in_one_window_are_flushed_together():
+    stocks, flushes = {1: 1}, []
+
+    async def flush(item_id, deltas):
+        flushes.append((item_id, deltas))
+        stocks[item_id], accepted = accept_stock_deltas(stocks[item_id], deltas)
+        return {"id": item_id, "stock": stocks[item_id]}, accepted
+
+    async def scenario():
+        coalescer = StockDeltaCoalescer(0.01, flush)
+        return coalescer, await asyncio.gather(coalescer.submit(1, -1), coalescer.submit(1, -1),
+                                               coalescer.submit(1, 5), return_exceptions=True)
+
+    coalescer, results = asyncio.run(scenario())
+    assert flushes == [(1, [-1, -1, 5])]
+    assert results[0] == results[2] == {"id": 1, "stock": 5}
+    assert isinstance(results[1], InsufficientStockError)
+    assert coalescer.stats()["rejected"] == 1
+
+
+def test_missing_item_and_flush_errors_reach_every_caller():
+    async def flush(item_id, deltas):
+        if item_id == 2:
+            raise RuntimeError("database is down")
+        return None, [False] * len(deltas)
+
+    async def scenario():
+        coalescer = StockDeltaCoalescer(0, flush)
+        assert await coalescer.submit(1, 1) is None
+        await asyncio.gather(coalescer.submit(2, 1), coalescer.submit(2, 1))
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(scenario())
@@ -0,0 +1,61 @@
+import pytest
+from repositories.magic_item_repository import build_search_query, build_structured_search_query
+
+
+def search(**kwargs):
+    return {"limit": 10, "offset": 0, **kwargs}
+
+
+def test_conditions_and_params_in_order():
+    query, params = build_structured_search_query(search(
+        where={"category": ["Armor", "Weapon"], "weight": {"gte": 1.5}},
+        any_of=[{"rarity_tier": ["Epic"]}, {"value": {"gte": 1000}, "durability": {"lte": 0.5}}],
+        sort=["-value", "name"], offset=20))
+    assert " WHERE category = ANY(%s) AND weight >= %s AND ((rarity_tier = ANY(%s)) OR " \
+           "(durability <= %s AND value >= %s))" in query
+    assert query.endswith(" ORDER BY value DESC, name, id LIMIT %s OFFSET %s")
+    assert params == [["Armor", "Weapon"], 1.5, ["Epic"], 0.5, 1000, 10, 20]
+
+
+def test_same_shape_shares_the_statement():
+    first, _ = build_structured_search_query(search(where={"type": ["Cloak"], "level": {"gte": 2, "lte": 9}}))
+    second, params = build_structured_search_query(search(where={"type": ["Ring", "Sword", "Wand"],
+                                                                 "level": {"gte": 4, "lte": 5}}))
+    assert first is second
+    assert params == [4, 5, ["Ring", "Sword", "Wand"], 10, 0]
+
+
+def test_integer_bounds_round_inwards():
+    _, params = build_structured_search_query(search(where={"level": {"gte": 2.5, "lte": 7.5},
+                                                            "rarity_value": {"gte": 2.5}}))
+    assert params == [3, 7, 2.5, 10, 0]
+
+
+def test_no_filters_still_orders_by_id():
+    query, params = build_structured_search_query(search(sort=["-id"]))
+    assert "WHERE" not in query
+    assert query.endswith(" ORDER BY id DESC LIMIT %s OFFSET %s")
+    assert params == [10, 0]
+
+
+@pytest.mark.parametrize("bad", [
+    search(where={"description": ["x"]}),
+    search(where={"category; DROP TABLE magic_items": ["x"]}),
+    search(where={"category": {"gte": 1}}),
+    search(where={"level": {"gt": 1}}),
+    search(sort=["description"]),
+    search(sort=["value; DROP TABLE magic_items"]),
+    search(sort=["--value"]),
+    search(where={"level": {"gte": float("inf")}}),
+    search(where={"weight": {"lte": float("nan")}}),
+])
+def test_columns_outside_the_whitelist_are_rejected(bad):
+    with pytest.raises(ValueError):
+        build_structured_search_query(bad)
+
+
+def test_search_criteria_keys_are_whitelisted():
+    query, _ = build_search_query({"weight__gte": 1.0, "durability__lte": 0.5, "rarity_value__gte": 90})
+    assert "weight >= %s" in query and "durability <= %s" in query and "rarity_value >= %s" in query
+    with pytest.raises(ValueError):
+        build_search_query({"1=1 OR name": "x"})
@@ -0,0 +1,74 @@
+import asyncio
+import uuid
+import pytest
+from apply_migrations import apply_migrations
+from db import close_async_pool, get_connection
+from repositories.magic_item_repository import TransactionRejectedError, stock_delta, transaction_amount
+from services.async_magic_item_service import AsyncMagicItemService
+
+
+def test_amount_and_stock_change_by_kind():
+    assert (transaction_amount("sell", 25, 3), stock_delta("sell", 3)) == (75, -3)
+    assert (transaction_amount("buy", 25, 3), stock_delta("buy", 3)) == (-75, 3)
+    with pytest.raises(ValueError):
+        transaction_amount("steal", 25, 3)
+
+
+@pytest.fixture(scope="module")
+def conn():
+    try:
+        conn = get_connection()
+    except Exception as e:
+        pytest.skip(f"Database not reachable: {e}")
+    apply_migrations()
+    yield conn
+    conn.close()
+
+
+def wallet_totals(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT (SELECT SUM(balance) FROM wallet_shards), (SELECT SUM(amount) FROM item_transactions)")
+        totals = cursor.fetchone()
+    conn.rollback()
+    return totals
+
+
+def test_concurrent_sales_are_recorded_once_per_key(conn):
+    key = uuid.uuid4().hex
+
+    async def scenario():
+        try:
+            item = (await AsyncMagicItemService.create_items([{"name": f"Ledger {key}", "value": 7, "stock": 50}]))[0]
+            sales = [AsyncMagicItemService.sell_item(item["id"], 1, idempotency_key=f"{key}-{n % 20}")
+                     for n in range(60)]
+            entries = await asyncio.gather(*sales)
+            replay = await AsyncMagicItemService.sell_item(item["id"], 1, unit_price=7, idempotency_key=f"{key}-0")
+            with pytest.raises(TransactionRejectedError):
+                await AsyncMagicItemService.sell_item(item["id"], 1, unit_price=8, idempotency_key=f"{key}-0")
+            with pytest.raises(TransactionRejectedError):
+                await AsyncMagicItemService.sell_item(item["id"], 31)
+            return entries + [replay], await AsyncMagicItemService.get_item_by_id(item["id"])
+        finally:
+            await close_async_pool()
+
+    entries, item = asyncio.run(scenario())
+    assert len({entry["id"] for entry in entries}) == 20
+    assert sum(not entry["replayed"] for entry in entries) == 20
+    assert item["stock"] == 30
+    balance, ledger_total = wallet_totals(conn)
+    assert balance == ledger_total
+
+
+def test_purchase_needs_funds(conn):
+    async def scenario():
+        try:
+            item = (await AsyncMagicItemService.create_items([{"name": f"Ledger {uuid.uuid4().hex}", "value": 1,
+                                                               "stock": 0}]))[0]
+            balance = (await AsyncMagicItemService.get_wallet_balance())["balance"]
+            with pytest.raises(TransactionRejectedError):
+                await AsyncMagicItemService.buy_item(item["id"], 1, unit_price=balance + 1)
+            return await AsyncMagicItemService.get_item_by_id(item["id"])
+        finally:
+            await close_async_pool()
+
+    assert asyncio.run(scenario())["stock"] == 0
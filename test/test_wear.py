@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from domain.wear import aggregate_uses, apply_wear, is_consumable
+from repositories.magic_item_repository import build_wear_update
+
+
+def test_uses_are_summed_per_item():
+    item_ids, uses = aggregate_uses(np.array([5, 3, 5, 5]), np.array([1, 2, 1, 4]))
+    assert item_ids.tolist() == [3, 5]
+    assert uses.tolist() == [2, 6]
+
+
+def test_consumables_by_category_or_type():
+    assert is_consumable("Potion", None)
+    assert is_consumable("Artifact", "Elixir")
+    assert not is_consumable("Weapon", "Sword")
+
+
+def test_wear_breaks_copies_and_consumes_units():
+    stock = np.array([3, 3, 3, 1, 0, 5])
+    durability = np.array([0.5, 0.5, 0.5, 0.5, 0.5, 0.5])
+    consumable = np.array([False, False, False, False, False, True])
+    uses = np.array([4, 10, 50, 60, 3, 7])
+    new_stock, new_durability = apply_wear(stock, durability, consumable, uses, wear_per_use=0.125,
+                                           full_durability=1.0)
+    # 0.5 left, 0.5 of wear: breaks exactly; 1.25: breaks one, the next copy takes 0.75 of wear; too many breaks
+    # empty the stock; out of stock is left alone; a consumable loses its uses, at most its stock
+    assert new_stock.tolist() == [2, 2, 0, 0, 0, 0]
+    assert new_durability.tolist() == pytest.approx([1.0, 0.25, 0.0, 0.0, 0.5, 0.5])
+
+
+def test_wear_matches_one_use_at_a_time():
+    rng = np.random.default_rng(7)
+    stock = rng.integers(0, 4, 200)
+    durability = rng.uniform(0.1, 0.9, 200)
+    consumable = rng.random(200) < 0.3
+    uses = rng.integers(1, 40, 200)
+
+    expected_stock, expected_durability = stock, durability
+    for use in range(uses.max()):
+        expected_stock, expected_durability = apply_wear(expected_stock, expected_durability, consumable,
+                                                         (uses > use).astype(np.int64), wear_per_use=0.125,
+                                                         full_durability=1.0)
+    new_stock, new_durability = apply_wear(stock, durability, consumable, uses, wear_per_use=0.125,
+                                           full_durability=1.0)
+    assert new_stock.tolist() == expected_stock.tolist()
+    assert new_durability == pytest.approx(expected_durability)
+
+
+def test_restocked_item_starts_a_new_copy():
+    stock, durability = apply_wear([1], [0.5], [False], [4], wear_per_use=0.125, full_durability=1.0)
+    assert (stock.tolist(), durability.tolist()) == ([0], [0.0])  # the last copy broke
+
+    stock, durability = apply_wear(stock + 3, durability, [False], [1], wear_per_use=0.125, full_durability=1.0)
+    assert stock.tolist() == [3]
+    assert durability == pytest.approx([0.875])
+    assert apply_wear([2], [0.0], [True], [1])[1].tolist() == [0.0]  # a consumable has no copy to replace
+
+
+def test_wear_update_writes_only_changed_items():
+    rows = [(2, 4, 0.5, "Weapon", "Sword"), (3, 0, 0.5, "Weapon", "Sword"), (5, None, None, "Potion", "Potion")]
+    report, params, previous = build_wear_update(np.array([1, 2, 3, 5]), np.array([9, 2, 1, 1]), rows)
+    assert report == {"items": 4, "not_found": 1, "out_of_stock": 2, "stock_removed": 0}
+    assert params == ([2], [4], [pytest.approx(0.4)])
+    assert previous == {2: (4, 0.5)}
@@ -0,0 +1,128 @@
+"""
+Bulk import and export of the catalog from the command line, through the same streaming COPY as
+POST /items/import and GET /items/export, with progress on stderr.
+
+The format follows the file extension unless --format is given: .csv, .ndjson or .jsonl, and .json for a JSON
+array of items such as 70_dummy_Items.json (read whole, use NDJSON for large files). - is stdin or stdout.
+
+Usage:
+    python transfer_catalog.py import 70_dummy_Items.json
+    python transfer_catalog.py import items.csv
+    python transfer_catalog.py export items.ndjson
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import AsyncIterator, Callable
+import orjson
+from db import close_async_pool
+from services.async_magic_item_service import AsyncMagicItemService
+
+FILE_FORMATS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson", ".json": "json"}
+CHUNK_SIZE = 1 << 20
+JSON_BATCH_ITEMS = 10000
+PROGRESS_INTERVAL = 0.5
+
+
+def file_format(path: str, format: str = None) -> str:
+    if format:
+        return format
+    return FILE_FORMATS.get(os.path.splitext(path)[1].lower(), "ndjson")
+
+
+async def read_chunks(path: str) -> AsyncIterator[bytes]:
+    file = sys.stdin.buffer if path == "-" else open(path, "rb")
+    try:
+        while chunk := file.read(CHUNK_SIZE):
+            yield chunk
+    finally:
+        if file is not sys.stdin.buffer:
+            file.close()
+
+
+async def json_array_as_ndjson(path: str) -> AsyncIterator[bytes]:
+    items = orjson.loads(b"".join([chunk async for chunk in read_chunks(path)]))
+    if not isinstance(items, list):
+        raise ValueError(f"{path} does not hold a JSON array of items")
+    for start in range(0, len(items), JSON_BATCH_ITEMS):
+        yield b"".join(orjson.dumps(item) + b"\n" for item in items[start:start + JSON_BATCH_ITEMS])
+
+
+def progress_printer(verb: str, total: int = None) -> Callable[[int], None]:
+    """
+    An on_progress callback printing the bytes done so far, and the share of total, at most every
+    PROGRESS_INTERVAL seconds.
+    """
+    printed = [0.0]
+
+    def on_progress(done: int):
+        if time.monotonic() - printed[0] < PROGRESS_INTERVAL:
+            return
+        printed[0] = time.monotonic()
+        share = f" of {total / 1e6:.1f} MB ({done / total:.0%})" if total else " MB"
+        print(f"\r{verb} {done / 1e6:.1f}{share}", end="", file=sys.stderr, flush=True)
+
+    return on_progress
+
+
+async def import_file(path: str, format: str = None) -> dict:
+    format = file_format(path, format)
+    if format == "json":
+        # The progress counts the bytes of the NDJSON it is turned into, not of the file
+        data, format, total = json_array_as_ndjson(path), "ndjson", None
+    else:
+        data, total = read_chunks(path), os.path.getsize(path) if path != "-" else None
+    try:
+        report = await AsyncMagicItemService.import_items(data, format, progress_printer("Read", total))
+    finally:
+        print(file=sys.stderr)  # ends the progress line
+    print(f"Imported {report['rows']} rows: {report['created']} items created, {report['updated']} updated, "
+          f"{report['unchanged']} unchanged, {report['duplicates']} duplicates, in {report['seconds']:.2f} s "
+          f"({report['rows'] / max(report['seconds'], 1e-3):.0f} rows/s)")
+    return report
+
+
+async def export_file(path: str, format: str = None) -> int:
+    format = file_format(path, format)
+    if format not in ("csv", "ndjson"):
+        raise ValueError(f"Cannot export as {format}, use .csv or .ndjson")
+    started, written, lines = time.perf_counter(), 0, 0
+    on_progress = progress_printer("Wrote")
+    file = sys.stdout.buffer if path == "-" else open(path, "wb")
+    try:
+        async for block in AsyncMagicItemService.export_items(format):
+            file.write(block)
+            written += len(block)
+            lines += block.count(b"\n")
+            on_progress(written)
+    finally:
+        if file is not sys.stdout.buffer:
+            file.close()
+        print(file=sys.stderr)
+    # A CSV description may hold line breaks, so only NDJSON lines are items
+    items = f"{lines} items, " if format == "ndjson" else ""
+    print(f"Exported {items}{written / 1e6:.1f} MB in {time.perf_counter() - started:.2f} s", file=sys.stderr)
+    return written
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("path", help="the file to read or write, - for stdin/stdout")
+    parser.add_argument("--format", choices=["ndjson", "csv", "json"])
+    args = parser.parse_args()
+    try:
+        if args.command == "import":
+            await import_file(args.path, args.format)
+        else:
+            await export_file(args.path, args.format)
+    except ValueError as e:
+        sys.exit(f"{args.command.capitalize()} failed: {e}")
+    finally:
+        await close_async_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())